@@ -0,0 +1,7 @@
+"""
+Shared Python building blocks for the AML 360 services.
+
+The FastAPI services in `fast-api/` and `chatbot/` add the repository root to
+`sys.path` so they can import this package when started from their own
+directories.
+"""
@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor has no free worker or queue slot"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for running blocking or CPU-bound work off the event loop.
+
+    At most `max_workers` calls run at once and at most `max_queue` more wait
+    for a worker. Beyond that `run()` raises ExecutorSaturated immediately so
+    the caller can shed load (e.g. answer 429) instead of piling up requests.
+    """
+
+    def __init__(self, max_workers=4, max_queue=0, name="aml-worker"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def saturated(self):
+        return self.in_flight >= self.capacity
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool and await its result"""
+        with self._lock:
+            if self.saturated:
+                self.rejected += 1
+                raise ExecutorSaturated(
+                    f"All {self.max_workers} workers busy and {self.max_queue} queue slots taken"
+                )
+            self.in_flight += 1
+
+        # Slots are released when the work itself finishes, not when the
+        # awaiting request goes away, so abandoned calls still count.
+        future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait)
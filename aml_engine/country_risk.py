@@ -0,0 +1,185 @@
+"""
+Compiled country-risk index (Rule 1).
+
+Country risk tiers are built from the two published country lists,
+fast-api/country_list.txt (Level_1..Level_3) and countries.txt (Very Low ..
+Very High), into a versioned data file, aml_engine/data/country_risk.json.
+At load time the file is validated for malformed codes, duplicates and
+conflicting tiers, then compiled into a 26x26 uint8 table indexed by the two
+letters of the ISO-2 code, so scoring a whole column is a single `take`.
+
+Rebuild the data file after editing either list:
+
+    python -m aml_engine.country_risk
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+COUNTRY_RISK_PATH = os.path.join(DATA_DIR, "country_risk.json")
+COUNTRY_CODES_PATH = os.path.join(DATA_DIR, "country_codes.csv")
+COUNTRY_LIST_PATH = os.path.join(REPO_ROOT, "fast-api", "country_list.txt")
+COUNTRIES_PATH = os.path.join(REPO_ROOT, "countries.txt")
+
+# Tier 0 means "not rated"
+LEVEL_TIERS = {"Level_1": 1, "Level_2": 2, "Level_3": 3, "na.": 0}
+RATING_TIERS = {"Very Low": 1, "Low": 1, "Medium": 2, "High": 3, "Very High": 3, "na.": 0}
+
+_ISO2_RE = re.compile(r"^[A-Z]{2}$")
+
+
+def read_country_table(path):
+    """Parse a fixed-width 'Country  Risk Level' listing into (name, level) rows"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f.read().splitlines()[2:]:
+            match = re.match(r"^(.*?)\s{2,}(\S.*?)\s*$", line)
+            if match:
+                rows.append((match.group(1), match.group(2)))
+    return rows
+
+
+def build_country_risk(country_list_path=COUNTRY_LIST_PATH, countries_path=COUNTRIES_PATH,
+                       codes_path=COUNTRY_CODES_PATH):
+    """
+    Merge both country lists into one table keyed by ISO-2 code. Where the
+    lists disagree the higher tier is kept, and the disagreement is reported.
+    Returns (document, disagreements).
+    """
+    with open(codes_path, encoding="utf-8") as f:
+        codes = {row["country"]: row["iso2"] for row in csv.DictReader(f)}
+
+    tiers = {}
+    sources = {}
+    for path, scale in ((country_list_path, LEVEL_TIERS), (countries_path, RATING_TIERS)):
+        for name, level in read_country_table(path):
+            if name not in codes:
+                raise ValueError(f"{path}: no ISO-2 code for country '{name}' in {codes_path}")
+            if level not in scale:
+                raise ValueError(f"{path}: unknown risk level '{level}' for '{name}'")
+            tiers.setdefault(name, []).append(scale[level])
+            sources.setdefault(name, []).append(f"{os.path.basename(path)}={level}")
+
+    disagreements = [
+        f"{name}: {', '.join(sources[name])}" for name, found in tiers.items() if len(set(found)) > 1
+    ]
+    countries = [
+        {"iso2": codes[name], "country": name, "tier": max(found)}
+        for name, found in sorted(tiers.items(), key=lambda item: codes[item[0]])
+    ]
+    digest = hashlib.sha256(json.dumps(countries, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    document = {
+        "version": digest,
+        "sources": [os.path.relpath(p, REPO_ROOT) for p in (country_list_path, countries_path)],
+        "tier_scores": {"0": 0, "1": 2, "2": 4, "3": 10},
+        "countries": countries
+    }
+    return document, disagreements
+
+
+class CountryRiskIndex:
+    """ISO-2 country code -> risk tier lookup backed by a 26x26 array"""
+
+    def __init__(self, countries, tier_scores, version):
+        self.version = version
+        self.tier_scores = np.zeros(max(tier_scores) + 1, dtype=np.int64)
+        for tier, score in tier_scores.items():
+            self.tier_scores[tier] = score
+
+        self.table = np.zeros(26 * 26, dtype=np.uint8)
+        self.names = {}
+        seen = {}
+        for entry in countries:
+            code, tier = entry["iso2"], int(entry["tier"])
+            if not _ISO2_RE.match(code):
+                raise ValueError(f"Invalid ISO-2 code '{code}' in country risk table")
+            if tier not in tier_scores:
+                raise ValueError(f"Unknown tier {tier} for {code} in country risk table")
+            if code in seen:
+                kind = "Conflicting" if seen[code] != tier else "Duplicate"
+                raise ValueError(f"{kind} country risk entries for {code}: tiers {seen[code]} and {tier}")
+            seen[code] = tier
+            self.table[self._slot(code)] = tier
+            self.names[code] = entry.get("country", code)
+
+    @staticmethod
+    def _slot(code):
+        return (ord(code[0]) - 65) * 26 + (ord(code[1]) - 65)
+
+    @classmethod
+    def load(cls, path=COUNTRY_RISK_PATH):
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+        tier_scores = {int(t): int(s) for t, s in document["tier_scores"].items()}
+        return cls(document["countries"], tier_scores, document["version"])
+
+    def tier(self, code):
+        """Tier of a single country code (0 when unknown)"""
+        if not isinstance(code, str) or len(code) != 2:
+            return 0
+        code = code.upper()
+        if not _ISO2_RE.match(code):
+            return 0
+        return int(self.table[self._slot(code)])
+
+    def score(self, code):
+        return int(self.tier_scores[self.tier(code)])
+
+    def tiers(self, codes):
+        """
+        Vectorized tier lookup for a pandas Series (object or categorical),
+        NumPy array, list or pyarrow array of ISO-2 codes.
+        """
+        if hasattr(codes, "to_pandas") and not isinstance(codes, pd.Series):
+            codes = codes.to_pandas()
+        if isinstance(codes, pd.Series) and isinstance(codes.dtype, pd.CategoricalDtype):
+            # Look up each category once, then a single take over the codes
+            category_tiers = np.append(self.tiers(np.asarray(codes.cat.categories, dtype=object)), 0)
+            return category_tiers[codes.cat.codes.to_numpy()]
+
+        values = pd.Series(codes, dtype="object").fillna("").to_numpy()
+        try:
+            # Three bytes so longer strings like "USA" are not truncated to "US"
+            raw = values.astype("S3").view(np.uint8).reshape(-1, 3).astype(np.int64)
+        except UnicodeEncodeError:
+            return np.fromiter((self.tier(c) for c in values), dtype=np.int64, count=len(values))
+        letters = raw[:, :2] & ~32  # upper-case ASCII letters
+        valid = (letters >= 65).all(axis=1) & (letters <= 90).all(axis=1) & (raw[:, 2] == 0)
+        slots = np.where(valid, (letters[:, 0] - 65) * 26 + (letters[:, 1] - 65), 0)
+        return np.where(valid, self.table.take(slots), 0).astype(np.int64)
+
+    def scores(self, codes):
+        """Vectorized Rule 1 scores"""
+        return self.tier_scores.take(self.tiers(codes))
+
+
+_default_index = None
+
+
+def get_default_index():
+    """Process-wide index loaded from aml_engine/data/country_risk.json"""
+    global _default_index
+    if _default_index is None:
+        _default_index = CountryRiskIndex.load()
+    return _default_index
+
+
+if __name__ == "__main__":
+    document, disagreements = build_country_risk()
+    for line in disagreements:
+        print(f"Lists disagree, keeping the higher tier: {line}")
+    # Validate before writing
+    CountryRiskIndex(document["countries"], {int(t): s for t, s in document["tier_scores"].items()},
+                     document["version"])
+    with open(COUNTRY_RISK_PATH, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {len(document['countries'])} countries (version {document['version']}) to {COUNTRY_RISK_PATH}")
@@ -0,0 +1,264 @@
+"""
+Canonical columnar storage for the transaction dataset.
+
+Transactions are stored as a Parquet dataset, hive-partitioned by the month
+of transaction_date (`transaction_month=2024-01/`) and sorted by date within
+each file, so date filters prune whole directories and row groups. Currency,
+country and payment_type columns are dictionary-encoded and load as pandas
+categoricals; transaction_date is a real date column. Ids and account keys
+are stored as text and amounts and scores as floats, whatever the first
+rows of a CSV look like.
+
+`TransactionDataset.read` projects only the requested columns and pushes
+date-range, account and suspicious-flag predicates down to the scan, so
+loaders no longer re-parse and re-infer a whole CSV on every start.
+
+    python -m aml_engine.dataset usd_amount_dataset.csv transactions_dataset/
+"""
+
+import argparse
+import os
+import uuid
+
+import pandas as pd
+
+from aml_engine.etl import ETL_CHUNK_ROWS, iter_csv_chunks
+from aml_engine.rates import parse_dates
+
+DATASET_PATH = os.getenv("TRANSACTIONS_DATASET", "transactions_dataset")
+PARTITION_COLUMN = "transaction_month"
+
+# Low-cardinality string columns stored dictionary-encoded
+CATEGORICAL_COLUMNS = [
+    "currency_code", "beneficiary_country", "originator_country", "payment_type",
+    "transaction_type", "country", "currency"
+]
+# Known names of the suspicious flag across the CSV exports
+FLAG_COLUMNS = ["is_suspicious", "suspicious_flag", "isSuspicious"]
+# Numeric columns; any other column that is empty throughout a chunk is
+# stored as text, since pandas reads an empty column as float NaN
+NUMERIC_COLUMNS = ["transaction_amount", "amount_usd", "usd_rate", "risk_score", "total_score"]
+# Identifiers, which may look numeric in one chunk and not in the next
+ID_COLUMNS = ["transaction_id", "account_key", "_id"]
+# Types convert_csv reads every chunk with, so no chunk infers its own
+CSV_DTYPES = {**dict.fromkeys(NUMERIC_COLUMNS, "float64"), **dict.fromkeys(ID_COLUMNS, "string")}
+
+
+def normalize_frame(df):
+    """Parse dates and cast low-cardinality columns to categoricals"""
+    df = df.copy()
+    if "transaction_date" in df and not pd.api.types.is_datetime64_any_dtype(df["transaction_date"]):
+        df["transaction_date"] = parse_dates(df["transaction_date"])
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+    for column in CATEGORICAL_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    for column in df.columns:
+        # Keep mixed object columns (e.g. ids exported from MongoDB) as text
+        if df[column].dtype == object:
+            df[column] = df[column].astype("string")
+    df[PARTITION_COLUMN] = df["transaction_date"].dt.strftime("%Y-%m")
+    return df.sort_values("transaction_date", kind="stable")
+
+
+def _arrow_table(df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in table.schema:
+        if field.name == "transaction_date":
+            # Day resolution is all the source data carries
+            field = field.with_type(pa.date32())
+        elif pa.types.is_dictionary(field.type):
+            # Wide indices so appended chunks with more categories still fit
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif pa.types.is_large_string(field.type):
+            field = field.with_type(pa.string())
+        elif (table.num_rows and table.column(field.name).null_count == table.num_rows
+              and (pa.types.is_null(field.type) or pa.types.is_floating(field.type))):
+            # Nothing to infer the type from: a column empty in the first
+            # chunk of a CSV may hold text further down
+            numeric = field.name in NUMERIC_COLUMNS or field.name.endswith("_score")
+            field = field.with_type(pa.float64() if numeric else pa.string())
+        fields.append(field)
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def write_dataset(df, root=DATASET_PATH, append=False, schema=None):
+    """
+    Write a DataFrame of transactions to the partitioned dataset at `root`,
+    cast to `schema` when given. Returns the Arrow schema written.
+    """
+    table = _arrow_table(normalize_frame(df))
+    if schema is not None:
+        table = table.select(schema.names).cast(schema)
+    _write_table(table, root, append)
+    return table.schema
+
+
+def _write_table(table, root, append):
+    import pyarrow.dataset as ds
+
+    if not append and os.path.exists(root):
+        import shutil
+        shutil.rmtree(root)
+    ds.write_dataset(
+        table, root, format="parquet",
+        partitioning=[PARTITION_COLUMN], partitioning_flavor="hive",
+        # A unique name per write so appends never overwrite earlier files
+        basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=128 * 1024
+    )
+
+
+def _widened(schema):
+    """`schema` with integer columns as float64, which any later chunk's numbers fit"""
+    import pyarrow as pa
+
+    return pa.schema(
+        [field.with_type(pa.float64()) if pa.types.is_integer(field.type) else field for field in schema],
+        metadata=schema.metadata
+    )
+
+
+def convert_csv(csv_path, root=DATASET_PATH, chunk_rows=ETL_CHUNK_ROWS):
+    """Stream a transactions CSV into a fresh dataset, chunk by chunk"""
+    rows = 0
+    schema = None
+    for chunk, _ in iter_csv_chunks(csv_path, chunk_rows, dtype=CSV_DTYPES):
+        # Known columns are read with fixed types; the rest of every later
+        # chunk is cast to the first chunk's schema, with whole numbers
+        # widened so a fraction further down still fits
+        table = _arrow_table(normalize_frame(chunk))
+        if schema is None:
+            schema = _widened(table.schema)
+        _write_table(table.select(schema.names).cast(schema), root, append=rows > 0)
+        rows += len(chunk)
+    return rows
+
+
+class TransactionDataset:
+    """Read access to a partitioned transaction dataset"""
+
+    def __init__(self, root=DATASET_PATH):
+        import pyarrow.dataset as ds
+
+        self.root = root
+        self.dataset = ds.dataset(root, format="parquet", partitioning="hive")
+
+    @staticmethod
+    def exists(root=DATASET_PATH):
+        return os.path.isdir(root) and any(name.startswith(PARTITION_COLUMN) for name in os.listdir(root))
+
+    @property
+    def columns(self):
+        return [name for name in self.dataset.schema.names if name != PARTITION_COLUMN]
+
+    @property
+    def flag_column(self):
+        return next((c for c in FLAG_COLUMNS if c in self.dataset.schema.names), None)
+
+    def _filter(self, start=None, end=None, accounts=None, suspicious=None):
+        import pyarrow.dataset as ds
+
+        expression = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if start is not None:
+            start = pd.Timestamp(start)
+            expression = both(expression, ds.field(PARTITION_COLUMN) >= start.strftime("%Y-%m"))
+            expression = both(expression, ds.field("transaction_date") >= start.date())
+        if end is not None:
+            end = pd.Timestamp(end)
+            expression = both(expression, ds.field(PARTITION_COLUMN) <= end.strftime("%Y-%m"))
+            expression = both(expression, ds.field("transaction_date") <= end.date())
+        if accounts is not None:
+            if isinstance(accounts, (str, int)):
+                accounts = [accounts]
+            field_type = self.dataset.schema.field("account_key").type
+            values = list(accounts) if str(field_type).startswith(("int", "uint")) else [str(a) for a in accounts]
+            expression = both(expression, ds.field("account_key").isin(values))
+        if suspicious is not None:
+            flag = self.flag_column
+            if flag is None:
+                raise ValueError("Dataset has no suspicious flag column")
+            # Flags are stored as booleans or 0/1 depending on the source
+            expression = both(expression, ds.field(flag).cast("bool") == bool(suspicious))
+        return expression
+
+    def scanner(self, columns=None, start=None, end=None, accounts=None, suspicious=None, batch_size=128 * 1024):
+        """pyarrow Scanner with projection and pushed-down predicates"""
+        if columns is not None:
+            available = set(self.columns)
+            columns = [c for c in columns if c in available]
+        return self.dataset.scanner(
+            columns=columns if columns is not None else self.columns,
+            filter=self._filter(start, end, accounts, suspicious),
+            batch_size=batch_size
+        )
+
+    def to_table(self, columns=None, start=None, end=None, accounts=None, suspicious=None):
+        return self.scanner(columns, start, end, accounts, suspicious).to_table()
+
+    def read(self, columns=None, start=None, end=None, accounts=None, suspicious=None):
+        """
+        Load matching rows as a DataFrame. `columns` limits what is read
+        (unknown names are skipped); `start`/`end` bound transaction_date
+        inclusively; `accounts` is one or more account_key values;
+        `suspicious` selects flagged (True) or unflagged (False) rows.
+        """
+        table = self.to_table(columns, start, end, accounts, suspicious)
+        df = table.to_pandas()
+        if "transaction_date" in df:
+            df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+        return df
+
+    def iter_batches(self, columns=None, start=None, end=None, accounts=None, suspicious=None):
+        """Yield matching rows as DataFrames one record batch at a time"""
+        for batch in self.scanner(columns, start, end, accounts, suspicious).to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def count(self, start=None, end=None, accounts=None, suspicious=None):
+        return self.scanner([], start, end, accounts, suspicious).count_rows()
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "files": len(self.dataset.files),
+            "rows": self.dataset.count_rows(),
+            "columns": self.columns
+        }
+
+
+def read_transactions(path, columns=None):
+    """
+    Load transactions from a dataset directory or, failing that, a CSV file,
+    reading only `columns` when given
+    """
+    if TransactionDataset.exists(path):
+        return TransactionDataset(path).read(columns)
+    if columns is not None:
+        header = pd.read_csv(path, nrows=0).columns
+        return pd.read_csv(path, usecols=[c for c in columns if c in header])
+    return pd.read_csv(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a transactions CSV to the partitioned Parquet dataset")
+    parser.add_argument("csv")
+    parser.add_argument("root", nargs="?", default=DATASET_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=ETL_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    rows = convert_csv(args.csv, args.root, args.chunk_rows)
+    dataset = TransactionDataset(args.root)
+    print(f"Wrote {rows:,} transactions to {args.root} ({len(dataset.dataset.files)} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Chunked streaming ETL for transaction CSVs.
+
+Reads an arbitrarily large CSV in fixed-size row chunks and passes each chunk
+through USD conversion (aml_engine.rates.RateMatrix), rounding of amount_usd
+and columnar rule scoring (aml_engine.rules.RuleEngine) before appending it
+to the output, so memory stays bounded by the chunk size.
+
+After every chunk the job records the input and output byte offsets in a
+checkpoint file. A restarted job truncates the output to the checkpointed
+size, seeks the input to the checkpointed offset and carries on, so a crash
+never duplicates or loses rows. Rows must not contain embedded newlines.
+
+Rule 4 (structuring) needs each account's full history and is not scored
+here; run aml_engine.structuring.detect_structuring over the output instead.
+
+    python -m aml_engine.etl input.csv output.csv [--rates-db exchange_rates.sqlite]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import pandas as pd
+
+ETL_CHUNK_ROWS = int(os.getenv("ETL_CHUNK_ROWS", "100000"))
+ROUND_DECIMALS = 2
+CHECKPOINT_VERSION = 1
+
+# Columns RuleEngine.evaluate needs for the non-structuring rules
+SCORING_COLUMNS = ["beneficiary_country", "amount_usd"]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unsupported"""
+    # VmHWM is reset on exec, unlike ru_maxrss which a spawned child
+    # inherits from its parent
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def iter_csv_chunks(path, chunk_rows=ETL_CHUNK_ROWS, offset=None, dtype=None):
+    """
+    Yield (DataFrame, end_offset) for consecutive chunks of `chunk_rows`
+    rows, starting at byte `offset` (just past the header when None).
+    `end_offset` is the byte offset of the first row after the chunk.
+    `dtype` is passed to pandas.read_csv for every chunk.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        if offset is None:
+            offset = f.tell()
+        f.seek(offset)
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                return
+            data = b"".join(lines)
+            offset += len(data)
+            yield pd.read_csv(io.BytesIO(header + data), dtype=dtype), offset
+
+
+def chunk_to_csv(chunk, header):
+    """
+    Serialize one chunk as CSV bytes. pyarrow's writer is roughly an order of
+    magnitude faster than DataFrame.to_csv, so it is used when installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return chunk.to_csv(index=False, header=header).encode("utf-8")
+    buffer = io.BytesIO()
+    options = pacsv.WriteOptions(include_header=header, quoting_style="needed")
+    pacsv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), buffer, write_options=options)
+    return buffer.getvalue()
+
+
+class Checkpoint:
+    """Byte offsets of the last chunk fully written, stored atomically as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, input_path, output_path):
+        """The saved state, or None when missing or written for other files"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        stat = os.stat(input_path)
+        expected = {
+            "version": CHECKPOINT_VERSION,
+            "input": os.path.abspath(input_path),
+            "input_size": stat.st_size,
+            "input_mtime_ns": stat.st_mtime_ns,
+            "output": os.path.abspath(output_path),
+        }
+        if any(state.get(key) != value for key, value in expected.items()):
+            print(f"Ignoring checkpoint {self.path}: written for a different input or output")
+            return None
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < state["output_offset"]:
+            print(f"Ignoring checkpoint {self.path}: output is shorter than checkpointed")
+            return None
+        return state
+
+    def save(self, input_path, output_path, input_offset, output_offset, rows):
+        if not self.path:
+            return
+        stat = os.stat(input_path)
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "input": os.path.abspath(input_path),
+            "input_size": stat.st_size,
+            "input_mtime_ns": stat.st_mtime_ns,
+            "output": os.path.abspath(output_path),
+            "input_offset": input_offset,
+            "output_offset": output_offset,
+            "rows": rows,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TransactionETL:
+    """Convert, round and score transaction CSVs chunk by chunk"""
+
+    def __init__(self, rate_matrix=None, rule_engine=None, score=True, round_decimals=ROUND_DECIMALS,
+                 chunk_rows=ETL_CHUNK_ROWS):
+        self.rate_matrix = rate_matrix
+        self.score = score
+        self.rule_engine = rule_engine
+        if score and rule_engine is None:
+            from aml_engine.rules import get_default_engine
+            self.rule_engine = get_default_engine()
+        self.round_decimals = round_decimals
+        self.chunk_rows = chunk_rows
+
+    def transform(self, chunk):
+        """Apply conversion, rounding and scoring to one chunk"""
+        if self.rate_matrix is not None and {"transaction_date", "currency_code"} <= set(chunk.columns):
+            chunk["usd_rate"] = self.rate_matrix.lookup(chunk["transaction_date"], chunk["currency_code"])
+            chunk["amount_usd"] = chunk["transaction_amount"] * chunk["usd_rate"]
+
+        if self.round_decimals is not None and "amount_usd" in chunk:
+            chunk["amount_usd"] = chunk["amount_usd"].round(self.round_decimals)
+
+        if self.score and set(SCORING_COLUMNS) <= set(chunk.columns):
+            scores = self.rule_engine.evaluate(chunk, structuring=False)
+            for column in scores.columns:
+                chunk[column] = scores[column]
+        return chunk
+
+    def run(self, input_path, output_path, checkpoint_path=None, max_chunks=None):
+        """
+        Stream `input_path` to `output_path`, resuming from `checkpoint_path`
+        when it holds a checkpoint for the same files. `max_chunks` stops
+        early (the checkpoint is kept so the job can be resumed). Returns
+        a stats dict.
+        """
+        checkpoint = Checkpoint(checkpoint_path)
+        state = checkpoint.load(input_path, output_path)
+        if state:
+            input_offset, output_offset, rows = state["input_offset"], state["output_offset"], state["rows"]
+            print(f"Resuming at input byte {input_offset:,} ({rows:,} rows already written)")
+        else:
+            input_offset, output_offset, rows = None, 0, 0
+
+        start = time.perf_counter()
+        resumed_rows = rows
+        chunks = 0
+        missing_rates = 0
+        suspicious = 0
+        mode = "r+b" if state else "wb"
+        with open(output_path, mode) as out:
+            # Drop anything written after the last checkpoint
+            out.truncate(output_offset)
+            out.seek(output_offset)
+            for chunk, input_offset in iter_csv_chunks(input_path, self.chunk_rows, input_offset):
+                chunk = self.transform(chunk)
+                if "usd_rate" in chunk:
+                    missing_rates += int(chunk["usd_rate"].isna().sum())
+                if "is_suspicious" in chunk:
+                    suspicious += int(chunk["is_suspicious"].sum())
+
+                out.write(chunk_to_csv(chunk, header=output_offset == 0))
+                out.flush()
+                os.fsync(out.fileno())
+                output_offset = out.tell()
+                rows += len(chunk)
+                chunks += 1
+                checkpoint.save(input_path, output_path, input_offset, output_offset, rows)
+
+                if max_chunks is not None and chunks >= max_chunks:
+                    break
+            else:
+                checkpoint.clear()
+
+        elapsed = time.perf_counter() - start
+        processed = rows - resumed_rows
+        return {
+            "rows": rows,
+            "processed_rows": processed,
+            "chunks": chunks,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(processed / elapsed) if elapsed > 0 else None,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "missing_rates": missing_rates,
+            "suspicious": suspicious,
+            "output_bytes": output_offset,
+        }
+
+
+def print_stats(stats):
+    print(f"Rows written: {stats['rows']:,} ({stats['processed_rows']:,} this run, {stats['chunks']} chunks)")
+    print(f"Throughput: {stats['rows_per_second'] or 0:,} rows/s in {stats['seconds']}s")
+    if stats["peak_rss_bytes"] is not None:
+        print(f"Peak RSS: {stats['peak_rss_bytes'] / 2**20:,.1f} MiB")
+    if stats["missing_rates"]:
+        print(f"WARNING: {stats['missing_rates']:,} rows have no exchange rate")
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a transactions CSV through conversion, rounding and scoring")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--chunk-rows", type=int, default=ETL_CHUNK_ROWS)
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--rates-db", default=None, help="Exchange-rate store; converts amounts when given")
+    parser.add_argument("--no-score", action="store_true", help="Skip rule scoring")
+    parser.add_argument("--no-round", action="store_true", help="Keep amount_usd unrounded")
+    args = parser.parse_args()
+
+    rate_matrix = None
+    if args.rates_db:
+        from aml_engine.rates import RateMatrix, RateStore
+        rate_matrix = RateMatrix.from_store(RateStore(args.rates_db))
+
+    etl = TransactionETL(
+        rate_matrix=rate_matrix, score=not args.no_score,
+        round_decimals=None if args.no_round else ROUND_DECIMALS, chunk_rows=args.chunk_rows
+    )
+    stats = etl.run(args.input, args.output, args.checkpoint or f"{args.output}.checkpoint")
+    print_stats(stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Deterministic feature encoding for the fraud detection model.
+
+The encoder replaces the old `hash(payment_type) % 1000` feature, which was
+randomized per process by PYTHONHASHSEED, with the `payment_type_risk`
+vocabulary from fast-api/model.ipynb. Its configuration is persisted as JSON
+next to fraud_detection_pipeline.pkl so every worker, the online /predict
+path and batch scoring build identical feature matrices.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ENCODER_VERSION = 1
+ENCODER_FILENAME = "feature_encoder.json"
+
+# Payment type encoding (STEP 4 of fast-api/model.ipynb)
+PAYMENT_TYPE_RISK = {'SWIFT': 3, 'IMPS': 2, 'NEFT': 1}
+
+# Column order expected by the model served from fast-api/connection.py
+FEATURE_COLUMNS = [
+    "payment_type",
+    "amount_usd",
+    "Rule1_score",
+    "Rule2_score",
+    "Rule3_score",
+    "Rule4_score",
+    "Rule5_score",
+    "total_score"
+]
+
+
+class FeatureEncoder:
+    """Encodes transactions into the model's numeric feature matrix"""
+
+    def __init__(self, payment_type_risk=None, feature_columns=None, unknown_value=0.0,
+                 version=ENCODER_VERSION):
+        self.payment_type_risk = dict(payment_type_risk or PAYMENT_TYPE_RISK)
+        self.feature_columns = list(feature_columns or FEATURE_COLUMNS)
+        self.unknown_value = float(unknown_value)
+        self.version = version
+        self._lookup = {self._normalize(k): float(v) for k, v in self.payment_type_risk.items()}
+
+    @staticmethod
+    def _normalize(payment_type):
+        return str(payment_type).strip().upper()
+
+    def encode_payment_type(self, values):
+        """Encode a whole payment_type column in one call"""
+        values = pd.Series(values, dtype="object")
+        codes = values.astype(str).str.strip().str.upper().map(self._lookup)
+        return codes.fillna(self.unknown_value).to_numpy(dtype=np.float64)
+
+    def transform(self, transactions):
+        """
+        Encode many transactions (list of dicts, DataFrame or pyarrow Table)
+        into an (n, len(feature_columns)) float64 matrix.
+        """
+        if hasattr(transactions, "to_pandas"):
+            transactions = transactions.to_pandas()
+        if not isinstance(transactions, pd.DataFrame):
+            transactions = pd.DataFrame(list(transactions), columns=self.feature_columns)
+
+        matrix = np.empty((len(transactions), len(self.feature_columns)), dtype=np.float64)
+        for j, column in enumerate(self.feature_columns):
+            if column == "payment_type":
+                matrix[:, j] = self.encode_payment_type(transactions[column])
+            else:
+                matrix[:, j] = transactions[column].to_numpy(dtype=np.float64)
+        return matrix
+
+    def transform_one(self, transaction):
+        """Fast path for a single transaction dict, identical to transform()"""
+        row = np.empty(len(self.feature_columns), dtype=np.float64)
+        for j, column in enumerate(self.feature_columns):
+            if column == "payment_type":
+                row[j] = self._lookup.get(self._normalize(transaction[column]), self.unknown_value)
+            else:
+                row[j] = float(transaction[column])
+        return row
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "feature_columns": self.feature_columns,
+            "payment_type_risk": self.payment_type_risk,
+            "unknown_value": self.unknown_value
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        return cls(
+            payment_type_risk=config["payment_type_risk"],
+            feature_columns=config["feature_columns"],
+            unknown_value=config.get("unknown_value", 0.0),
+            version=config.get("version", ENCODER_VERSION)
+        )
+
+
+def load_encoder(model_path):
+    """
+    Load the encoder shipped alongside a model file, falling back to the
+    default notebook vocabulary when none was exported.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(model_path)), ENCODER_FILENAME)
+    if os.path.exists(path):
+        return FeatureEncoder.load(path)
+    print(f"Feature encoder not found at {path}, using default payment_type_risk vocabulary")
+    return FeatureEncoder()
+
+
+if __name__ == "__main__":
+    import sys
+
+    output = sys.argv[1] if len(sys.argv) > 1 else ENCODER_FILENAME
+    FeatureEncoder().save(output)
+    print(f"Saved feature encoder to {output}")
@@ -0,0 +1,280 @@
+"""
+Compiled suspicious-keyword matcher.
+
+The keyword list is compiled once into a single regex with word boundaries,
+so "art" no longer matches inside "partial" and each payment instruction is
+scanned once instead of once per keyword. The alternation is factored into a
+character trie, which keeps Python's backtracking engine from retrying every
+keyword at every position. Whole columns can be scored through pandas'
+vectorized string methods or pyarrow.compute.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_KEYWORDS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fast-api", "sus_words.txt"
+)
+
+# Rule 2 score from fast-api/model.ipynb
+KEYWORD_SCORE = 3
+
+ARTIFACT_FORMAT = 1
+
+_COMMENT_RE = re.compile(r"^\s*#\s*(.+?)\s*$")
+_STRING_RE = re.compile(r'"([^"]+)"')
+
+
+def parse_keywords(text):
+    """
+    Parse a keyword list in the sus_words.txt layout: quoted keywords grouped
+    under `# Category` comment lines. Returns {category: [keywords]}.
+    """
+    categories = OrderedDict()
+    category = "Uncategorized"
+    for line in text.splitlines():
+        comment = _COMMENT_RE.match(line)
+        if comment:
+            category = comment.group(1)
+            continue
+        for keyword in _STRING_RE.findall(line):
+            categories.setdefault(category, []).append(keyword)
+    return categories
+
+
+def load_keywords(path=DEFAULT_KEYWORDS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return parse_keywords(f.read())
+
+
+def content_version(data):
+    """Short content hash used as the keyword list version and HTTP ETag"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _bounded(keyword):
+    """Escape a keyword and add word boundaries on its word-character edges"""
+    pattern = re.escape(keyword)
+    if _is_word_char(keyword[0]):
+        pattern = r"\b" + pattern
+    if _is_word_char(keyword[-1]):
+        pattern = pattern + r"\b"
+    return pattern
+
+
+def trie_pattern(keywords):
+    r"""
+    Build a regex equivalent to the word-bounded alternation of `keywords`
+    with shared prefixes factored out, e.g. cash|cash deposit|cash-out ->
+    cash(?: deposit\b|-out\b|\b). Longer keywords are tried first. Uses no
+    lookarounds, so the pattern also runs on RE2 (pyarrow.compute).
+    Raises ValueError for an empty list, whose pattern would match anything.
+    """
+    if not keywords:
+        raise ValueError("No keywords to match")
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node, prev):
+        options = [re.escape(ch) + build(child, ch) for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            options.append(r"\b" if _is_word_char(prev) else "")
+        if len(options) == 1:
+            return options[0]
+        return "(?:" + "|".join(options) + ")"
+
+    starts = []
+    for ch, child in sorted(trie.items()):
+        starts.append((r"\b" if _is_word_char(ch) else "") + re.escape(ch) + build(child, ch))
+    return "(?:" + "|".join(starts) + ")"
+
+
+class KeywordMatcher:
+    """Matches payment instructions against categorized suspicious keywords"""
+
+    def __init__(self, keywords_by_category, version=None):
+        self.version = version
+        self.categories = OrderedDict()
+        for category, keywords in keywords_by_category.items():
+            for keyword in keywords:
+                # First category wins if a keyword is listed twice
+                self.categories.setdefault(keyword.lower(), (keyword, category))
+
+        # Patterns run on lowercased text, which is much cheaper than
+        # re.IGNORECASE across a large alternation
+        lowered = sorted(self.categories, key=len, reverse=True)
+
+        # Shorter keywords contained in a longer one as whole words, e.g.
+        # "cash" inside "cash deposit", which the longest-first scan hides
+        contained = {
+            keyword: [
+                other for other in lowered
+                if other != keyword and re.search(_bounded(other), keyword)
+            ]
+            for keyword in lowered
+        }
+        self._compile(trie_pattern(lowered), contained)
+
+    def _compile(self, pattern, contained):
+        self.pattern = pattern
+        self._contained = contained
+        self._any_re = re.compile(pattern)
+        # Zero-width lookahead so matches starting at every position are found
+        self._all_re = re.compile(f"(?=({pattern}))")
+
+    def to_artifact(self, version=None):
+        """Serialize the compiled matcher so workers can skip rebuilding it"""
+        return {
+            "format": ARTIFACT_FORMAT,
+            "version": version,
+            "pattern": self.pattern,
+            "keywords": [[k, keyword, category] for k, (keyword, category) in self.categories.items()],
+            "contained": self._contained
+        }
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        if artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported keyword matcher artifact format: {artifact.get('format')}")
+        matcher = cls.__new__(cls)
+        matcher.categories = OrderedDict(
+            (k, (keyword, category)) for k, keyword, category in artifact["keywords"]
+        )
+        matcher.version = artifact.get("version")
+        matcher._compile(artifact["pattern"], artifact["contained"])
+        return matcher
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_KEYWORDS_PATH):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        return cls(parse_keywords(text), version=content_version(text))
+
+    @property
+    def keywords(self):
+        return [keyword for keyword, _ in self.categories.values()]
+
+    def _expand(self, lowered_matches):
+        seen = OrderedDict()
+        for match in lowered_matches:
+            seen.setdefault(match, None)
+            for inner in self._contained[match]:
+                seen.setdefault(inner, None)
+        return [self.categories[k] for k in seen]
+
+    def find(self, text):
+        """Return every (keyword, category) pair found in `text`"""
+        if not isinstance(text, str) or not text:
+            return []
+        return self._expand(self._all_re.findall(text.lower()))
+
+    def search(self, text):
+        """Return the first matched keyword or None"""
+        if not isinstance(text, str):
+            return None
+        m = self._any_re.search(text.lower())
+        return self.categories[m.group()][0] if m else None
+
+    def contains(self, values):
+        """
+        Vectorized any-keyword test over a pandas Series, list of strings or
+        pyarrow string array. Returns a boolean NumPy array.
+        """
+        if hasattr(values, "to_pylist") and not isinstance(values, pd.Series):
+            import pyarrow.compute as pc
+
+            mask = pc.match_substring_regex(pc.utf8_lower(values), self.pattern)
+            return np.asarray(pc.fill_null(mask, False).to_numpy(zero_copy_only=False), dtype=bool)
+        values = pd.Series(values, dtype="object").str.lower()
+        return values.str.contains(self._any_re, na=False).to_numpy(dtype=bool)
+
+    def find_all(self, values):
+        """Vectorized find(): a Series of [(keyword, category), ...] per row"""
+        if hasattr(values, "to_pandas") and not isinstance(values, pd.Series):
+            values = values.to_pandas()
+        values = pd.Series(values, dtype="object").str.lower()
+        found = values.str.findall(self._all_re)
+        return found.map(lambda ms: self._expand(ms) if isinstance(ms, list) else [])
+
+    def score(self, values, points=KEYWORD_SCORE):
+        """Rule 2 score column: `points` when any keyword matches, else 0"""
+        return np.where(self.contains(values), points, 0)
+
+
+def save_artifact(matcher, path):
+    """Atomically write a matcher artifact for workers on this host"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(matcher.to_artifact(matcher.version), f)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path):
+    """Load a matcher artifact through a read-only memory map"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return KeywordMatcher.from_artifact(json.loads(mapped[:]))
+
+
+def pull_artifact(url, path, timeout=10):
+    """
+    Fetch the matcher artifact from the keyword service into `path`, reusing
+    the local copy when the service answers 304 Not Modified.
+    """
+    import requests
+
+    headers = {}
+    if os.path.exists(path):
+        headers["If-None-Match"] = f'"{load_artifact(path).version}"'
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code != 304:
+        response.raise_for_status()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+    return load_artifact(path)
+
+
+_default_matcher = None
+
+# Optional keyword service to pull the precompiled matcher from, e.g.
+# http://localhost:8000/api/suspicious-keywords/matcher
+KEYWORD_MATCHER_URL = os.getenv("KEYWORD_MATCHER_URL")
+KEYWORD_MATCHER_PATH = os.getenv("KEYWORD_MATCHER_PATH", "keyword_matcher.json")
+
+
+def get_default_matcher():
+    """
+    Process-wide matcher. Pulled from the keyword service when
+    KEYWORD_MATCHER_URL is set, otherwise compiled from fast-api/sus_words.txt.
+    """
+    global _default_matcher
+    if _default_matcher is None:
+        if KEYWORD_MATCHER_URL:
+            try:
+                _default_matcher = pull_artifact(KEYWORD_MATCHER_URL, KEYWORD_MATCHER_PATH)
+            except Exception as e:
+                print(f"Error pulling keyword matcher from {KEYWORD_MATCHER_URL}: {e}")
+                if os.path.exists(KEYWORD_MATCHER_PATH):
+                    _default_matcher = load_artifact(KEYWORD_MATCHER_PATH)
+        if _default_matcher is None:
+            _default_matcher = KeywordMatcher.from_file()
+    return _default_matcher
@@ -0,0 +1,330 @@
+"""
+Offline exchange-rate store and concurrent backfill.
+
+`RateStore` keeps USD-based conversion rates in a local SQLite file keyed by
+(date, currency), so rates fetched once survive between runs. `backfill`
+fetches the dates that are not stored yet from the exchangerate-api history
+endpoint, concurrently over one pooled aiohttp session, within a request
+budget and with retries. Re-running a backfill resumes from what is already
+stored; `base_url` can point at a local stand-in server.
+
+`RateMatrix` lays stored rates out as a dense date x currency array so a
+whole column of transactions converts with one gather over factorized date
+and currency codes, with a nearest-previous-business-day fallback for dates
+that have no rate.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BASE_URL = "https://v6.exchangerate-api.com/v6"
+RATES_DB_PATH = os.getenv("EXCHANGE_RATES_DB", "exchange_rates.sqlite")
+
+BACKFILL_CONCURRENCY = 8
+BACKFILL_RETRIES = 3
+BACKFILL_BACKOFF_SECONDS = 0.5
+BACKFILL_TIMEOUT_SECONDS = 10
+
+# How many business days back a missing rate may be taken from
+RATE_FALLBACK_DAYS = 3
+
+# exchangerate-api error types: fatal ones stop the whole backfill, the
+# others fail just that date
+FATAL_API_ERRORS = {"invalid-key", "inactive-account", "quota-reached", "plan-upgrade-required"}
+DATE_API_ERRORS = {"no-data-available", "unsupported-code", "malformed-request"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def normalize_date(value):
+    """Parse DD-MM-YYYY or YYYY-MM-DD (or a date/Timestamp) into YYYY-MM-DD"""
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d")
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse date format: {value}")
+
+
+class RateStore:
+    """SQLite-backed (date, currency) -> USD conversion rate table"""
+
+    def __init__(self, path=RATES_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rates (
+                date TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                rate REAL NOT NULL,
+                PRIMARY KEY (date, currency)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS fetched_dates (
+                date TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def put_rates(self, date, rates):
+        """Store every currency rate of one date in a single transaction"""
+        date = normalize_date(date)
+        rows = [(date, currency, float(rate)) for currency, rate in rates.items()]
+        rows.append((date, "USD", 1.0))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO rates VALUES (?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO fetched_dates VALUES (?, ?)", (date, time.time()))
+
+    def get_rates(self, date):
+        """All rates of one date, or None when the date is not stored"""
+        date = normalize_date(date)
+        with self._lock:
+            rows = self._conn.execute("SELECT currency, rate FROM rates WHERE date = ?", (date,)).fetchall()
+        return dict(rows) if rows else None
+
+    def rate(self, date, currency):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rate FROM rates WHERE date = ? AND currency = ?", (normalize_date(date), currency)
+            ).fetchone()
+        return row[0] if row else None
+
+    def dates(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT date FROM fetched_dates")}
+
+    def missing_dates(self, dates):
+        """Normalized dates from `dates` that have not been fetched yet, in order"""
+        stored = self.dates()
+        missing = []
+        for date in dict.fromkeys(normalize_date(d) for d in dates):
+            if date not in stored:
+                missing.append(date)
+        return missing
+
+    def to_frame(self, start=None, end=None):
+        """Stored rates between two dates (inclusive) as a date, currency, rate DataFrame"""
+        # ISO dates compare correctly as text
+        start = normalize_date(start) if start is not None else "0000-00-00"
+        end = normalize_date(end) if end is not None else "9999-99-99"
+        query = "SELECT date, currency, rate FROM rates WHERE date BETWEEN ? AND ?"
+        params = (start, end)
+        with self._lock:
+            return pd.read_sql_query(query, self._conn, params=params)
+
+    def stats(self):
+        with self._lock:
+            dates, rows = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM fetched_dates), (SELECT COUNT(*) FROM rates)"
+            ).fetchone()
+        return {"path": self.path, "dates": dates, "rates": rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def parse_dates(values):
+    """
+    Parse a column of DD-MM-YYYY / YYYY-MM-DD strings into datetime64[D].
+    Each distinct value is parsed once; unparseable values become NaT.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype="object"))
+    parsed = []
+    for value in uniques:
+        try:
+            parsed.append(normalize_date(value))
+        except ValueError:
+            parsed.append("NaT")
+    parsed = np.append(np.array(parsed, dtype="datetime64[D]"), np.datetime64("NaT"))
+    return parsed[codes]
+
+
+class RateMatrix:
+    """
+    Dense daily-calendar x currency array of USD conversion rates. Missing
+    rates fall back to the nearest previous business day with a rate, up to
+    `fallback_days` business days back.
+    """
+
+    def __init__(self, frame, fallback_days=RATE_FALLBACK_DAYS, end=None):
+        self.fallback_days = fallback_days
+        dates = np.asarray(frame["date"], dtype="datetime64[D]")
+        currency_codes, currencies = pd.factorize(frame["currency"], sort=True)
+        self.currencies = pd.Index(currencies)
+
+        if len(dates):
+            self.start = dates.min()
+            # Extend the calendar to `end` so trailing weekends can fall back
+            last = dates.max() if end is None else max(dates.max(), np.datetime64(normalize_date(end)))
+            n_days = int((last - self.start).astype(np.int64)) + 1
+        else:
+            self.start = np.datetime64("1970-01-01")
+            n_days = 0
+        self.rates = np.full((n_days, len(currencies)), np.nan)
+        self.rates[(dates - self.start).astype(np.int64), currency_codes] = np.asarray(frame["rate"], dtype=np.float64)
+
+        # Forward-fill along business days only, then give each calendar day
+        # the filled row of the last business day on or before it
+        calendar = self.start + np.arange(n_days)
+        business = np.is_busday(calendar)
+        filled = pd.DataFrame(self.rates[business]).ffill(limit=fallback_days).to_numpy()
+        previous_business = np.cumsum(business) - 1
+        fallback = np.full_like(self.rates, np.nan)
+        has_previous = previous_business >= 0
+        fallback[has_previous] = filled[previous_business[has_previous]]
+        self.filled = np.where(np.isnan(self.rates), fallback, self.rates)
+
+    @classmethod
+    def from_store(cls, store, start=None, end=None, fallback_days=RATE_FALLBACK_DAYS):
+        """Load the store's rates; `start` is widened so fallbacks can reach before it"""
+        if start is not None:
+            # Enough calendar days to cover `fallback_days` business days plus a weekend
+            start = np.datetime64(normalize_date(start)) - np.timedelta64(fallback_days + 4, "D")
+            start = str(start)
+        return cls(store.to_frame(start, end), fallback_days, end)
+
+    def lookup(self, dates, currencies, fallback=True):
+        """
+        Rates for paired date and currency columns as a float array, NaN
+        where no rate is available. `dates` may be strings or datetimes.
+        """
+        if np.issubdtype(np.asarray(dates).dtype, np.datetime64):
+            days = np.asarray(dates, dtype="datetime64[D]")
+        else:
+            days = parse_dates(dates)
+        day_index = (days - self.start).astype(np.int64)
+        currency_index = self.currencies.get_indexer(pd.Series(currencies, dtype="object"))
+
+        valid = (~np.isnat(days)) & (day_index >= 0) & (day_index < len(self.rates)) & (currency_index >= 0)
+        table = self.filled if fallback else self.rates
+        result = np.full(len(day_index), np.nan)
+        result[valid] = table[day_index[valid], currency_index[valid]]
+        return result
+
+    def stats(self):
+        return {
+            "start": str(self.start),
+            "days": len(self.rates),
+            "currencies": len(self.currencies),
+            "filled_by_fallback": int((np.isnan(self.rates) & ~np.isnan(self.filled)).sum())
+            if len(self.rates) else 0
+        }
+
+
+class RequestBudget:
+    """Caps the number of HTTP requests a backfill may send"""
+
+    def __init__(self, max_requests):
+        self.max_requests = max_requests
+        self.used = 0
+
+    def take(self):
+        if self.used >= self.max_requests:
+            return False
+        self.used += 1
+        return True
+
+
+class _FatalAPIError(Exception):
+    pass
+
+
+async def _fetch_date(session, base_url, api_key, date, budget, retries, backoff):
+    import aiohttp
+
+    year, month, day = date.split("-")
+    url = f"{base_url}/{api_key}/history/USD/{int(year)}/{int(month):02d}/{int(day):02d}"
+
+    for attempt in range(retries + 1):
+        if not budget.take():
+            return None, "budget"
+        try:
+            async with session.get(url) as response:
+                if response.status in RETRY_STATUSES:
+                    error = f"HTTP {response.status}"
+                elif response.status != 200:
+                    return None, f"HTTP {response.status}"
+                else:
+                    data = await response.json(content_type=None)
+                    if data.get("result") == "success":
+                        return data.get("conversion_rates", {}), None
+                    error = data.get("error-type", "Unknown")
+                    if error in FATAL_API_ERRORS:
+                        raise _FatalAPIError(error)
+                    if error in DATE_API_ERRORS:
+                        return None, error
+        except (asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+            error = f"{type(e).__name__}: {e}"
+        except ValueError as e:
+            error = f"bad response: {e}"
+
+        if attempt < retries:
+            await asyncio.sleep(backoff * (2 ** attempt))
+    return None, error
+
+
+async def backfill(store, dates, api_key, base_url=DEFAULT_BASE_URL, concurrency=BACKFILL_CONCURRENCY,
+                   max_requests=29800, retries=BACKFILL_RETRIES, backoff=BACKFILL_BACKOFF_SECONDS,
+                   timeout=BACKFILL_TIMEOUT_SECONDS):
+    """
+    Fetch and store the rates of every date in `dates` not already in
+    `store`. Retries count against `max_requests`. Stops early once the
+    budget is spent or the API reports a fatal error such as quota-reached;
+    run it again to resume. Returns a summary dict.
+    """
+    import aiohttp
+
+    missing = store.missing_dates(dates)
+    budget = RequestBudget(max_requests)
+    summary = {"requested": len(missing), "fetched": 0, "failed": {}, "stopped": None}
+    if not missing:
+        summary.update(requests=0, remaining=0)
+        return summary
+
+    queue = asyncio.Queue()
+    for date in missing:
+        queue.put_nowait(date)
+    stop = asyncio.Event()
+
+    async def worker(session):
+        while not stop.is_set():
+            try:
+                date = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                rates, error = await _fetch_date(session, base_url, api_key, date, budget, retries, backoff)
+            except _FatalAPIError as e:
+                summary["stopped"] = str(e)
+                stop.set()
+                return
+            if error == "budget":
+                summary["stopped"] = f"request budget of {max_requests} spent"
+                stop.set()
+                return
+            if rates is None:
+                summary["failed"][date] = error
+                continue
+            store.put_rates(date, rates)
+            summary["fetched"] += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+
+    summary["requests"] = budget.used
+    summary["remaining"] = len(store.missing_dates(missing))
+    return summary
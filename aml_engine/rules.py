@@ -0,0 +1,193 @@
+"""
+Unified AML rule engine.
+
+Defines the five scoring rules once, with the thresholds and points from
+fast-api/model.ipynb, and evaluates them either over whole columns
+(`RuleEngine.evaluate`) or for a single transaction (`RuleEngine.evaluate_one`):
+
+    Rule1  beneficiary country risk tier      2 / 4 / 10 (aml_engine.country_risk)
+    Rule2  suspicious keyword in instruction  3
+    Rule3  amount_usd > $1,000,000            3
+    Rule4  structuring within 3 days          5
+    Rule5  rounded transaction amount         2
+
+A transaction is suspicious when total_score >= 3. Scoring output carries the
+version of the country risk table it was computed with.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aml_engine.country_risk import get_default_index
+from aml_engine.keywords import KEYWORD_SCORE, get_default_matcher
+from aml_engine.structuring import (
+    STRUCTURING_MAX_AMOUNT,
+    STRUCTURING_MIN_AMOUNT,
+    STRUCTURING_SCORE,
+    STRUCTURING_SUM_THRESHOLD,
+    STRUCTURING_WINDOW,
+    detect_structuring,
+)
+
+HIGH_AMOUNT_THRESHOLD = 1_000_000
+HIGH_AMOUNT_SCORE = 3
+ROUNDED_AMOUNT_UNIT = 1000
+ROUNDED_AMOUNT_SCORE = 2
+SUSPICIOUS_THRESHOLD = 3
+
+RULE_COLUMNS = ["Rule1_score", "Rule2_score", "Rule3_score", "Rule4_score", "Rule5_score"]
+
+
+class RuleEngine:
+    """Evaluates the AML scoring rules in bulk or for one transaction"""
+
+    def __init__(self, keyword_matcher=None, country_index=None, structuring_options=None):
+        self.keyword_matcher = keyword_matcher or get_default_matcher()
+        self.country_index = country_index or get_default_index()
+        self.structuring_options = structuring_options or {}
+
+    # ----- Columnar evaluation -----
+
+    def country_score(self, countries):
+        return self.country_index.scores(countries)
+
+    def evaluate(self, df, keywords=True, structuring=True):
+        """
+        Score every row of a transactions DataFrame. Returns a DataFrame
+        aligned with `df` holding Rule1_score..Rule5_score, total_score and
+        is_suspicious, with the country risk table version in
+        `scores.attrs["country_risk_version"]`. Rule2 and Rule4 can be skipped when their inputs
+        (payment_instruction; account_key/transaction_date) are unavailable.
+        """
+        n = len(df)
+        amount_usd = df["amount_usd"].to_numpy(dtype=np.float64)
+        transaction_amount = (
+            df["transaction_amount"].to_numpy(dtype=np.float64) if "transaction_amount" in df else amount_usd
+        )
+
+        scores = pd.DataFrame(index=df.index)
+        scores["Rule1_score"] = self.country_score(df["beneficiary_country"])
+        if keywords and "payment_instruction" in df:
+            scores["Rule2_score"] = self.keyword_matcher.score(df["payment_instruction"], KEYWORD_SCORE)
+        else:
+            scores["Rule2_score"] = np.zeros(n, dtype=np.int64)
+        scores["Rule3_score"] = np.where(amount_usd > HIGH_AMOUNT_THRESHOLD, HIGH_AMOUNT_SCORE, 0)
+        if structuring and "account_key" in df and "transaction_date" in df:
+            scores["Rule4_score"] = detect_structuring(df, score=STRUCTURING_SCORE, **self.structuring_options)
+        else:
+            scores["Rule4_score"] = np.zeros(n, dtype=np.int64)
+        scores["Rule5_score"] = np.where(
+            (transaction_amount % ROUNDED_AMOUNT_UNIT) == 0, ROUNDED_AMOUNT_SCORE, 0
+        )
+
+        total = np.zeros(n, dtype=np.int64)
+        for column in RULE_COLUMNS:
+            total += scores[column].to_numpy(dtype=np.int64)
+        scores["total_score"] = total
+        scores["is_suspicious"] = total >= SUSPICIOUS_THRESHOLD
+        scores.attrs["country_risk_version"] = self.country_index.version
+        return scores
+
+    def explain_frame(self, df, scores):
+        """Triggered-rule explanations for each row of an evaluate() result"""
+        explanations = []
+        for transaction, row in zip(df.to_dict("records"), scores[RULE_COLUMNS].to_dict("records")):
+            explanations.append(self.explain(transaction, row) if any(row.values()) else [])
+        return pd.Series(explanations, index=df.index)
+
+    # ----- Single-record fast path -----
+
+    def evaluate_one(self, transaction, structuring_state=None):
+        """
+        Score one transaction dict. Rule 4 comes from `structuring_state`
+        (aml_engine.structuring_stream.StructuringState) when given, otherwise
+        from a precomputed Rule4_score/structuring_score on the transaction.
+        """
+        amount_usd = float(transaction.get("amount_usd") or 0)
+        transaction_amount = transaction.get("transaction_amount")
+        if transaction_amount is None:
+            transaction_amount = amount_usd
+
+        rule4 = 0
+        flagged_ids = []
+        if structuring_state is not None and transaction.get("account_key") and transaction.get("transaction_date"):
+            rule4, flagged_ids = structuring_state.update(
+                transaction["account_key"], transaction.get("transaction_id"),
+                transaction["transaction_date"], amount_usd
+            )
+        else:
+            precomputed = transaction.get("Rule4_score", transaction.get("structuring_score"))
+            if precomputed is not None and not pd.isna(precomputed):
+                rule4 = int(precomputed)
+
+        scores = {
+            "Rule1_score": self.country_index.score(transaction.get("beneficiary_country")),
+            "Rule2_score": KEYWORD_SCORE if self.keyword_matcher.search(transaction.get("payment_instruction")) else 0,
+            "Rule3_score": HIGH_AMOUNT_SCORE if amount_usd > HIGH_AMOUNT_THRESHOLD else 0,
+            "Rule4_score": rule4,
+            "Rule5_score": ROUNDED_AMOUNT_SCORE if float(transaction_amount) % ROUNDED_AMOUNT_UNIT == 0 else 0,
+        }
+        total = sum(scores.values())
+        return {
+            **scores,
+            "total_score": total,
+            "is_suspicious": total >= SUSPICIOUS_THRESHOLD,
+            "structuring_flagged_ids": flagged_ids,
+            "country_risk_version": self.country_index.version,
+            "triggered_rules": self.explain(transaction, scores)
+        }
+
+    def explain(self, transaction, scores):
+        """Human-readable triggered rules in the format used by the chatbot"""
+        rules_triggered = []
+        amount_usd = float(transaction.get("amount_usd") or 0)
+
+        if scores["Rule1_score"]:
+            country = transaction.get("beneficiary_country")
+            rules_triggered.append({
+                "rule": "High-risk country",
+                "score": int(scores["Rule1_score"]),
+                "details": f"Beneficiary country {country} is in risk level {self.country_index.tier(country)}"
+            })
+        if scores["Rule2_score"]:
+            matches = self.keyword_matcher.find(transaction.get("payment_instruction"))
+            found = ", ".join(f"'{keyword}' ({category})" for keyword, category in matches)
+            rules_triggered.append({
+                "rule": "Suspicious keyword",
+                "score": int(scores["Rule2_score"]),
+                "details": f"Payment instruction contains suspicious keyword: {found}"
+            })
+        if scores["Rule3_score"]:
+            rules_triggered.append({
+                "rule": "High amount",
+                "score": int(scores["Rule3_score"]),
+                "details": f"Transaction amount ${amount_usd:,.2f} exceeds ${HIGH_AMOUNT_THRESHOLD:,}"
+            })
+        if scores["Rule4_score"]:
+            rules_triggered.append({
+                "rule": "Potential structuring",
+                "score": int(scores["Rule4_score"]),
+                "details": (
+                    f"Part of a {STRUCTURING_WINDOW.days}-day window of "
+                    f"${STRUCTURING_MIN_AMOUNT:,}-${STRUCTURING_MAX_AMOUNT:,} transactions "
+                    f"totalling over ${STRUCTURING_SUM_THRESHOLD:,}"
+                )
+            })
+        if scores["Rule5_score"]:
+            rules_triggered.append({
+                "rule": "Rounded amount",
+                "score": int(scores["Rule5_score"]),
+                "details": f"Transaction amount is a round number (multiple of ${ROUNDED_AMOUNT_UNIT:,})"
+            })
+        return rules_triggered
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    """Process-wide rule engine"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = RuleEngine()
+    return _default_engine
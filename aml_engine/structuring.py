@@ -0,0 +1,94 @@
+"""
+Vectorized structuring detector (Rule 4).
+
+Equivalent to the per-account window loop in fast-api/model.ipynb (Step 4):
+every transaction in the amount band that falls inside any window
+[t, t + window) of the same account whose in-band amounts sum above the
+threshold is flagged. Instead of re-filtering the account's rows for every
+transaction, the in-band rows are sorted once and each window's end is found
+with a single `searchsorted`, so the whole dataset is scored in O(n log n).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Defaults from fast-api/model.ipynb
+STRUCTURING_WINDOW = pd.Timedelta(days=3)
+STRUCTURING_MIN_AMOUNT = 800_000
+STRUCTURING_MAX_AMOUNT = 999_999
+STRUCTURING_SUM_THRESHOLD = 1_000_000
+STRUCTURING_SCORE = 5
+
+
+def structuring_mask(account_codes, times_ns, amounts,
+                     window=STRUCTURING_WINDOW,
+                     min_amount=STRUCTURING_MIN_AMOUNT,
+                     max_amount=STRUCTURING_MAX_AMOUNT,
+                     sum_threshold=STRUCTURING_SUM_THRESHOLD):
+    """
+    Core detector over NumPy arrays.
+
+    account_codes: integer account ids (e.g. from pd.factorize)
+    times_ns: int64 nanosecond timestamps, with NaT as the int64 minimum
+    amounts: transaction amounts in USD
+    Returns a boolean array marking every flagged transaction.
+    """
+    account_codes = np.asarray(account_codes, dtype=np.int64)
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    amounts = np.asarray(amounts)
+    n = len(amounts)
+    flagged = np.zeros(n, dtype=bool)
+
+    in_band = (amounts >= min_amount) & (amounts <= max_amount) & (times_ns != np.iinfo(np.int64).min)
+    rows = np.flatnonzero(in_band)
+    if rows.size == 0:
+        return flagged
+
+    # Sort the in-band rows once by (account, time)
+    order = np.lexsort((times_ns[rows], account_codes[rows]))
+    rows = rows[order]
+    acc = account_codes[rows]
+    t = times_ns[rows]
+    amt = amounts[rows].astype(np.int64 if np.issubdtype(amounts.dtype, np.integer) else np.float64)
+
+    # Rank timestamps so (account, time) packs into one sortable int64 key
+    # without overflow; `limit` counts distinct times strictly before t + window.
+    unique_times = np.unique(t)
+    rank = np.searchsorted(unique_times, t)
+    limit = np.searchsorted(unique_times, t + int(pd.Timedelta(window).value), side="left")
+    stride = len(unique_times) + 1
+    acc = acc - acc.min()
+    keys = acc * stride + rank
+    ends = np.searchsorted(keys, acc * stride + limit, side="left")
+    starts = np.arange(len(rows))
+
+    # Window sums from prefix sums: window i covers sorted rows [i, ends[i])
+    prefix = np.concatenate(([0], np.cumsum(amt)))
+    qualifying = (prefix[ends] - prefix[starts]) > sum_threshold
+    if not qualifying.any():
+        return flagged
+
+    # Mark the union of qualifying windows with a difference array
+    coverage = np.bincount(starts[qualifying], minlength=len(rows) + 1)
+    coverage -= np.bincount(ends[qualifying], minlength=len(rows) + 1)
+    flagged[rows[np.cumsum(coverage)[:-1] > 0]] = True
+    return flagged
+
+
+def detect_structuring(df, account_col="account_key", date_col="transaction_date",
+                       amount_col="amount_usd", score=STRUCTURING_SCORE, **window_options):
+    """
+    Structuring score column for a transactions DataFrame, aligned with its
+    rows: `score` for flagged transactions, else 0. `window_options` are
+    passed to structuring_mask (window, min_amount, max_amount,
+    sum_threshold).
+    """
+    dates = df[date_col]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    times_ns = dates.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    account_codes, _ = pd.factorize(df[account_col])
+    amounts = df[amount_col].to_numpy()
+
+    flagged = structuring_mask(account_codes, times_ns, amounts, **window_options)
+    return np.where(flagged, score, 0)
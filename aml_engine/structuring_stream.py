@@ -0,0 +1,183 @@
+"""
+Incremental structuring state for online scoring (Rule 4).
+
+Keeps, per account_key, the in-band transactions of the trailing window in a
+deque with a running sum. Each arrival evicts expired events and appends the
+new one, so an update is O(1) amortized. When the window sum crosses the
+threshold every transaction still in the window is flagged, including
+earlier ones, which are reported back as retroactively flagged ids; the
+window keeps its unflagged events apart so a crossing only visits those.
+Updates are idempotent per transaction_id: a transaction seen again while
+it is still in its account's window (a client retry after a 429, a batch
+re-sent after a failure) is found by id and not added twice.
+
+For time-ordered arrivals the union of flagged transactions equals what
+aml_engine.structuring.detect_structuring finds over the full history.
+"""
+
+import os
+import pickle
+import threading
+from collections import deque
+
+import pandas as pd
+
+from aml_engine.structuring import (
+    STRUCTURING_MAX_AMOUNT,
+    STRUCTURING_MIN_AMOUNT,
+    STRUCTURING_SCORE,
+    STRUCTURING_SUM_THRESHOLD,
+    STRUCTURING_WINDOW,
+)
+
+SNAPSHOT_VERSION = 1
+
+
+class _AccountWindow:
+    """In-band events of one account inside the trailing window"""
+
+    __slots__ = ("events", "total", "last_seen", "ids", "unflagged")
+
+    def __init__(self, events=()):
+        # Each event is [timestamp_ns, amount, transaction_id, flagged]
+        self.events = deque(events)
+        self.total = sum(e[1] for e in self.events)
+        self.last_seen = 0
+        # transaction_id -> event
+        self.ids = {e[2]: e for e in self.events if e[2] is not None}
+        # id(event) -> event, for events not flagged yet
+        self.unflagged = {id(e): e for e in self.events if not e[3]}
+
+    def add(self, index, event):
+        self.events.insert(index, event)
+        self.total += event[1]
+        if event[2] is not None:
+            self.ids[event[2]] = event
+        self.unflagged[id(event)] = event
+
+    def popleft(self):
+        event = self.events.popleft()
+        self.total -= event[1]
+        if self.ids.get(event[2]) is event:
+            del self.ids[event[2]]
+        self.unflagged.pop(id(event), None)
+
+
+class StructuringState:
+    """Per-account sliding-window structuring detector"""
+
+    def __init__(self, window=STRUCTURING_WINDOW, min_amount=STRUCTURING_MIN_AMOUNT,
+                 max_amount=STRUCTURING_MAX_AMOUNT, sum_threshold=STRUCTURING_SUM_THRESHOLD,
+                 score=STRUCTURING_SCORE):
+        self.window_ns = int(pd.Timedelta(window).value)
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.sum_threshold = sum_threshold
+        self.score = score
+        self.accounts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_ns(timestamp):
+        if isinstance(timestamp, int):
+            return timestamp
+        return int(pd.Timestamp(timestamp).value)
+
+    def _evict(self, state, now_ns):
+        events = state.events
+        while events and events[0][0] <= now_ns - self.window_ns:
+            state.popleft()
+
+    def update(self, account_key, transaction_id, timestamp, amount):
+        """
+        Add one transaction. Returns (score, flagged_ids) where score is the
+        Rule 4 score of this transaction and flagged_ids lists the
+        transactions newly flagged by this arrival (possibly earlier ones).
+        A transaction_id already in the window only reports its score.
+        """
+        if not (self.min_amount <= amount <= self.max_amount):
+            return 0, []
+        now_ns = self._to_ns(timestamp)
+
+        with self._lock:
+            state = self.accounts.get(account_key)
+            if state is None:
+                state = self.accounts[account_key] = _AccountWindow()
+
+            seen = state.ids.get(transaction_id) if transaction_id is not None else None
+            if seen is not None:
+                return (self.score if seen[3] else 0), []
+            events = state.events
+            event = [now_ns, float(amount), transaction_id, False]
+            # Late arrivals are inserted so the window stays ordered by time
+            i = len(events)
+            while i > 0 and events[i - 1][0] > now_ns:
+                i -= 1
+            state.add(i, event)
+            state.last_seen = max(state.last_seen, now_ns)
+            self._evict(state, state.last_seen)
+
+            expired = now_ns <= state.last_seen - self.window_ns
+            if expired or state.total <= self.sum_threshold:
+                return 0, []
+
+            flagged_ids = []
+            for e in sorted(state.unflagged.values(), key=lambda e: e[0]):
+                e[3] = True
+                flagged_ids.append(e[2])
+            state.unflagged.clear()
+            return self.score, flagged_ids
+
+    def prune(self, now=None):
+        """Drop accounts whose whole window has expired"""
+        with self._lock:
+            if now is None:
+                now_ns = max((s.last_seen for s in self.accounts.values()), default=0)
+            else:
+                now_ns = self._to_ns(now)
+            expired = [k for k, s in self.accounts.items() if s.last_seen <= now_ns - self.window_ns]
+            for key in expired:
+                del self.accounts[key]
+            return len(expired)
+
+    def snapshot(self, path):
+        """Atomically write the state to `path`"""
+        with self._lock:
+            data = {
+                "version": SNAPSHOT_VERSION,
+                "window_ns": self.window_ns,
+                "accounts": {
+                    key: (state.last_seen, list(map(tuple, state.events)))
+                    for key, state in self.accounts.items()
+                    if state.events
+                }
+            }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def restore(self, path):
+        """Load a snapshot written by snapshot(). Returns False if none exists."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != SNAPSHOT_VERSION or data.get("window_ns") != self.window_ns:
+            print(f"Ignoring incompatible structuring snapshot at {path}")
+            return False
+
+        accounts = {}
+        for key, (last_seen, events) in data["accounts"].items():
+            state = _AccountWindow(list(e) for e in events)
+            state.last_seen = last_seen
+            accounts[key] = state
+        with self._lock:
+            self.accounts = accounts
+        return True
+
+    def stats(self):
+        return {
+            "accounts": len(self.accounts),
+            "events": sum(len(s.events) for s in self.accounts.values())
+        }
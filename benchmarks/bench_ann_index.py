@@ -0,0 +1,108 @@
+"""
+Evaluation harness for the vector index types of chatbot/vector_index.py
+(VECTOR_INDEX_TYPE): recall@k of each approximate index against exact flat
+search, single-query latency and index memory, over a sweep of the
+query-time knobs (ANN_NPROBE for IVF, ANN_EF_SEARCH for HNSW).
+
+Vectors are drawn from a Gaussian mixture and L2-normalised, like sentence
+embeddings of similar transactions, and queries are held-out draws from the
+same mixture. Each index is built through AnnIndex exactly as the service
+builds it (batched adds, IVF trained on a sample of ANN_TRAIN_SIZE).
+
+Usage: python benchmarks/bench_ann_index.py [rows] [--dim 384] [--queries 500] [--k 10] [--threads 1]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+
+from vector_index import AnnIndex
+
+ADD_BATCH = 10000
+SWEEPS = {
+    "flat": [None],
+    "ivf_flat": [1, 4, 16, 64],
+    "ivf_pq": [4, 16, 64],
+    "hnsw": [16, 32, 64, 128, 256],
+}
+
+
+def embedding_like(n, dim, seed, clusters=1000):
+    """Normalised vectors around `clusters` topics"""
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(0).normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build(kind, vectors):
+    ann = AnnIndex(vectors.shape[1], kind)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), ADD_BATCH):
+        ann.add(np.arange(i, min(i + ADD_BATCH, len(vectors))), vectors[i:i + ADD_BATCH])
+    ann.train()
+    return ann, time.perf_counter() - start
+
+
+def evaluate(ann, queries, truth, k):
+    """(recall@k, p50 ms, p99 ms) over single-vector searches"""
+    found = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = ann.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return recall, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads per search")
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(args.threads)
+
+    vectors = embedding_like(args.rows, args.dim, seed=1)
+    queries = embedding_like(args.queries, args.dim, seed=2)
+
+    print(f"{args.rows:,} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs flat, "
+          f"{args.threads} thread(s)")
+    print(f"{'index':<9} {'knob':>12} {'build s':>8} {'MB':>8} {'B/vector':>9} {f'recall@{args.k}':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    truth = None
+    for kind, knobs in SWEEPS.items():
+        ann, build_seconds = build(kind, vectors)
+        size = len(faiss.serialize_index(ann.index))
+        for knob in knobs:
+            label = ""
+            if kind.startswith("ivf"):
+                ann.nprobe = knob
+                label = f"nprobe={knob}"
+            elif kind == "hnsw":
+                ann.ef_search = knob
+                label = f"efSearch={knob}"
+            if truth is None:
+                # The flat index goes first and is exact
+                truth = [ann.search(q[None, :], args.k)[1][0] for q in queries]
+            recall, p50, p99 = evaluate(ann, queries, truth, args.k)
+            print(f"{kind:<9} {label:>12} {build_seconds:>8.1f} {size / 1e6:>8.1f} {size / args.rows:>9.0f} "
+                  f"{recall:>10.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Hit ratio and latency of chatbot/answer_cache.py on a replayed analyst
+workload: questions drawn with Zipf popularity from a fixed set, each asked
+in several phrasings, including per-transaction questions whose IDs must
+never share an answer. Halfway through, the dataset changes (as after
+/refresh-data) and the cache must start over.
+
+Each configuration replays the same stream: no cache, exact match only, and
+exact plus paraphrase match at --similarity. A miss costs a RAG call,
+simulated as --llm-ms, plus --embed-ms for the question embedding when
+paraphrases are matched; lookups are timed for real. Embeddings are
+normalised bags of words, standing in for a sentence model. A paraphrase
+hit that returns the answer of a different question counts as wrong.
+
+Usage: python benchmarks/bench_answer_cache.py [requests] [--llm-ms 3000] [--embed-ms 20] [--similarity 0.8]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+
+from answer_cache import AnswerCache
+
+DIM = 512
+STOPWORDS = {"a", "an", "the", "is", "are", "was", "were", "did", "do", "does", "of", "in", "me", "get", "got", "to",
+             "there", "any", "for", "what", "which", "show", "tell"}
+PHRASINGS = [
+    ["Which transactions look like structuring?", "Show me transactions that look like structuring",
+     "what transactions look like structuring"],
+    ["What patterns do you see in suspicious transactions?", "Which patterns are there in the suspicious transactions?",
+     "patterns in suspicious transactions"],
+    ["Are there any unusual payment instructions?", "Show unusual payment instructions",
+     "any unusual payment instructions?"],
+    ["Which rules trigger most often?", "What rules trigger most often", "rules that trigger most often"],
+    ["Explain the risk of payments to IR", "What is the risk of payments to IR?", "explain risk of payments to IR"],
+    ["Explain the risk of payments to DE", "What is the risk of payments to DE?", "explain risk of payments to DE"],
+    ["Are there round-amount transfers just below reporting thresholds?",
+     "Show round-amount transfers just below the reporting thresholds", "round amount transfers below thresholds"],
+    ["Which transactions are not suspicious but high value?", "Show high value transactions that are not suspicious",
+     "high value not suspicious transactions"],
+    ["Which transactions are suspicious and high value?", "Show high value transactions that are suspicious",
+     "high value suspicious transactions"],
+]
+ID_PHRASINGS = ["Why was transaction {} flagged?", "why did transaction {} get flagged", "Why was {} flagged"]
+
+
+def bag_of_words(text):
+    vector = np.zeros(DIM, dtype=np.float32)
+    for word in re.findall(r"[\w-]+", text.lower()):
+        if word not in STOPWORDS:
+            vector[zlib.crc32(word.encode()) % DIM] += 1
+    return vector
+
+
+def workload(n, ids, seed=4):
+    """(question, canonical question id) pairs with Zipf-distributed popularity"""
+    groups = PHRASINGS + [[p.format(i) for p in ID_PHRASINGS] for i in ids]
+    rng = np.random.default_rng(seed)
+    ranks = rng.permutation(len(groups))
+    weights = 1 / (np.arange(len(groups)) + 1) ** 1.1
+    picks = rng.choice(len(groups), n, p=weights / weights.sum())
+    return [(groups[ranks[g]][rng.integers(len(groups[ranks[g]]))], ranks[g]) for g in picks]
+
+
+def replay(stream, args, mode):
+    """Per-request latency (seconds) and the cache, for one configuration"""
+    state = {"version": 1}
+    cache = None
+    if mode != "none":
+        cache = AnswerCache(version=lambda: state["version"], embed=bag_of_words,
+                            similarity=args.similarity if mode == "semantic" else 0,
+                            max_entries=args.size, ttl=args.ttl)
+    latencies, wrong = [], 0
+    for i, (question, canonical) in enumerate(stream):
+        if i == len(stream) // 2:
+            state["version"] += 1
+        if cache is None:
+            latencies.append(args.llm_ms / 1000)
+            continue
+        start = time.perf_counter()
+        hit = cache.get(question)
+        extra = 0
+        vector = None
+        if hit is None and cache.semantic:
+            vector = cache.embed(question)
+            extra += args.embed_ms / 1000
+            hit = cache.get(question, vector)
+        seconds = time.perf_counter() - start + extra
+        if hit is None:
+            seconds += args.llm_ms / 1000
+            cache.put(question, {"answer": f"answer {canonical}", "canonical": int(canonical)}, args.llm_ms / 1000,
+                      vector=vector, version=state["version"])
+        elif hit["canonical"] != canonical:
+            wrong += 1
+        latencies.append(seconds)
+    return np.array(latencies), cache, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("requests", nargs="?", type=int, default=5000)
+    parser.add_argument("--ids", type=int, default=300, help="Distinct transactions asked about")
+    parser.add_argument("--llm-ms", type=float, default=3000, help="Simulated cost of one RAG call")
+    parser.add_argument("--embed-ms", type=float, default=20, help="Simulated cost of embedding a question")
+    parser.add_argument("--similarity", type=float, default=0.8)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--ttl", type=float, default=3600)
+    args = parser.parse_args()
+
+    ids = [f"TX{n:06d}" for n in np.random.default_rng(2).choice(10**6, args.ids, replace=False)]
+    stream = workload(args.requests, ids)
+
+    print(f"{len(stream):,} requests over {len(PHRASINGS) + len(ids)} questions x 3 phrasings, "
+          f"dataset changed after {len(stream) // 2:,}; RAG {args.llm_ms:.0f} ms, embedding {args.embed_ms:.0f} ms")
+    print(f"{'cache':<22} {'hit ratio':>9} {'wrong':>6} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'saved s':>9} "
+          f"{'entries':>8} {'KB':>7} {'inval.':>7}")
+    for label, mode in [("none", "none"), ("exact", "exact"), (f"paraphrase >= {args.similarity:g}", "semantic")]:
+        latencies, cache, wrong = replay(stream, args, mode)
+        stats = cache.stats if cache is not None else {}
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f"{label:<22} {stats.get('hit_ratio', 0):>9.3f} {wrong:>6} {p50:>9.2f} {p95:>9.2f} "
+              f"{latencies.mean() * 1000:>9.1f} {stats.get('saved_seconds', 0):>9.0f} {stats.get('entries', 0):>8} "
+              f"{stats.get('bytes', 0) / 1e3:>7.1f} {stats.get('invalidations', 0):>7}")
+        assert wrong == 0, f"{wrong} paraphrase hits returned another question's answer"
+
+
+if __name__ == "__main__":
+    main()
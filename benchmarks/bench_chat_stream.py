@@ -0,0 +1,163 @@
+"""
+Time to first token of chatbot/api.py: POST /chat, which returns once the
+whole answer is generated, against POST /chat/stream, which sends the
+retrieved sources as soon as retrieval is done and then each token as the
+LLM produces it. Also checks that closing the stream early stops the
+generation.
+
+The API runs in-process under uvicorn over a real socket, with a vector
+index of synthetic transactions (deterministic fake embeddings) and a fake
+LLM standing in for Ollama: --prefill-ms before the first token, then one
+word every --token-ms, whether streamed or not.
+
+Usage: python benchmarks/bench_chat_stream.py [requests] [--rows 2000] [--prefill-ms 300] [--token-ms 40]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+from langchain_core.language_models.fake import FakeStreamingListLLM
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import api
+from bench_incremental_index import DIM, LatencyEmbeddings
+from bench_transaction_store import synthetic_transactions
+from hybrid_retriever import HybridRetriever
+from vector_index import IncrementalIndex
+
+ANSWER = (
+    "Transactions 3 and 17 were flagged because several transfers just below the reporting threshold went from "
+    "the same account to IR within two days, a pattern typical of structuring. Their risk scores of 8 and 9 also "
+    "reflect the high-risk destination and the unusual payment instructions."
+)
+
+
+class SlowTokenLLM(FakeStreamingListLLM):
+    """Fake LLM that takes `prefill` seconds, then `sleep` seconds per word"""
+
+    prefill: float = 0.3
+    produced: int = 0
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        response = super()._call(prompt, stop, run_manager, **kwargs)
+        words = re.findall(r"\S+\s*", response)
+        time.sleep(self.prefill + self.sleep * len(words))
+        self.produced += len(words)
+        return response
+
+    def stream(self, input, config=None, *, stop=None, **kwargs):
+        response = super()._call(str(input))
+        time.sleep(self.prefill)
+        for word in re.findall(r"\S+\s*", response):
+            time.sleep(self.sleep)
+            self.produced += 1
+            yield word
+
+
+def serve():
+    """Run api.app on a free port in a thread; returns (server, base url)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def timed_stream(client, url, question, stop_after=None):
+    """Seconds to the sources event, the first token and the end, and the tokens read"""
+    start = time.perf_counter()
+    marks = {}
+    tokens = []
+    with client.stream("POST", f"{url}/chat/stream", json={"message": question}) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                marks.setdefault(event, time.perf_counter() - start)
+                if event == "token":
+                    tokens.append(json.loads(line[6:])["text"])
+                    if stop_after and len(tokens) >= stop_after:
+                        break
+                assert event != "error", line
+    return marks, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("requests", nargs="?", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--prefill-ms", type=float, default=300, help="Simulated prompt processing before token 1")
+    parser.add_argument("--token-ms", type=float, default=40, help="Simulated time per generated token")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api.embeddings = LatencyEmbeddings(size=DIM, call_seconds=0, text_seconds=0)
+        api.vector_index = IncrementalIndex.create(os.path.join(tmp, "index"), api.embeddings, "bench")
+        api.vector_index.upsert(synthetic_transactions(args.rows).astype(str), source="bench")
+        api.vector_store = api.vector_index.vector_store
+        api.llm = SlowTokenLLM(responses=[ANSWER], sleep=args.token_ms / 1000, prefill=args.prefill_ms / 1000)
+        api.retriever = HybridRetriever(index=api.vector_index)
+        api.rag_chain = api.build_rag_chain(api.retriever)
+        words = len(re.findall(r"\S+\s*", ANSWER))
+        server, url = serve()
+
+        blocking, sources, first, done = [], [], [], []
+        with httpx.Client(timeout=60) as client:
+            for i in range(args.requests):
+                # Distinct questions, so no answer comes from the cache
+                start = time.perf_counter()
+                response = client.post(f"{url}/chat", json={"message": f"Why were these flagged? ({i})"})
+                response.raise_for_status()
+                blocking.append(time.perf_counter() - start)
+
+                marks, tokens = timed_stream(client, url, f"Why were these flagged? (stream {i})")
+                assert "".join(tokens) == response.json()["answer"], "streamed answer differs"
+                sources.append(marks["sources"])
+                first.append(marks["token"])
+                done.append(marks["done"])
+
+            # Disconnect after a few tokens: the worker must stop generating
+            before = api.llm.produced
+            _, tokens = timed_stream(client, url, "Why were these flagged? (disconnect)", stop_after=3)
+            time.sleep(args.prefill_ms / 1000 + words * args.token_ms / 1000)
+            generated = api.llm.produced - before
+            in_flight = api.executor.in_flight
+
+        server.should_exit = True
+        api.vector_index.close()
+
+    def p50(values):
+        return np.percentile(values, 50) * 1000
+
+    print(f"{args.requests} questions, {args.rows:,} indexed transactions, answer of {words} tokens, "
+          f"prefill {args.prefill_ms:.0f} ms + {args.token_ms:.0f} ms/token")
+    print(f"{'endpoint':<14} {'sources ms':>11} {'first token ms':>15} {'complete ms':>12}")
+    print(f"{'/chat':<14} {p50(blocking):>11.0f} {p50(blocking):>15.0f} {p50(blocking):>12.0f}")
+    print(f"{'/chat/stream':<14} {p50(sources):>11.0f} {p50(first):>15.0f} {p50(done):>12.0f}")
+    print(f"Time to first token {p50(blocking) / p50(first):.1f}x shorter; "
+          f"client left after {len(tokens)} tokens and generation stopped after {generated} of {words} "
+          f"({in_flight} workers still busy)")
+    assert generated < words, "generation kept running after the client disconnected"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+USD conversion of a transactions file: the row-wise DataFrame.apply over a
+dict of per-date rates that correct_exchange_rate_converter.py used, against
+aml_engine.rates.RateMatrix, which gathers from a dense date x currency array.
+
+The synthetic data mirrors dataset/original_dataset.csv (100k rows, DD-MM-YYYY
+dates). Rates are stored for business days only, so weekend transactions
+exercise the previous-business-day fallback; those rows are checked against
+an explicit day-by-day walk back.
+
+Usage: python benchmarks/bench_currency_conversion.py [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.rates import RateMatrix, RateStore, parse_dates
+
+CURRENCIES = ["USD", "EUR", "GBP", "INR", "JPY", "AED", "CHF", "SGD", "BRL", "ZAR", "CNY", "AUD"]
+
+
+def synthetic_transactions(n, days=730, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-01", periods=days)
+    return pd.DataFrame({
+        "transaction_date": dates[rng.integers(0, days, n)].strftime("%d-%m-%Y"),
+        "currency_code": rng.choice(CURRENCIES, n),
+        "transaction_amount": rng.lognormal(9, 2, n).round(2)
+    })
+
+
+def fill_store(store, days=730, seed=4):
+    rng = np.random.default_rng(seed)
+    rate_cache = {}
+    for day in pd.bdate_range("2022-01-01", periods=days, freq="B"):
+        rates = {c: float(rng.uniform(0.5, 150)) for c in CURRENCIES if c != "USD"}
+        store.put_rates(day.strftime("%Y-%m-%d"), rates)
+        rate_cache[day.strftime("%d-%m-%Y")] = {**rates, "USD": 1.0}
+    return rate_cache
+
+
+def previous_business_day_rate(rate_cache, date, currency, limit):
+    day = pd.Timestamp(pd.to_datetime(date, format="%d-%m-%Y"))
+    for _ in range(limit + 3):
+        if day.strftime("%d-%m-%Y") in rate_cache:
+            return rate_cache[day.strftime("%d-%m-%Y")][currency]
+        day -= pd.Timedelta(days=1)
+    return np.nan
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = synthetic_transactions(n)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateStore(os.path.join(tmp, "rates.sqlite"))
+        rate_cache = fill_store(store)
+
+        start = time.perf_counter()
+        before = df.apply(
+            lambda row: rate_cache.get(row['transaction_date'], {}).get(row['currency_code'], None),
+            axis=1
+        ).to_numpy(dtype=np.float64)
+        apply_s = time.perf_counter() - start
+        print(f"DataFrame.apply:     {n:>10,} rows {apply_s:8.3f}s  {n / apply_s:>12,.0f} rows/s")
+
+        start = time.perf_counter()
+        days = parse_dates(df["transaction_date"])
+        matrix = RateMatrix.from_store(store, str(days.min()), str(days.max()))
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        after = matrix.lookup(days, df["currency_code"])
+        gather_s = time.perf_counter() - start
+        total_s = build_s + gather_s
+        print(f"RateMatrix (total):  {n:>10,} rows {total_s:8.3f}s  {n / total_s:>12,.0f} rows/s "
+              f"(load {build_s:.3f}s, gather {gather_s:.3f}s)")
+        print(f"speed-up: {apply_s / total_s:.1f}x")
+
+        exact = ~np.isnan(before)
+        assert np.array_equal(before[exact], after[exact]), "exact-date rates differ"
+        fallback = np.flatnonzero(~exact)
+        expected = [
+            previous_business_day_rate(rate_cache, df["transaction_date"].iat[i], df["currency_code"].iat[i],
+                                       matrix.fallback_days)
+            for i in fallback
+        ]
+        assert np.allclose(after[fallback], expected, equal_nan=True), "fallback rates differ"
+        print(f"parity: {int(exact.sum()):,} exact rows and {len(fallback):,} weekend fallback rows OK")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
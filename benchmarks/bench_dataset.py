@@ -0,0 +1,151 @@
+"""
+Cold-start load of the transaction dataset: pandas.read_csv of the whole CSV
+against aml_engine.dataset.TransactionDataset reading the partitioned Parquet
+dataset with column projection and pushed-down predicates.
+
+Every load runs in a fresh process so timings include no warm caches in the
+interpreter and peak RSS covers only that load. Filtered reads are checked
+against the same filters applied to the CSV in pandas. Peak RSS includes
+pages Arrow's default allocator keeps cached after the load; running with
+ARROW_DEFAULT_MEMORY_POOL=system returns them and lowers it further.
+
+Usage: python benchmarks/bench_dataset.py [rows]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.dataset import TransactionDataset, convert_csv
+from aml_engine.etl import peak_rss_bytes
+
+COUNTRIES = ["US", "GB", "DE", "IN", "AE", "BR", "IR", "RU", "NG", "SG", "CH", "FR"]
+CURRENCIES = ["USD", "EUR", "GBP", "INR", "JPY", "AED", "CHF", "SGD"]
+INSTRUCTIONS = ["invoice payment for services", "monthly rent", "gift for family", "urgent transfer",
+                "supplier settlement", "consulting fee march", "crypto exchange top-up"]
+# What the chatbot's query processor reads
+PROJECTION = ["transaction_id", "transaction_date", "amount_usd", "risk_score", "isSuspicious",
+              "beneficiary_country", "originator_country"]
+
+
+def write_synthetic_csv(path, n, seed=21):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=730).strftime("%d-%m-%Y").to_numpy()
+    amount = rng.lognormal(9, 2, n).round(2)
+    pd.DataFrame({
+        "transaction_id": [str(uuid.UUID(int=int(x))) for x in rng.integers(0, 2**63, n)],
+        "account_key": rng.integers(0, 50_000, n),
+        "transaction_date": dates[rng.integers(0, len(dates), n)],
+        "transaction_amount": amount,
+        "currency_code": rng.choice(CURRENCIES, n),
+        "amount_usd": amount,
+        "originator_country": rng.choice(COUNTRIES, n),
+        "beneficiary_country": rng.choice(COUNTRIES, n),
+        "payment_type": rng.choice(["SWIFT", "IMPS", "NEFT"], n),
+        "payment_instruction": rng.choice(INSTRUCTIONS, n),
+        "risk_score": rng.integers(0, 20, n),
+        "isSuspicious": rng.random(n) < 0.3,
+    }).to_csv(path, index=False)
+
+
+def load_csv(path, start=None, end=None, account=None, suspicious=None):
+    began = time.perf_counter()
+    df = pd.read_csv(path)
+    if start is not None:
+        dates = pd.to_datetime(df["transaction_date"], format="%d-%m-%Y")
+        df = df[(dates >= start) & (dates <= end)]
+    if account is not None:
+        df = df[df["account_key"] == account]
+    if suspicious is not None:
+        df = df[df["isSuspicious"] == suspicious]
+    elapsed = time.perf_counter() - began
+    return elapsed, len(df), int(df.memory_usage(deep=True).sum()), peak_rss_bytes()
+
+
+def load_dataset(root, columns=None, start=None, end=None, account=None, suspicious=None):
+    began = time.perf_counter()
+    df = TransactionDataset(root).read(columns, start=start, end=end, accounts=account, suspicious=suspicious)
+    elapsed = time.perf_counter() - began
+    return elapsed, len(df), int(df.memory_usage(deep=True).sum()), peak_rss_bytes()
+
+
+def report(label, result, baseline=None):
+    elapsed, rows, frame_bytes, rss = result
+    line = f"{label:<38} {elapsed:7.3f}s  {rows:>10,} rows  frame {frame_bytes / 2**20:8.1f} MiB  RSS {rss / 2**20:7.1f} MiB"
+    if baseline is not None:
+        line += f"  ({baseline[0] / elapsed:5.1f}x faster, {baseline[3] / rss:4.1f}x less RSS)"
+    print(line)
+
+
+def check_chunk_types(tmp):
+    """Values of a later chunk must fit the column types inferred from the first"""
+    csv_path = os.path.join(tmp, "mixed_chunks.csv")
+    root = os.path.join(tmp, "mixed_chunks_dataset")
+    pd.DataFrame({
+        "transaction_id": [str(i) for i in range(20)] + [f"t{i}" for i in range(20, 30)],
+        "account_key": [1000 + i for i in range(10)] + [f"ACC{i:03d}" for i in range(10, 30)],
+        "transaction_date": "01-03-2024",
+        # Whole numbers until the chunk boundary, then fractions
+        "transaction_amount": [float(i) for i in range(10)] + [i + 0.5 for i in range(10, 30)],
+        "batch": [1] * 10 + [2.5] * 20,
+        "payment_instruction": [None] * 10 + ["school fees"] * 20,
+    }).to_csv(csv_path, index=False)
+    convert_csv(csv_path, root, chunk_rows=10)
+    df = TransactionDataset(root).read()
+    assert len(df) == 30, f"{len(df)} rows, expected 30"
+    assert df["payment_instruction"].eq("school fees").sum() == 20, "null-first column lost"
+    assert df["transaction_amount"].sum() == sum(range(30)) + 10, "fractional amounts lost"
+    assert df["batch"].sum() == 60, "fractions of an unlisted integer column lost"
+    assert set(df["account_key"]) >= {"1000", "ACC029"}, "account keys lost"
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "usd_amount_dataset.csv")
+        root = os.path.join(tmp, "transactions_dataset")
+        check_chunk_types(tmp)
+        write_synthetic_csv(csv_path, n)
+        start = time.perf_counter()
+        convert_csv(csv_path, root, chunk_rows=max(n, 1))
+        print(f"pandas {pd.__version__}")
+        print(f"{n:,} rows: CSV {os.path.getsize(csv_path) / 2**20:,.0f} MiB, converted to Parquet "
+              f"in {time.perf_counter() - start:.1f}s\n")
+
+        def fresh(fn, *args):
+            with ctx.Pool(1) as pool:
+                return pool.apply(fn, args)
+
+        full_csv = fresh(load_csv, csv_path)
+        report("read_csv, all columns", full_csv)
+        report("dataset, all columns", fresh(load_dataset, root), full_csv)
+        report("dataset, chatbot projection", fresh(load_dataset, root, PROJECTION), full_csv)
+
+        print()
+        week = (pd.Timestamp("2024-03-04"), pd.Timestamp("2024-03-10"))
+        cases = [
+            ("one week", dict(start=week[0], end=week[1])),
+            ("one account", dict(account=1234)),
+            ("suspicious only", dict(suspicious=True)),
+        ]
+        for label, filters in cases:
+            expected = fresh(load_csv, csv_path, *[filters.get(k) for k in ("start", "end", "account", "suspicious")])
+            actual = fresh(load_dataset, root, PROJECTION,
+                           *[filters.get(k) for k in ("start", "end", "account", "suspicious")])
+            assert expected[1] == actual[1], f"{label}: {actual[1]} rows, expected {expected[1]}"
+            report(f"read_csv + filter, {label}", expected)
+            report(f"dataset pushdown, {label}", actual, expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Size of what the RAG index embeds per transaction: CSVLoader +
+load_and_split (one `column: value` line per column, as chatbot/rag.py and
+chatbot/api.py used to ingest) against transaction_documents' compact
+renderer (one document per transaction, identifiers and scores in
+metadata), streamed from the same CSV.
+
+Tokens are counted with tiktoken's cl100k_base when it is available, else
+approximated as words and punctuation. Peak memory is traced with
+tracemalloc while each path reads the file.
+
+Usage: python benchmarks/bench_documents.py [rows]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_community.document_loaders.csv_loader import CSVLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_transaction_store import synthetic_transactions
+from transaction_documents import iter_documents
+
+
+def scored_transactions(n):
+    """Synthetic transactions with the columns of the scored dataset"""
+    rng = np.random.default_rng(11)
+    df = synthetic_transactions(n)
+    df["account_key"] = [f"ACC{x:08d}" for x in rng.integers(0, 10**8, n)]
+    df["currency_code"] = rng.choice(["USD", "EUR", "INR", "AED", "GBP"], n)
+    df["usd_rate"] = rng.uniform(0.01, 1.5, n).round(6)
+    df["payment_type"] = rng.choice(["NEFT", "RTGS", "SWIFT", "IMPS"], n)
+    for i in range(1, 6):
+        df[f"Rule{i}_score"] = rng.integers(0, 2, n)
+    df["total_score"] = df[[f"Rule{i}_score" for i in range(1, 6)]].sum(axis=1)
+    df["suspicious_flag"] = (df["total_score"] > 3).astype(int)
+    return df.drop(columns=["isSuspicious"])
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "cl100k_base", lambda text: len(encoding.encode(text))
+    except Exception:
+        return "approx. words", lambda text: len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    documents = load()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return documents, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", type=int, default=20000)
+    args = parser.parse_args()
+
+    name, count_tokens = token_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transactions.csv")
+        scored_transactions(args.rows).to_csv(path, index=False)
+
+        legacy, legacy_seconds, legacy_peak = measure(lambda: CSVLoader(file_path=path).load_and_split())
+        # Only token counts are kept, as an embedding pipeline would pass texts on
+        compact, compact_seconds, compact_peak = measure(
+            lambda: [(d.page_content, d.metadata) for d in iter_documents(path)]
+        )
+
+    legacy_tokens = [count_tokens(d.page_content) for d in legacy]
+    compact_tokens = [count_tokens(text) for text, _ in compact]
+    assert len(compact) == args.rows, len(compact)
+
+    print(f"{args.rows:,} transactions, tokens counted with {name}")
+    print(f"Compact: {compact[0][0]}")
+    print(f"{'renderer':<26} {'docs':>8} {'tokens/row':>11} {'chars/row':>10} {'seconds':>8} {'peak MB':>8}")
+    for label, docs, tokens, chars, seconds, peak in [
+        ("CSVLoader + split", len(legacy), legacy_tokens, [len(d.page_content) for d in legacy],
+         legacy_seconds, legacy_peak),
+        ("compact (streamed)", len(compact), compact_tokens, [len(t) for t, _ in compact],
+         compact_seconds, compact_peak),
+    ]:
+        print(f"{label:<26} {docs:>8,} {sum(tokens) / args.rows:>11.1f} {sum(chars) / args.rows:>10.1f} "
+              f"{seconds:>8.2f} {peak / 1e6:>8.1f}")
+    print(f"Tokens embedded per transaction: {1 - sum(compact_tokens) / sum(legacy_tokens):.0%} fewer")
+
+
+if __name__ == "__main__":
+    main()
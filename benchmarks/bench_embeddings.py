@@ -0,0 +1,162 @@
+"""
+Embedding throughput of chatbot/local_embeddings.py, in sentences per
+second, on rendered transaction documents and on chat questions:
+
+- documents: --sentences transaction documents embedded in calls of
+  EMBED_BATCH_SIZE texts from EMBED_WORKERS threads, as IncrementalIndex
+  does. "per call" encodes every call on its own, as HuggingFaceEmbeddings
+  did; LocalEmbeddings merges concurrent calls into one batch, with fp32 or
+  int8 weights (and ONNX Runtime when installed), then again with its disk
+  cache cold and warm.
+- instructions: payment instructions, most of them repeats, embedded once
+  each through the content-addressed cache
+- questions: --queries single questions from as many concurrent threads,
+  per call against dynamically batched
+
+Every configuration must return the vectors of the per-call baseline
+(cosine >= 0.999 for fp32, >= 0.95 for int8).
+
+Usage: python benchmarks/bench_embeddings.py [sentences] [--model sentence-transformers/all-mpnet-base-v2]
+           [--queries 64] [--max-wait-ms 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_hybrid_retrieval import INSTRUCTIONS, transactions
+from local_embeddings import EMBEDDING_MODEL, LocalEmbeddings
+from transaction_documents import render_transactions
+from vector_index import EMBED_BATCH_SIZE, EMBED_WORKERS
+
+
+class PerCallEmbeddings:
+    """One model.encode per call, like HuggingFaceEmbeddings"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def embed_documents(self, texts):
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True,
+                                 show_progress_bar=False).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def embed_like_index(embeddings, texts):
+    """Vectors of `texts` embedded the way IncrementalIndex.embed calls the model"""
+    batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    with ThreadPoolExecutor(EMBED_WORKERS) as pool:
+        return np.array([v for batch in pool.map(embeddings.embed_documents, batches) for v in batch])
+
+
+def embed_questions(embeddings, questions):
+    """(vectors, per-question seconds) with every question on its own thread"""
+    def one(question):
+        start = time.perf_counter()
+        vector = embeddings.embed_query(question)
+        return vector, time.perf_counter() - start
+
+    with ThreadPoolExecutor(len(questions)) as pool:
+        results = list(pool.map(one, questions))
+    return np.array([r[0] for r in results]), np.array([r[1] for r in results])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def agreement(vectors, reference):
+    """Mean and minimum cosine similarity of matching rows"""
+    cosine = (vectors * reference).sum(axis=1)
+    return cosine.mean(), cosine.min()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sentences", nargs="?", type=int, default=2000)
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Hub name or local path of a sentence-transformer")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    rows = transactions(args.sentences)
+    documents = render_transactions(rows)[0]
+    instructions = rows["payment_instruction"].tolist()
+    questions = [f"Why were payments for {p} to country {i % 40} flagged?"
+                 for i, p in enumerate(np.random.default_rng(1).choice(INSTRUCTIONS, args.queries))]
+
+    def local(**kwargs):
+        embeddings = LocalEmbeddings(args.model, max_wait_ms=args.max_wait_ms, **kwargs)
+        embeddings.load()
+        return embeddings
+
+    baseline = local(cache_path="")
+    per_call = PerCallEmbeddings(baseline._model)
+    reference, seconds = timed(embed_like_index, per_call, documents)
+    print(f"{args.model}: {len(documents):,} documents in calls of {EMBED_BATCH_SIZE} from {EMBED_WORKERS} threads, "
+          f"{len(set(instructions))} distinct of {len(instructions):,} instructions, {len(questions)} questions")
+    print(f"{'workload':<13} {'embeddings':<22} {'sentences/s':>12} {'encoded':>8} {'mean cos':>9} {'min cos':>8}")
+
+    def report(workload, label, count, seconds, encoded, vectors=None, expected=None, minimum=0.999):
+        mean, low = agreement(vectors, expected) if vectors is not None else (np.nan, np.nan)
+        print(f"{workload:<13} {label:<22} {count / seconds:>12,.0f} {encoded:>8,} {mean:>9.4f} {low:>8.4f}")
+        assert vectors is None or low >= minimum, f"{label}: vectors differ from the baseline (min cosine {low:.4f})"
+
+    report("documents", "per call", len(documents), seconds, len(documents))
+    variants = [("batched fp32", {}, 0.999), ("batched int8", {"quantize": "int8"}, 0.95)]
+    try:
+        import onnxruntime  # noqa: F401
+        variants += [("batched onnx", {"backend": "onnx"}, 0.999),
+                     ("batched onnx int8", {"backend": "onnx", "quantize": "int8"}, 0.95)]
+    except ImportError:
+        print("(onnxruntime not installed: onnx backend skipped)")
+    for label, kwargs, minimum in variants:
+        embeddings = local(cache_path="", **kwargs)
+        vectors, seconds = timed(embed_like_index, embeddings, documents)
+        report("documents", label, len(documents), seconds, embeddings.counters["encoded"], vectors, reference,
+               minimum)
+        embeddings.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cached = local(cache_path=os.path.join(tmp, "cache.sqlite"))
+        for label in ("cache cold", "cache warm"):
+            encoded = cached.counters["encoded"]
+            vectors, seconds = timed(embed_like_index, cached, documents)
+            report("documents", label, len(documents), seconds, cached.counters["encoded"] - encoded, vectors,
+                   reference)
+
+        expected, seconds = timed(embed_like_index, per_call, instructions)
+        report("instructions", "per call", len(instructions), seconds, len(instructions))
+        encoded = cached.counters["encoded"]
+        vectors, seconds = timed(embed_like_index, cached, instructions)
+        report("instructions", "cached", len(instructions), seconds, cached.counters["encoded"] - encoded, vectors,
+               expected)
+        cached.close()
+
+    expected, latencies = embed_questions(per_call, questions)
+    report("questions", "per call", len(questions), latencies.max(), len(questions))
+    print(f"{'':<13} {'':<22} p50 {np.percentile(latencies, 50) * 1000:.1f} ms")
+    batches = baseline._batcher.batches
+    vectors, latencies = embed_questions(baseline, questions)
+    report("questions", "batched", len(questions), latencies.max(), len(questions), vectors, expected)
+    print(f"{'':<13} {'':<22} p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+          f"{baseline._batcher.batches - batches} model batches")
+    baseline.close()
+
+
+if __name__ == "__main__":
+    main()
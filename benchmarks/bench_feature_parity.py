@@ -0,0 +1,90 @@
+"""
+Parity benchmark for aml_engine.features.FeatureEncoder.
+
+Encodes the same synthetic transactions through the online single-record
+path (as /predict does) and the batch path (as /predict/batch does), checks
+that both matrices are identical, and repeats the encoding in subprocesses
+with different PYTHONHASHSEED values to show features are stable across
+workers and restarts.
+
+Usage: python benchmarks/bench_feature_parity.py [rows]
+"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.features import FeatureEncoder
+
+
+def synthetic_transactions(n, seed=42):
+    rng = np.random.default_rng(seed)
+    payment_types = np.array(["SWIFT", "IMPS", "NEFT", "swift ", "UPI", "RTGS"])
+    return [
+        {
+            "payment_type": str(pt),
+            "amount_usd": float(amount),
+            "Rule1_score": float(r1),
+            "Rule2_score": float(r2),
+            "Rule3_score": 0.0,
+            "Rule4_score": 0.0,
+            "Rule5_score": 0.0,
+            "total_score": float(r1 + r2)
+        }
+        for pt, amount, r1, r2 in zip(
+            rng.choice(payment_types, n),
+            rng.lognormal(9, 2, n).round(2),
+            rng.choice([0, 2, 4, 10], n),
+            rng.choice([0, 3], n)
+        )
+    ]
+
+
+def matrix_digest(n):
+    encoder = FeatureEncoder()
+    matrix = encoder.transform(synthetic_transactions(n))
+    return hashlib.sha256(matrix.tobytes()).hexdigest()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    encoder = FeatureEncoder()
+    transactions = synthetic_transactions(n)
+
+    start = time.perf_counter()
+    online = np.vstack([encoder.transform_one(t) for t in transactions])
+    online_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = encoder.transform(transactions)
+    batch_s = time.perf_counter() - start
+
+    assert np.array_equal(online, batch), "online and batch feature matrices differ"
+    print(f"rows: {n:,}")
+    print(f"online (per-row): {online_s:.3f}s  ({n / online_s:,.0f} rows/s)")
+    print(f"batch (columnar): {batch_s:.3f}s  ({n / batch_s:,.0f} rows/s)")
+    print("online == batch: OK")
+
+    digests = set()
+    for seed in ("0", "1", "12345"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        out = subprocess.run(
+            [sys.executable, __file__, "--digest", str(min(n, 10_000))],
+            env=env, capture_output=True, text=True, check=True
+        )
+        digests.add(out.stdout.strip())
+    assert len(digests) == 1, f"features differ across PYTHONHASHSEED values: {digests}"
+    print("stable across PYTHONHASHSEED=0,1,12345: OK")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--digest":
+        print(matrix_digest(int(sys.argv[2])))
+    else:
+        main()
@@ -0,0 +1,167 @@
+"""
+Retrieval quality and latency of chatbot/hybrid_retriever.py against the
+former dense-only `vector_store.as_retriever()` on three kinds of question:
+
+- transaction ids ("Why was transaction <uuid> flagged?"): hit@k of the
+  named transaction; the hybrid retriever must always find it, without an
+  embedding call, in under a millisecond (p50)
+- account keys ("What did account ACC000123 send?"): share of the results
+  belonging to that account
+- payment instruction keywords ("payments for school fees"): share of the
+  results whose instruction contains the phrase
+
+Embeddings are normalised bags of hashed words, standing in for a sentence
+model (they share its weakness with identifiers, which become one opaque
+token each), with --embed-ms of simulated cost per question. Per-stage
+latency comes from HybridRetriever.stats. The time `IncrementalIndex.open`
+takes is printed with the time its background rebuild of the lexical index
+from the docstore takes to finish; questions start once it has.
+
+Usage: python benchmarks/bench_hybrid_retrieval.py [rows] [--questions 200] [--embed-ms 20] [--k 4]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_incremental_index import DIM
+from bench_transaction_store import synthetic_transactions
+from hybrid_retriever import HybridRetriever
+from vector_index import IncrementalIndex
+
+INSTRUCTIONS = [
+    "monthly rent", "gift for family", "school fees", "invoice payment", "consulting services", "loan repayment",
+    "car purchase", "medical bills", "salary advance", "charity donation", "crypto exchange top up",
+    "wedding expenses", "property deposit", "travel booking", "software licence", "insurance premium",
+    "equipment lease", "tax refund", "investment return", "household goods"
+]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Normalised hashed bag of words, with a simulated cost per question"""
+
+    def __init__(self, query_seconds=0.0):
+        self.query_seconds = query_seconds
+        self.queries = 0
+
+    def _vector(self, text):
+        vector = np.zeros(DIM, dtype=np.float32)
+        for word in re.findall(r"[\w-]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % DIM] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        time.sleep(self.query_seconds)
+        return self._vector(text)
+
+
+def transactions(n, seed=3):
+    rows = synthetic_transactions(n)
+    rng = np.random.default_rng(seed)
+    rows["account_key"] = [f"ACC{i:06d}" for i in rng.integers(0, max(n // 10, 1), n)]
+    rows["payment_instruction"] = rng.choice(INSTRUCTIONS, n)
+    return rows.astype(str)
+
+
+def run(retrieve, questions, judge):
+    """(mean score, per-question seconds) of `retrieve` over (question, target) pairs"""
+    scores, seconds = [], []
+    for question, target in questions:
+        start = time.perf_counter()
+        documents = retrieve(question)
+        seconds.append(time.perf_counter() - start)
+        scores.append(judge(documents, target))
+    return float(np.mean(scores)), np.array(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--embed-ms", type=float, default=20, help="Simulated cost of embedding a question")
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rows = transactions(args.rows)
+    # A short numeric account key, which a number in a question must not pin to
+    rows.loc[rows.index[:3], "account_key"] = "42"
+    rng = np.random.default_rng(5)
+    picks = rows.iloc[rng.choice(len(rows), args.questions, replace=False)]
+    id_questions = [(f"Why was transaction '{t}' flagged?", t) for t in picks["transaction_id"]]
+    account_questions = [(f"What did account {a} send?", a) for a in picks["account_key"]]
+    keyword_questions = [(f"Which payments were for {p}?", p) for p in rng.choice(INSTRUCTIONS, args.questions)]
+
+    def named(documents, target):
+        return float(any(doc.metadata["transaction_id"] == target for doc in documents))
+
+    def of_account(documents, target):
+        return np.mean([doc.metadata["account_key"] == target for doc in documents]) if documents else 0.0
+
+    def about(documents, target):
+        return np.mean([target in doc.page_content for doc in documents]) if documents else 0.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        embeddings = BagOfWordsEmbeddings()
+        index = IncrementalIndex.create(path, embeddings, "bench")
+        index.upsert(rows, source="bench")
+        index.save()
+        index.close()
+        start = time.perf_counter()
+        index, _ = IncrementalIndex.open(path, embeddings, "bench")
+        opened = time.perf_counter() - start
+        index.lexical.ready.wait()
+        rebuilt = time.perf_counter() - start
+        embeddings.query_seconds = args.embed_ms / 1000
+
+        dense = index.vector_store.as_retriever(search_kwargs={"k": args.k})
+        hybrid = HybridRetriever(index=index, k=args.k)
+        print(f"{len(rows):,} transactions, {args.questions} questions per kind, k={args.k}, "
+              f"embedding {args.embed_ms:.0f} ms; open {opened:.2f} s, lexical index ready after {rebuilt:.2f} s "
+              f"({hybrid.stats['lexical']['terms']:,} terms)")
+        short = set(rows["transaction_id"][:3])
+        assert not index.lexical.find_accounts("Which payments over 42 thousand were flagged?", args.k), \
+            "a bare number was taken for an account key"
+        assert set(index.lexical.find_accounts("What did account 42 send?", args.k)) == short, \
+            "account 42 was not looked up"
+        print(f"{'questions':<10} {'retriever':<8} {'score':>6} {'p50 ms':>8} {'p95 ms':>8} {'embeds':>7}")
+        for kind, questions, judge in [("ids", id_questions, named), ("accounts", account_questions, of_account),
+                                       ("keywords", keyword_questions, about)]:
+            for label, retriever in [("dense", dense), ("hybrid", hybrid)]:
+                embeds = embeddings.queries
+                score, seconds = run(retriever.invoke, questions, judge)
+                embeds = embeddings.queries - embeds
+                p50, p95 = np.percentile(seconds, [50, 95]) * 1000
+                print(f"{kind:<10} {label:<8} {score:>6.3f} {p50:>8.3f} {p95:>8.3f} {embeds:>7}")
+                if kind == "ids" and label == "hybrid":
+                    assert score == 1.0, "an exact transaction id was not retrieved"
+                    assert embeds == 0, "exact id questions must not embed"
+                    assert p50 < 1, f"exact id lookup took {p50:.3f} ms"
+
+        stats = hybrid.stats
+        calls = stats["calls"]
+        stages = ", ".join(f"{stage} {stats[f'{stage}_ms'] / calls:.3f}"
+                           for stage in ("exact", "bm25", "embed", "dense", "fuse"))
+        print(f"Mean ms per hybrid call over {calls} calls ({stats['exact_hits']} exact): {stages}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Cost of refreshing the chatbot/api.py vector store after 1% of the
+transactions change: the former path (CSVLoader + add_documents into a fresh
+IndexFlatL2, every row embedded in one call) against IncrementalIndex, which
+re-embeds only rows whose content hash changed and removes deleted rows.
+
+Embeddings come from a deterministic fake model with a fixed cost per call
+and per text (defaults roughly match a remote embedding API), so the numbers
+measure indexing work rather than a particular model. After the refresh the
+incremental index must hold exactly the documents of an index built from
+scratch on the new file and return the same neighbours.
+
+Usage: python benchmarks/bench_incremental_index.py [rows] [--batch-size 64] [--workers 4]
+           [--call-ms 20] [--text-ms 0.2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+import pandas as pd
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders.csv_loader import CSVLoader
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_transaction_store import synthetic_transactions
+from vector_index import AnnIndex, IncrementalIndex
+
+DIM = 384
+CHANGED_FRACTION = 0.01
+
+
+class LatencyEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic vectors with a simulated cost per call and per text"""
+
+    call_seconds: float = 0.02
+    text_seconds: float = 0.0002
+
+    def embed_documents(self, texts):
+        time.sleep(self.call_seconds + self.text_seconds * len(texts))
+        return super().embed_documents(texts)
+
+
+def empty_store(embeddings, index=None):
+    return FAISS(
+        embedding_function=embeddings,
+        index=faiss.IndexFlatL2(DIM) if index is None else index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+
+
+def legacy_rebuild(csv_path, embeddings):
+    """rebuild_rag_from_csv as it was: a fresh index and every row embedded"""
+    store = empty_store(embeddings)
+    docs = CSVLoader(file_path=csv_path).load_and_split()
+    store.add_documents(documents=docs)
+    return store
+
+
+def documents(store):
+    return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--call-ms", type=float, default=20, help="Simulated cost of one embedding call")
+    parser.add_argument("--text-ms", type=float, default=0.2, help="Simulated cost per embedded text")
+    args = parser.parse_args()
+
+    embeddings = LatencyEmbeddings(size=DIM, call_seconds=args.call_ms / 1000, text_seconds=args.text_ms / 1000)
+    df = synthetic_transactions(args.rows)
+    rng = np.random.default_rng(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.csv")
+        after_path = os.path.join(tmp, "after.csv")
+        df.to_csv(before_path, index=False)
+
+        # 1% of rows edited, a few deleted and as many added
+        changed = df.copy()
+        n_changed = int(len(df) * CHANGED_FRACTION)
+        edited = rng.choice(len(df), n_changed, replace=False)
+        changed.loc[edited, "amount_usd"] = changed.loc[edited, "amount_usd"] + 1.0
+        removed = n_changed // 10
+        added = synthetic_transactions(removed, seed=99)
+        changed = changed.drop(index=edited[:removed])
+        changed = pd.concat([changed, added], ignore_index=True)
+        changed.to_csv(after_path, index=False)
+
+        start = time.perf_counter()
+        rebuilt = legacy_rebuild(after_path, embeddings)
+        legacy_seconds = time.perf_counter() - start
+
+        index = IncrementalIndex(empty_store(embeddings, AnnIndex(DIM, "flat")), embeddings, args.batch_size, args.workers)
+        start = time.perf_counter()
+        initial = index.load_csv(before_path, source="transactions.csv")
+        initial_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        refresh = index.load_csv(after_path, source="transactions.csv", replace=True)
+        refresh_seconds = time.perf_counter() - start
+        index.close()
+
+        # The same vectors without the simulated latency
+        fresh_embeddings = LatencyEmbeddings(size=DIM, call_seconds=0, text_seconds=0)
+        fresh = IncrementalIndex(empty_store(fresh_embeddings, AnnIndex(DIM, "flat")), fresh_embeddings)
+        fresh.load_csv(after_path, source="transactions.csv")
+        fresh.close()
+
+    assert documents(index.vector_store) == documents(fresh.vector_store), "refreshed index differs from a rebuild"
+    for query in ["suspicious transfer to IR", "gift for family", "invoice 42 from DE"]:
+        got = [d.page_content for d in index.vector_store.similarity_search(query, k=5)]
+        want = [d.page_content for d in fresh.vector_store.similarity_search(query, k=5)]
+        assert got == want, query
+
+    print(f"{len(changed):,} transactions, {n_changed:,} edited, {removed} deleted, {removed} added "
+          f"(batch size {args.batch_size}, {args.workers} workers)")
+    print(f"{'path':<32} {'embedded':>9} {'seconds':>9} {'vs rebuild':>11}")
+    print(f"{'full rebuild (CSVLoader)':<32} {len(changed):>9,} {legacy_seconds:>9.2f} {'100.0%':>11}")
+    print(f"{'incremental initial load':<32} {initial['embedded']:>9,} {initial_seconds:>9.2f} "
+          f"{initial_seconds / legacy_seconds:>10.1%}")
+    print(f"{'incremental refresh':<32} {refresh['embedded']:>9,} {refresh_seconds:>9.2f} "
+          f"{refresh_seconds / legacy_seconds:>10.1%}")
+    print(f"Refresh removed {refresh['deleted']} rows; index matches a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Throughput of the suspicious-keyword rule on synthetic payment instructions.
+
+Compares the notebook's per-row `kw in text` loop over every keyword with
+aml_engine.keywords.KeywordMatcher on pandas and pyarrow columns, after
+checking that the keyword service keeps its last good list when
+sus_words.txt is emptied or cut short.
+
+Usage: python benchmarks/bench_keywords.py [rows] [baseline_rows]
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aml_engine.keywords import DEFAULT_KEYWORDS_PATH, KeywordMatcher, load_keywords
+
+FILLER = [
+    "invoice", "settlement", "for", "march", "services", "rent", "salary", "partial",
+    "order", "supplier", "ref", "transfer", "account", "monthly", "utility", "tuition"
+]
+
+
+def synthetic_instructions(n, keywords, seed=7):
+    rng = np.random.default_rng(seed)
+    words = np.array(FILLER + keywords, dtype=object)
+    # Mostly benign filler with keywords in roughly one row in five
+    weights = np.r_[np.full(len(FILLER), 16.0), np.full(len(keywords), 0.5)]
+    weights /= weights.sum()
+    lengths = rng.integers(3, 9, n)
+    picks = rng.choice(words, lengths.sum(), p=weights)
+    bounds = np.r_[0, np.cumsum(lengths)]
+    return pd.Series([" ".join(picks[bounds[i]:bounds[i + 1]]) for i in range(n)], dtype="object")
+
+
+def baseline_score(texts, keywords):
+    """Per-row loop from fast-api/model.ipynb (keyword_score)"""
+    def keyword_score(text):
+        text = str(text).lower()
+        for kw in keywords:
+            if kw.lower() in text:
+                return 3
+        return 0
+    return texts.apply(keyword_score)
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.3f}s  {n / elapsed:>12,.0f} rows/s")
+    return result
+
+
+def check_broken_edit():
+    """Reloading an emptied or truncated keyword file must keep the previous snapshot"""
+    path = os.path.join(ROOT, "fast-api", "suspicious-words.py")
+    spec = importlib.util.spec_from_file_location("suspicious_words", path)
+    service = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(service)
+
+    with open(DEFAULT_KEYWORDS_PATH, encoding="utf-8") as f:
+        text = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        keywords_path = os.path.join(tmp, "sus_words.txt")
+        with open(keywords_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        registry = service.KeywordRegistry(keywords_path)
+        good = registry.snapshot
+        for broken in ("", text[:text.index('"')]):
+            with open(keywords_path, "w", encoding="utf-8") as f:
+                f.write(broken)
+            try:
+                registry.reload()
+            except ValueError:
+                pass
+            assert registry.snapshot is good, "a broken keyword file replaced the last good snapshot"
+    print("broken keyword file keeps the last good snapshot: OK\n")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    baseline_n = int(sys.argv[2]) if len(sys.argv) > 2 else min(n, 200_000)
+
+    check_broken_edit()
+    categories = load_keywords()
+    keywords = [k for ks in categories.values() for k in ks]
+    texts = synthetic_instructions(n, keywords)
+    print(f"{n:,} instructions, {len(keywords)} keywords\n")
+
+    timed("baseline loop (substring)", baseline_n, lambda: baseline_score(texts[:baseline_n], keywords))
+    start = time.perf_counter()
+    matcher = KeywordMatcher(categories)
+    print(f"{'compile matcher':<32} {time.perf_counter() - start:8.3f}s")
+    timed("matcher.score (pandas)", n, lambda: matcher.score(texts))
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("pyarrow not installed, skipping Arrow path")
+    else:
+        arrow_texts = pa.array(texts, type=pa.string())
+        timed("matcher.score (pyarrow)", n, lambda: matcher.score(arrow_texts))
+
+    sample = texts[:100_000]
+    timed("matcher.find_all (pandas)", len(sample), lambda: matcher.find_all(sample))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cost of picking up new MongoDB transactions in chatbot/simple_chatbot.py:
+the former full export (find everything, write a CSV, read it back, rebuild
+the store) against an incremental MongoSync pass applied to the live
+TransactionStore, per 10k new transactions (plus 1k edits).
+
+Runs against mongomock by default, or a real server with --uri. mongomock
+evaluates queries in Python with no indexes, so its fetch times are an upper
+bound; the apply times do not depend on the server. After the last round the
+synced store must match a store rebuilt from the whole collection.
+
+Usage: python benchmarks/bench_mongo_sync.py [base_rows] [rounds] [--uri mongodb://...]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import simple_chatbot
+from bench_transaction_store import synthetic_transactions
+from mongo_sync import MongoSync
+from transaction_store import TransactionStore
+
+NEW_ROWS = 10000
+EDITED_ROWS = 1000
+
+
+def documents(df, updated_at):
+    records = df.to_dict("records")
+    for record in records:
+        record["transaction_date"] = datetime.datetime.fromisoformat(record["transaction_date"])
+        record["updated_at"] = updated_at
+    return records
+
+
+def full_export(collection):
+    """The old export_mongodb_to_csv + load_csv_data path"""
+    transactions = list(collection.find({}))
+    for transaction in transactions:
+        transaction["_id"] = str(transaction["_id"])
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "mongodb_transactions.csv")
+        pd.DataFrame(transactions).to_csv(csv_path, index=False)
+        header = pd.read_csv(csv_path, nrows=0).columns
+        df = pd.read_csv(csv_path, usecols=[c for c in simple_chatbot.CHATBOT_COLUMNS if c in header])
+    return TransactionStore(df)
+
+
+def summary(store):
+    return (
+        len(store), store.count_suspicious(), round(store.total_amount(), 2), store.high_value()[0],
+        store.count_high_risk(), store.risk_stats()[:2],
+        sorted(store.country_counts["beneficiary_country"].items()),
+        [t["transaction_id"] for t in store.recent(50)],
+    )
+
+
+def timed_sync(sync):
+    """One incremental pass, timing MongoDB reads and store updates separately"""
+    fetch = apply = 0.0
+    rows = 0
+    while True:
+        start = time.perf_counter()
+        batch = sync.next_batch()
+        fetch += time.perf_counter() - start
+        if batch is None:
+            return rows, fetch, apply
+        start = time.perf_counter()
+        simple_chatbot.apply_changes(batch.upserts, batch.deleted)
+        sync.commit(batch)
+        apply += time.perf_counter() - start
+        rows += len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base_rows", nargs="?", type=int, default=20000)
+    parser.add_argument("rounds", nargs="?", type=int, default=3)
+    parser.add_argument("--uri", default=None, help="Benchmark against a real MongoDB instead of mongomock")
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+        collection = MongoClient(args.uri)["aml_bench"]["transactions"]
+        collection.drop()
+    else:
+        import mongomock
+        collection = mongomock.MongoClient()["aml_bench"]["transactions"]
+
+    total = args.base_rows + args.rounds * NEW_ROWS
+    data = synthetic_transactions(total)
+    clock = datetime.datetime(2024, 1, 1)
+    collection.insert_many(documents(data.iloc[:args.base_rows], clock))
+
+    # The service's sync, pointed at the benchmark collection
+    sync = MongoSync(collection, projection=simple_chatbot.CHATBOT_COLUMNS)
+    sync.ensure_index()
+    simple_chatbot.mongo_sync = sync
+    start = time.perf_counter()
+    stats = asyncio.run(simple_chatbot.sync_from_mongodb())
+    print(f"Initial sync: {len(simple_chatbot.transaction_store):,} rows in {time.perf_counter() - start:.2f}s "
+          f"({stats['batches']} batches, mode={stats['mode']})")
+
+    print(f"{'round':>5} {'rows':>9} {'full export':>12} {'sync fetch':>11} {'sync apply':>11} {'sync total':>11}")
+    for r in range(args.rounds):
+        clock += datetime.timedelta(minutes=1)
+        offset = args.base_rows + r * NEW_ROWS
+        collection.insert_many(documents(data.iloc[offset:offset + NEW_ROWS], clock))
+        edited = data["transaction_id"].iloc[r * EDITED_ROWS:(r + 1) * EDITED_ROWS].tolist()
+        collection.update_many(
+            {"transaction_id": {"$in": edited}},
+            {"$set": {"amount_usd": 12345.67, "risk_score": 9, "updated_at": clock}}
+        )
+
+        start = time.perf_counter()
+        full_export(collection)
+        export_seconds = time.perf_counter() - start
+
+        rows, fetch, apply = timed_sync(sync)
+        assert rows == NEW_ROWS + EDITED_ROWS, rows
+        print(f"{r + 1:>5} {collection.count_documents({}):>9,} {export_seconds:>11.2f}s "
+              f"{fetch:>10.3f}s {apply:>10.3f}s {fetch + apply:>10.3f}s")
+
+    rebuilt = full_export(collection)
+    assert summary(simple_chatbot.transaction_store) == summary(rebuilt), "synced store differs from a full reload"
+    print(f"Synced store matches a full reload ({len(rebuilt):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
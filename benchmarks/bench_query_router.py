@@ -0,0 +1,148 @@
+"""
+Answer latency of chatbot/api.py /chat over a fixed question set, with and
+without the structured query router in front of the RAG chain.
+
+Every question is first given to QueryRouter.route over a TransactionStore
+of synthetic transactions; the ones it answers are checked against an
+independent pandas computation (the exact count, total, average, ranking or
+record must appear in the answer), and the ones it passes on are charged
+the cost of a RAG call (retrieval plus LLM generation), simulated as
+--llm-ms. Latency percentiles are reported per route and for the whole set.
+
+Usage: python benchmarks/bench_query_router.py [rows] [--repeats 20] [--llm-ms 3000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_transaction_store import synthetic_transactions
+from query_router import QueryRouter
+from transaction_store import TransactionStore
+
+# Row given a short numeric transaction_id among the UUIDs
+SHORT_ID_ROW = 7
+
+
+def money(x):
+    return f"${x:,.2f}"
+
+
+def questions(df):
+    """(question, expected text in the answer or None when it should go to RAG)"""
+    amount, risk, flag = df["amount_usd"], df["risk_score"], df["isSuspicious"]
+    dates = pd.to_datetime(df["transaction_date"])
+    known = df.iloc[123]
+    short = df.iloc[SHORT_ID_ROW]
+    newest = df[flag].assign(d=dates).sort_values("d", ascending=False, kind="stable")
+    top_by_amount = (df.loc[flag, ["beneficiary_country", "amount_usd"]]
+                     .groupby("beneficiary_country")["amount_usd"].sum().nlargest(3))
+    return [
+        ("How many transactions are there?", f"{len(df):,}"),
+        ("How many suspicious transactions?", f"{flag.sum():,}"),
+        ("How many normal transactions?", f"{(~flag).sum():,}"),
+        ("How many suspicious transactions from IR to DE in 2024?",
+         f"{(flag & (df.originator_country == 'IR') & (df.beneficiary_country == 'DE') & (dates.dt.year == 2024)).sum():,}"),
+        ("Count transactions between 1k and 5k since 2024-01-01",
+         f"{((amount > 1000) & (amount < 5000) & (dates >= '2024-01-01')).sum():,}"),
+        ("How many high risk transactions involving Russia?",
+         f"{((risk >= 7) & ((df.originator_country == 'RU') | (df.beneficiary_country == 'RU'))).sum():,}"),
+        ("Total amount of transactions to Iran", money(amount[df.beneficiary_country == "IR"].sum())),
+        ("How much was sent from Germany to the United States in March 2023?",
+         money(amount[(df.originator_country == "DE") & (df.beneficiary_country == "US")
+                      & (dates.dt.strftime("%Y-%m") == "2023-03")].sum())),
+        ("What is the average risk score of suspicious transactions?", f"{risk[flag].mean():.2f}"),
+        ("Average amount of SWIFT payments over $10k",
+         money(amount[(df.payment_type == "SWIFT") & (amount > 10000)].mean())),
+        ("Top 5 originator countries", f"{df.originator_country.value_counts().iloc[0]:,} transactions"),
+        ("Top 3 beneficiary countries by amount for suspicious transactions",
+         f"{top_by_amount.index[0]}: {money(top_by_amount.iloc[0])}"),
+        ("Show the 10 most recent suspicious transactions", str(newest.transaction_id.iloc[0])),
+        ("Show me the 3 largest transactions", str(df.transaction_id[amount.idxmax()])),
+        ("List high risk transactions from RU over $50,000",
+         f"{((risk >= 7) & (df.originator_country == 'RU') & (amount > 50000)).sum():,}"),
+        (f"Show transaction {known.transaction_id}", money(known.amount_usd)),
+        (f"Is {known.transaction_id.upper()} suspicious?", money(known.amount_usd)),
+        ("Suspicious transactions mentioning gift for family",
+         f"{(flag & (df.payment_instruction == 'gift for family')).sum():,}"),
+        ("How many transactions for account ACC00042?", f"{(df.account_key == 'ACC00042').sum():,}"),
+        ("Top 5 accounts by amount", money(amount.groupby(df.account_key).sum().max())),
+        # Free-form: retrieval and the LLM
+        ("Why was this transaction flagged?", None),
+        ("What patterns do you see in the suspicious transactions?", None),
+        ("Which transactions look like structuring?", None),
+        ("Explain the risk of sending money to IR", None),
+        ("Are there any unusual payment instructions?", None),
+        (f"Show transaction {short.transaction_id}", money(short.amount_usd)),
+        # A short ID only counts after a cue word; otherwise it is just a number
+        (f"How many transactions happened in {short.transaction_id} ways?", None),
+        # "id" followed by an ordinary word or an unknown number names no transaction
+        ("What is the id of the largest transaction?", None),
+        ("How many transactions with id 5?", None),
+    ]
+
+
+def percentiles(seconds):
+    return [np.percentile(seconds, p) * 1000 for p in (50, 95)] + [max(seconds) * 1000]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="?", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=3000, help="Simulated cost of one RAG call")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    df = synthetic_transactions(args.rows)
+    df["account_key"] = [f"ACC{x:05d}" for x in rng.integers(0, 5000, args.rows)]
+    df["payment_type"] = rng.choice(["NEFT", "RTGS", "SWIFT", "IMPS"], args.rows)
+    df.loc[SHORT_ID_ROW, "transaction_id"] = "12345"
+    router = QueryRouter(TransactionStore(df))
+
+    timings = {}
+    baseline = []
+    routed_total = []
+    for question, expected in questions(df):
+        answer = router.route(question)
+        if expected is None:
+            assert answer is None, f"{question!r} should go to RAG, got {answer.query}"
+        else:
+            assert answer is not None, f"{question!r} was not routed"
+            assert expected in answer.answer, f"{question!r}: {expected!r} not in {answer.answer!r}"
+        route = answer.query.intent if answer else "rag"
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            router.route(question)
+            seconds = time.perf_counter() - start
+            if route == "rag":
+                seconds += args.llm_ms / 1000
+            timings.setdefault(route, []).append(seconds)
+            routed_total.append(seconds)
+            baseline.append(args.llm_ms / 1000)
+
+    routed = sum(len(t) for r, t in timings.items() if r != "rag") // args.repeats
+    print(f"{len(df):,} transactions, {len(baseline) // args.repeats} questions x {args.repeats}, "
+          f"RAG call simulated as {args.llm_ms:.0f} ms; routed answers match pandas")
+    print(f"{'route':<12} {'questions':>9} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for route, seconds in sorted(timings.items()):
+        print(f"{route:<12} {len(seconds) // args.repeats:>9} " + " ".join(f"{v:>10.2f}" for v in percentiles(seconds)))
+    print(f"{'all, RAG':<12} {len(baseline) // args.repeats:>9} "
+          + " ".join(f"{v:>10.2f}" for v in percentiles(baseline)))
+    print(f"{'all, router':<12} {len(routed_total) // args.repeats:>9} "
+          + " ".join(f"{v:>10.2f}" for v in percentiles(routed_total)))
+    print(f"{routed} of {len(baseline) // args.repeats} questions answered exactly without the LLM; "
+          f"mean latency {np.mean(baseline) * 1000:.0f} -> {np.mean(routed_total) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Concurrent exchange-rate backfill against a local stand-in for the
+exchangerate-api history endpoint.
+
+The stand-in server adds a fixed latency per request and answers a share of
+requests with HTTP 503, so the run exercises retries. The first backfill is
+cut short by a request budget, and the second resumes from the SQLite store.
+Each stored rate is checked against the value the server generated.
+
+Usage: python benchmarks/bench_rate_backfill.py [dates] [latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.rates import RateStore, backfill
+
+CURRENCIES = ["EUR", "GBP", "INR", "JPY", "AED", "CHF", "SGD", "BRL", "ZAR", "CNY"]
+FAILURE_EVERY = 7
+
+
+def expected_rate(date, currency):
+    return 1 + zlib.crc32(f"{date}:{currency}".encode()) % 10_000 / 100
+
+
+def stand_in_app(latency):
+    app = web.Application()
+    counter = app["counter"] = {"requests": 0}
+
+    async def history(request):
+        counter["requests"] += 1
+        await asyncio.sleep(latency)
+        if counter["requests"] % FAILURE_EVERY == 0:
+            return web.Response(status=503)
+        date = "{year}-{month}-{day}".format(**request.match_info)
+        return web.json_response({
+            "result": "success",
+            "conversion_rates": {c: expected_rate(date, c) for c in CURRENCIES}
+        })
+
+    app.router.add_get("/v6/{key}/history/USD/{year}/{month}/{day}", history)
+    return app
+
+
+async def run(n_dates, latency):
+    app = stand_in_app(latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}/v6"
+
+    dates = pd.date_range("2020-01-01", periods=n_dates).strftime("%d-%m-%Y")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateStore(os.path.join(tmp, "rates.sqlite"))
+
+        start = time.perf_counter()
+        first = await backfill(store, dates, "test-key", base_url=base_url, max_requests=n_dates // 2,
+                               backoff=0.01)
+        first_s = time.perf_counter() - start
+        print(f"budgeted run:  fetched {first['fetched']:>6,} dates with {first['requests']:>6,} requests "
+              f"in {first_s:6.2f}s, stopped: {first['stopped']}")
+
+        start = time.perf_counter()
+        second = await backfill(store, dates, "test-key", base_url=base_url, max_requests=10 * n_dates,
+                                backoff=0.01)
+        second_s = time.perf_counter() - start
+        print(f"resumed run:   fetched {second['fetched']:>6,} dates with {second['requests']:>6,} requests "
+              f"in {second_s:6.2f}s, remaining: {second['remaining']}")
+
+        sequential_s = app["counter"]["requests"] * latency
+        print(f"throughput:    {n_dates / (first_s + second_s):,.0f} dates/s "
+              f"(sequential at {latency * 1000:.0f} ms/request: ~{sequential_s:.1f}s)")
+
+        assert second["remaining"] == 0 and not second["failed"], "backfill did not complete"
+        frame = store.to_frame()
+        frame = frame[frame["currency"] != "USD"]
+        expected = [expected_rate(d, c) for d, c in zip(frame["date"], frame["currency"])]
+        assert len(frame) == n_dates * len(CURRENCIES), "missing rates in the store"
+        assert (frame["rate"].to_numpy() == expected).all(), "stored rates differ from the server"
+        print(f"store: {store.stats()['rates']:,} rates, all match the server: OK")
+
+        third = await backfill(store, dates, "test-key", base_url=base_url)
+        assert third["requests"] == 0, "complete store should not send requests"
+        store.close()
+
+    await runner.cleanup()
+
+
+def main():
+    n_dates = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    asyncio.run(run(n_dates, latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Query latency of chatbot/simple_chatbot.py at 1M transactions: the former
+list-of-dicts query processor, which scans every row per query, against the
+indexed columnar TransactionStore. Both must give the same answer to every
+query. (Country questions are not listed: they contain "count" and so are
+answered by the count branch in both processors.)
+
+Usage: python benchmarks/bench_transaction_store.py [rows] [repeats]
+"""
+
+import os
+import re
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot"))
+
+import simple_chatbot
+from simple_chatbot import analyze_triggered_rules
+from transaction_store import TransactionStore
+
+COUNTRIES = ["US", "GB", "DE", "IN", "AE", "BR", "IR", "RU", "NG", "SG", "CH", "FR"]
+
+
+def synthetic_transactions(n, seed=8):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=730).strftime("%Y-%m-%d").to_numpy()
+    return pd.DataFrame({
+        "transaction_id": [str(uuid.UUID(int=int(x))) for x in rng.integers(0, 2**63, n)],
+        "transaction_date": dates[rng.integers(0, len(dates), n)],
+        "amount_usd": rng.lognormal(8, 2, n).round(2),
+        "transaction_amount": rng.lognormal(8, 2, n).round(2),
+        "risk_score": rng.integers(0, 11, n),
+        "isSuspicious": rng.random(n) < 0.3,
+        "originator_country": rng.choice(COUNTRIES, n),
+        "beneficiary_country": rng.choice(COUNTRIES, n),
+        "payment_instruction": rng.choice(["monthly rent", "gift for family", "invoice 42"], n),
+    })
+
+
+def legacy_query_processor(transaction_data, query):
+    """simple_query_processor before the TransactionStore, over a list of dicts"""
+    
+    if not transaction_data:
+        return "No transaction data available. Please upload a CSV file or refresh data from MongoDB."
+    
+    query_lower = query.lower()
+    
+    # Count queries
+    if "count" in query_lower or "how many" in query_lower:
+        if "suspicious" in query_lower:
+            suspicious_count = sum(1 for t in transaction_data if t.get('isSuspicious', False))
+            return f"Found {suspicious_count} suspicious transactions out of {len(transaction_data)} total transactions."
+        elif "normal" in query_lower:
+            normal_count = sum(1 for t in transaction_data if not t.get('isSuspicious', False))
+            return f"Found {normal_count} normal transactions out of {len(transaction_data)} total transactions."
+        else:
+            return f"Total transactions: {len(transaction_data)}"
+    
+    # Country queries
+    if "country" in query_lower:
+        if "originator" in query_lower:
+            countries = {}
+            for t in transaction_data:
+                country = t.get('originator_country', 'Unknown')
+                countries[country] = countries.get(country, 0) + 1
+            result = "Originator countries:\n"
+            for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True)[:10]:
+                result += f"- {country}: {count} transactions\n"
+            return result
+        elif "beneficiary" in query_lower:
+            countries = {}
+            for t in transaction_data:
+                country = t.get('beneficiary_country', 'Unknown')
+                countries[country] = countries.get(country, 0) + 1
+            result = "Beneficiary countries:\n"
+            for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True)[:10]:
+                result += f"- {country}: {count} transactions\n"
+            return result
+    
+    # Amount queries
+    if "amount" in query_lower or "value" in query_lower:
+        if "high" in query_lower or "large" in query_lower:
+            high_value = [t for t in transaction_data if t.get('amount_usd', 0) > 10000]
+            return f"Found {len(high_value)} high-value transactions (>$10,000). Average amount: ${sum(t.get('amount_usd', 0) for t in high_value) / len(high_value):,.2f}" if high_value else "No high-value transactions found."
+        else:
+            total_amount = sum(t.get('amount_usd', 0) for t in transaction_data)
+            avg_amount = total_amount / len(transaction_data) if transaction_data else 0
+            return f"Total transaction value: ${total_amount:,.2f}. Average transaction: ${avg_amount:,.2f}"
+    
+    # Risk score queries
+    if "risk" in query_lower or "score" in query_lower:
+        if "high" in query_lower:
+            high_risk = [t for t in transaction_data if t.get('risk_score', 0) >= 7]
+            return f"Found {len(high_risk)} high-risk transactions (score >= 7)."
+        elif "average" in query_lower or "avg" in query_lower:
+            avg_risk = sum(t.get('risk_score', 0) for t in transaction_data) / len(transaction_data) if transaction_data else 0
+            return f"Average risk score: {avg_risk:.2f}"
+        else:
+            risk_scores = [t.get('risk_score', 0) for t in transaction_data]
+            return f"Risk score distribution: Min: {min(risk_scores)}, Max: {max(risk_scores)}, Average: {sum(risk_scores)/len(risk_scores):.2f}"
+    
+    # Transaction ID queries with detailed rule analysis
+    if "transaction_id" in query_lower or "id" in query_lower or "flagged" in query_lower or "fraud" in query_lower or "rule" in query_lower:
+        # Extract potential transaction ID from query
+        id_match = re.search(r'[a-f0-9\-]{20,}', query)
+        if id_match:
+            transaction_id = id_match.group()
+            for t in transaction_data:
+                if str(t.get('transaction_id', '')).lower() == transaction_id.lower():
+                    # Analyze triggered rules
+                    triggered_rules = analyze_triggered_rules(t)
+                    
+                    result = f"Transaction Analysis for ID: {transaction_id}\n"
+                    result += f"Amount: ${t.get('amount_usd', 0):,.2f}\n"
+                    result += f"Risk Score: {t.get('risk_score', 0)}\n"
+                    result += f"Suspicious: {t.get('isSuspicious', False)}\n"
+                    result += f"Beneficiary Country: {t.get('beneficiary_country', 'N/A')}\n"
+                    result += f"Payment Instruction: {t.get('payment_instruction', 'N/A')[:100]}...\n\n"
+                    
+                    if triggered_rules:
+                        result += "Rules Triggered:\n"
+                        total_score = 0
+                        for rule in triggered_rules:
+                            result += f"• {rule['rule']} (+{rule['score']} points): {rule['details']}\n"
+                            total_score += rule['score']
+                        result += f"\nTotal Rule Score: {total_score}\n"
+                        result += f"Transaction flagged as suspicious: {'Yes' if t.get('isSuspicious', False) else 'No'}"
+                    else:
+                        result += "No specific rules triggered. Transaction may be flagged due to:\n"
+                        result += "• Overall risk assessment\n"
+                        result += "• Pattern analysis\n"
+                        result += "• Manual review"
+                    
+                    return result
+            return f"Transaction ID {transaction_id} not found."
+    
+    # Date queries
+    if "date" in query_lower or "recent" in query_lower:
+        if "recent" in query_lower:
+            # Sort by date and return recent transactions
+            sorted_data = sorted(transaction_data, key=lambda x: x.get('transaction_date', ''), reverse=True)
+            recent = sorted_data[:5]
+            result = "Recent transactions:\n"
+            for t in recent:
+                result += f"- {t.get('transaction_date', 'N/A')}: ${t.get('amount_usd', 0):,.2f} ({'Suspicious' if t.get('isSuspicious', False) else 'Normal'})\n"
+            return result
+    
+    # Default response
+    return f"I can help you analyze {len(transaction_data)} transactions. Try asking about:\n- Count of suspicious/normal transactions\n- Transactions by country\n- High-value transactions\n- Risk scores\n- Recent transactions\n- Specific transaction IDs\n- Why a transaction was flagged (include transaction ID)"
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        answer = fn()
+        samples.append(time.perf_counter() - start)
+    return answer, np.array(samples)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    df = synthetic_transactions(n)
+    some_id = df["transaction_id"].iat[n // 2]
+
+    start = time.perf_counter()
+    transaction_data = df.to_dict("records")
+    print(f"{n:,} transactions; list of dicts built in {time.perf_counter() - start:.2f}s", end="")
+    start = time.perf_counter()
+    simple_chatbot.transaction_store = TransactionStore(df)
+    print(f", TransactionStore built in {time.perf_counter() - start:.2f}s\n")
+
+    queries = [
+        "How many suspicious transactions?",
+        "count normal transactions",
+        "high value amount",
+        "total amount",
+        "high risk transactions",
+        "average risk score",
+        "risk score distribution",
+        f"why was transaction_id {some_id} flagged?",
+        "show recent transactions",
+    ]
+    print(f"{'query':<44} {'list p50':>10} {'store p50':>10} {'store p99':>10} {'speed-up':>9}")
+    for query in queries:
+        legacy_repeats = max(1, repeats // 10)
+        expected, legacy = timed(lambda: legacy_query_processor(transaction_data, query), legacy_repeats)
+        actual, indexed = timed(lambda: simple_chatbot.simple_query_processor(query), repeats)
+        assert actual == expected, f"answers differ for {query!r}:\n{actual}\n---\n{expected}"
+        p50, p99 = np.percentile(indexed, 50), np.percentile(indexed, 99)
+        print(f"{query[:44]:<44} {np.median(legacy) * 1e3:8.2f}ms {p50 * 1e3:8.3f}ms {p99 * 1e3:8.3f}ms "
+              f"{np.median(legacy) / p50:8.0f}x")
+    print("\nall answers identical: OK")
+
+
+if __name__ == "__main__":
+    main()
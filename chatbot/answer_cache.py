@@ -0,0 +1,197 @@
+"""
+Response cache for the /chat endpoints.
+
+Analysts ask the same few questions over and over; a RAG answer costs
+seconds of retrieval and generation. `AnswerCache` keeps recent responses
+keyed on the normalised question (case, spacing, quotes and trailing
+punctuation do not matter), evicting the least recently used entry beyond
+ANSWER_CACHE_SIZE entries or ANSWER_CACHE_MB of estimated memory and
+expiring entries after ANSWER_CACHE_TTL seconds.
+
+With an `embed` function and ANSWER_CACHE_SIMILARITY above 0, a question
+that misses is also matched against cached ones by cosine similarity of
+their embeddings, so paraphrases hit. A paraphrase only matches an entry
+with the same anchors (numbers, IDs, upper-case codes and negations), so
+"transaction 17" never gets the answer for "transaction 71".
+
+Every entry belongs to a dataset version (`version()`, e.g. the
+TransactionStore's); when it changes the whole cache is dropped, and
+answers computed against an older version are not stored. `stats` reports
+hits, misses and the latency the hits saved.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_MB = float(os.getenv("ANSWER_CACHE_MB", "32"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Minimum cosine similarity for a paraphrase hit; 0 matches exact questions only
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+NEGATIONS = {"not", "no", "non", "never", "without", "except", "excluding"}
+
+
+def normalize_question(question):
+    """Lower-case, single-spaced question without quotes or trailing punctuation"""
+    text = question.strip().lower().replace("’", "'")
+    text = re.sub(r"[\"'`]", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.")
+
+
+def question_anchors(question):
+    """Words a paraphrase must keep: numbers, IDs, upper-case codes and negations"""
+    tokens = re.findall(r"[\w-]+", question)
+    anchors = {t.lower() for t in tokens if any(c.isdigit() for c in t) or (t.isupper() and len(t) <= 3)}
+    return frozenset(anchors | {t.lower() for t in tokens if t.lower() in NEGATIONS or t.lower().endswith("n't")})
+
+
+@dataclass
+class _Entry:
+    value: object
+    seconds: float
+    created: float
+    size: int
+    anchors: frozenset
+    vector: np.ndarray = None
+
+
+class AnswerCache:
+    """LRU + TTL cache of chat responses for one dataset version"""
+
+    def __init__(self, version=None, embed=None, max_entries=ANSWER_CACHE_SIZE, max_mb=ANSWER_CACHE_MB,
+                 ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY, clock=time.monotonic):
+        self.version = version or (lambda: None)
+        self.embed_function = embed
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1e6)
+        self.ttl = ttl
+        self.similarity = similarity if embed is not None else 0
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys([
+            "hits", "semantic_hits", "misses", "stores", "evictions", "expirations", "invalidations",
+            "stale_skipped"
+        ], 0)
+        self.saved_seconds = 0.0
+
+    @property
+    def semantic(self):
+        return self.similarity > 0
+
+    def embed(self, question):
+        """Normalised embedding of a question, for `get`/`put` (blocking)"""
+        vector = np.asarray(self.embed_function(normalize_question(question)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        """Drop everything when the dataset changed; returns the current version"""
+        version = self.version()
+        if version != self._version:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+        return version
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _live(self, key, entry, now):
+        if now - entry.created <= self.ttl:
+            return True
+        self._drop(key)
+        self.counters["expirations"] += 1
+        return False
+
+    def _hit(self, key, entry, counter):
+        self._entries.move_to_end(key)
+        self.counters[counter] += 1
+        self.saved_seconds += entry.seconds
+        return entry.value
+
+    def get(self, question, vector=None):
+        """
+        Cached response for `question`, or None. The exact question is tried
+        first; with a `vector` from `embed`, then the closest paraphrase.
+        Misses are counted by `put`, so a question may be looked up twice.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and self._live(key, entry, now):
+                return self._hit(key, entry, "hits")
+            if vector is not None and self.semantic:
+                anchors = question_anchors(question)
+                candidates = [(k, e) for k, e in list(self._entries.items())
+                              if e.vector is not None and e.anchors == anchors and self._live(k, e, now)]
+                if candidates:
+                    scores = np.stack([e.vector for _, e in candidates]) @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        return self._hit(*candidates[best], "semantic_hits")
+            return None
+
+    def put(self, question, value, seconds, vector=None, version=None):
+        """
+        Cache `value`, which took `seconds` to compute, for `question`; each
+        put counts as one miss. `version` is the dataset version read before
+        computing it; the answer is not stored if the data changed since.
+        """
+        key = normalize_question(question)
+        size = sys.getsizeof(key) + len(json.dumps(value, default=str)) + (vector.nbytes if vector is not None else 0)
+        with self._lock:
+            self.counters["misses"] += 1
+            current = self._check_version()
+            if version is not None and version != current:
+                self.counters["stale_skipped"] += 1
+                return False
+            if size > self.max_bytes:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, seconds, self.clock(), size, question_anchors(question), vector)
+            self._bytes += size
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        hits = self.counters["hits"] + self.counters["semantic_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "semantic": self.semantic
+        }
@@ -1,25 +1,40 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import pandas as pd
 import os
 import tempfile
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_openai import OpenAIEmbeddings
-import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, format_document
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains.combine_documents.base import DEFAULT_DOCUMENT_SEPARATOR
 from langchain_ollama import OllamaLLM
 import json
 from typing import List, Dict, Any
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
 import os
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime
 
+# Make the shared aml_engine package importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.concurrency import BoundedExecutor, ExecutorSaturated
+from aml_engine.dataset import read_transactions
+from answer_cache import AnswerCache
+from hybrid_retriever import HybridRetriever
+from local_embeddings import LocalEmbeddings
+from mongo_sync import MongoSync
+from query_router import ROUTER_COLUMNS, QueryRouter
+from transaction_documents import DOCUMENT_PROMPT
+from transaction_store import TransactionStore
+from vector_index import VECTOR_INDEX_PATH, IncrementalIndex
+
 app = FastAPI(title="AML RAG Chatbot API", version="1.0.0")
 
 # CORS middleware
@@ -33,7 +48,11 @@ app.add_middleware(
 
 # Global variables for RAG system
 vector_store = None
+vector_index = None
+retriever = None
 rag_chain = None
+# Bumped when a rebuilt vector index is swapped in
+index_swaps = 0
 llm = None
 embeddings = None
 
@@ -41,8 +60,38 @@ embeddings = None
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB = os.getenv("MONGODB_DB", "aml_monitoring")
 
-client = AsyncIOMotorClient(MONGODB_URI)
-db = client[MONGODB_DB]
+mongo_sync = None
+sync_lock = asyncio.Lock()
+
+# The vector index is saved under VECTOR_INDEX_PATH and reloaded
+# memory-mapped on restart. Changes are saved at most every
+# INDEX_SAVE_INTERVAL seconds, and on shutdown.
+INDEX_SAVE_INTERVAL = int(os.getenv("INDEX_SAVE_INTERVAL", "300"))
+MONGODB_DATASET = f"mongodb:{MONGODB_DB}.transactions"
+index_saved_at = 0.0
+index_problems = {}
+rebuild_task = None
+
+# Count, sum, top-N and ID questions are answered exactly from an in-memory
+# TransactionStore, kept in step with MongoDB and CSV uploads, before RAG
+transaction_store = TransactionStore()
+query_router = QueryRouter(transaction_store)
+store_sync = None
+
+# Responses are cached per question (and, with ANSWER_CACHE_SIMILARITY set,
+# per paraphrase) until the transaction store changes or the vector index is
+# swapped for a rebuilt one
+answer_cache = AnswerCache(
+    version=lambda: (transaction_store.version, index_swaps),
+    embed=lambda text: embeddings.embed_query(text)
+)
+
+# Blocking RAG work (embedding, FAISS search, Ollama generation) runs on a
+# bounded pool so a long chat never stalls /health or other requests.
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_QUEUE = int(os.getenv("CHAT_QUEUE", "8"))
+
+executor = BoundedExecutor(max_workers=CHAT_WORKERS, max_queue=CHAT_QUEUE, name="rag")
 
 class ChatRequest(BaseModel):
     message: str
@@ -50,52 +99,67 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]] = []
+    route: str = "rag"
+    cached: bool = False
+
+def build_rag_prompt():
+    """Prompt taking the retrieved `context` and the user's `input`"""
+    system_prompt = (
+        "You are an AML (Anti-Money Laundering) assistant for question-answering tasks using RAG from transaction data. "
+        "Use the following pieces of retrieved context to answer the question. "
+        "This data contains transaction information including transaction_id, amounts, countries, risk scores, and suspicious flags. "
+        "You can help with queries like: "
+        "- Finding specific transactions by ID "
+        "- Analyzing suspicious transactions "
+        "- Counting transactions by criteria "
+        "- Risk score analysis "
+        "- Country-wise transaction analysis "
+        "If you don't know the answer, say that you don't know. Use three sentences maximum and keep the answer concise."
+        "\n\n"
+        "{context}"
+    )
+    
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "{input}"),
+    ])
+
+def build_rag_chain(retriever):
+    """Retrieval chain answering from the documents `retriever` finds"""
+    question_answer_chain = create_stuff_documents_chain(llm, build_rag_prompt(), document_prompt=DOCUMENT_PROMPT)
+    return create_retrieval_chain(retriever, question_answer_chain)
+
+def open_vector_index():
+    """
+    Load the saved vector index (memory-mapped), or start an empty one.
+    Returns (index, problems) where problems lists manifest mismatches.
+    """
+    if IncrementalIndex.exists(VECTOR_INDEX_PATH):
+        index, problems = IncrementalIndex.open(VECTOR_INDEX_PATH, embeddings, MONGODB_DATASET)
+        if index is not None:
+            print(f"Loaded vector index with {len(index)} documents from {VECTOR_INDEX_PATH}")
+            return index, problems
+        print(f"Saved vector index is unusable ({problems['index'][0]}), starting a new one")
+    return IncrementalIndex.create(VECTOR_INDEX_PATH, embeddings, MONGODB_DATASET), {}
 
 def initialize_rag_system():
     """Initialize the RAG system with embeddings and LLM"""
-    global llm, embeddings, vector_store, rag_chain
+    global llm, embeddings, vector_store, vector_index, retriever, rag_chain, index_problems
     
     try:
         # Initialize LLM (Ollama)
         llm = OllamaLLM(model="llama3.1:8b")
         
-        # Initialize embeddings (using a simple approach)
-        embeddings = OpenAIEmbeddings(openai_api_key="dummy-key")  # We'll use a simple fallback
-        
-        # Create empty vector store
-        dim = len(embeddings.embed_query(" "))
-        index = faiss.IndexFlatL2(dim)
-        
-        vector_store = FAISS(
-            embedding_function=embeddings,
-            index=index,
-            docstore=InMemoryDocstore(),
-            index_to_docstore_id={}
-        )
+        # Local sentence-transformer on the CPU, batched across requests and cached on disk
+        embeddings = LocalEmbeddings()
         
-        # Create RAG chain
-        system_prompt = (
-            "You are an AML (Anti-Money Laundering) assistant for question-answering tasks using RAG from transaction data. "
-            "Use the following pieces of retrieved context to answer the question. "
-            "This data contains transaction information including transaction_id, amounts, countries, risk scores, and suspicious flags. "
-            "You can help with queries like: "
-            "- Finding specific transactions by ID "
-            "- Analyzing suspicious transactions "
-            "- Counting transactions by criteria "
-            "- Risk score analysis "
-            "- Country-wise transaction analysis "
-            "If you don't know the answer, say that you don't know. Use three sentences maximum and keep the answer concise."
-            "\n\n"
-            "{context}"
-        )
+        # Reuse the saved index; only new or changed transactions get embedded
+        vector_index, index_problems = open_vector_index()
+        vector_store = vector_index.vector_store
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "{input}"),
-        ])
-        
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
-        rag_chain = create_retrieval_chain(vector_store.as_retriever(), question_answer_chain)
+        # Create RAG chain; exact ID and account lookups, BM25 and FAISS search
+        retriever = HybridRetriever(index=vector_index)
+        rag_chain = build_rag_chain(retriever)
         
         print("RAG system initialized successfully")
         
@@ -103,48 +167,156 @@ def initialize_rag_system():
         print(f"Error initializing RAG system: {e}")
         raise e
 
-async def export_mongodb_to_csv():
-    """Export MongoDB transactions to CSV file"""
+def new_mongo_sync(index=None):
+    """A sync of the transactions collection, resuming where `index` was saved"""
+    sync = MongoSync(MongoClient(MONGODB_URI)[MONGODB_DB].transactions)
+    if index is not None and index.sync_state:
+        sync.restore(index.sync_state)
+    return sync
+
+def get_mongo_sync():
+    """Incremental sync of the transactions collection, created on first use"""
+    global mongo_sync
+    if mongo_sync is None:
+        mongo_sync = new_mongo_sync(vector_index)
+    return mongo_sync
+
+def apply_changes_to_rag(upserts, deleted, index=None):
+    """Embed new and changed MongoDB transactions and drop deleted ones"""
+    if index is None:
+        index = vector_index
+    result = index.upsert(upserts, source="mongodb") if len(upserts) else {"embedded": 0, "unchanged": 0, "keys": []}
+    result["deleted"] = index.delete(deleted) if deleted else 0
+    return result
+
+def save_vector_index(force=False):
+    """Save index changes, at most every INDEX_SAVE_INTERVAL seconds unless forced"""
+    global index_saved_at
+    if not vector_index.has_unsaved_changes:
+        return False
+    if not force and time.time() - index_saved_at < INDEX_SAVE_INTERVAL:
+        return False
+    sync = get_mongo_sync()
+    vector_index.save(dataset_version=sync.version, sync_state=sync.state())
+    index_saved_at = time.time()
+    return True
+
+def rebuilding():
+    return rebuild_task is not None and not rebuild_task.done()
+
+async def rebuild_vector_index():
+    """
+    Build a new index from MongoDB beside the serving one, then swap it in.
+    The old index keeps answering until the swap.
+    """
+    global vector_index, vector_store, retriever, rag_chain, mongo_sync, index_problems, index_swaps
+    rebuild_path = f"{VECTOR_INDEX_PATH}.rebuild"
     try:
-        collection = db.transactions
-        transactions = await collection.find({}).to_list(length=None)
+        index = await asyncio.to_thread(IncrementalIndex.create, rebuild_path, embeddings, MONGODB_DATASET)
+        sync = new_mongo_sync()
+        apply = lambda upserts, deleted: apply_changes_to_rag(upserts, deleted, index)
+        await asyncio.to_thread(sync.sync, apply)
         
-        if not transactions:
-            return None
+        async with sync_lock:
+            # Pick up what changed during the build, then swap directories
+            await asyncio.to_thread(sync.sync, apply)
+            await asyncio.to_thread(index.save, sync.version, sync.state())
+            index.close()
+            sync.close()
+            retired_path = f"{VECTOR_INDEX_PATH}.old"
+            shutil.rmtree(retired_path, ignore_errors=True)
+            os.replace(VECTOR_INDEX_PATH, retired_path)
+            os.replace(rebuild_path, VECTOR_INDEX_PATH)
             
-        # Convert ObjectId to string for JSON serialization
-        for transaction in transactions:
-            transaction['_id'] = str(transaction['_id'])
-        
-        # Create DataFrame
-        df = pd.DataFrame(transactions)
-        
-        # Save to CSV
-        csv_path = "chatbot/mongodb_transactions.csv"
-        df.to_csv(csv_path, index=False)
-        
-        return csv_path
-        
+            rebuilt, _ = await asyncio.to_thread(IncrementalIndex.open, VECTOR_INDEX_PATH, embeddings, MONGODB_DATASET)
+            # Requests already running finish on the old index
+            vector_index, vector_store = rebuilt, rebuilt.vector_store
+            retriever = HybridRetriever(index=rebuilt)
+            rag_chain = build_rag_chain(retriever)
+            # Answers retrieved from the old index are not stored or served
+            index_swaps += 1
+            if mongo_sync is not None:
+                mongo_sync.close()
+            mongo_sync = new_mongo_sync(rebuilt)
+            index_problems = {}
+        shutil.rmtree(retired_path, ignore_errors=True)
+        print(f"Vector index rebuilt with {len(rebuilt)} documents")
     except Exception as e:
-        print(f"Error exporting MongoDB to CSV: {e}")
-        return None
+        print(f"Error rebuilding vector index: {e!r}")
 
-def load_csv_to_rag(csv_path: str):
-    """Load CSV file into RAG system"""
-    global vector_store, rag_chain
-    
+async def sync_rag_from_mongodb(full=False):
+    """
+    Index MongoDB changes since the last sync; returns sync stats. `full`
+    re-reads the whole collection, still embedding only changed
+    transactions, and drops indexed ones that are no longer in MongoDB.
+    """
+    async with sync_lock:
+        sync = get_mongo_sync()
+        if full:
+            sync.reset()
+        start = datetime.now()
+        stats = {"batches": 0, "upserts": 0, "deletes": 0, "embedded": 0, "unchanged": 0}
+        seen = set()
+        while True:
+            batch = await executor.run(sync.next_batch)
+            if batch is None:
+                break
+            result = await executor.run(apply_changes_to_rag, batch.upserts, batch.deleted)
+            sync.commit(batch)
+            if full:
+                seen.update(result["keys"])
+            stats["batches"] += 1
+            stats["upserts"] += len(batch.upserts)
+            stats["deletes"] += result["deleted"]
+            stats["embedded"] += result["embedded"]
+            stats["unchanged"] += result["unchanged"]
+        if full:
+            stats["deletes"] += await executor.run(vector_index.delete_missing, seen, "mongodb")
+        stats["saved"] = await executor.run(save_vector_index)
+        stats["seconds"] = round((datetime.now() - start).total_seconds(), 3)
+        stats["mode"] = sync.mode
+        return stats
+
+async def sync_transaction_store(full=False):
+    """
+    Apply MongoDB changes to the query router's store; `full` re-reads the
+    collection into a new store. Returns the number of changes applied.
+    """
+    global transaction_store, store_sync
+    async with sync_lock:
+        if store_sync is None:
+            # Not resumed: the store starts empty in every process
+            store_sync = MongoSync(MongoClient(MONGODB_URI)[MONGODB_DB].transactions, projection=ROUTER_COLUMNS)
+        if full:
+            store_sync.reset()
+        store = TransactionStore() if full else transaction_store
+        changes = 0
+        while True:
+            batch = await asyncio.to_thread(store_sync.next_batch)
+            if batch is None:
+                break
+            # Applied on the event loop so routed questions never see half a batch
+            store.upsert(batch.upserts)
+            store.delete(batch.deleted)
+            store_sync.commit(batch)
+            changes += len(batch)
+        transaction_store = query_router.store = store
+        return changes
+
+def row_source(transaction):
+    """A transaction dict as a JSON-safe chat source"""
+    return {
+        "content": query_router.summary(transaction),
+        "metadata": json.loads(pd.Series(transaction, dtype=object).to_json(date_format="iso"))
+    }
+
+def load_csv_to_rag(csv_path: str, source: str = None):
+    """Load CSV file into RAG system, embedding only new or changed rows"""
     try:
-        # Load CSV documents
-        loader = CSVLoader(file_path=csv_path)
-        docs = loader.load_and_split()
-        
-        # Add documents to vector store
-        vector_store.add_documents(documents=docs)
-        
-        # Update RAG chain with new retriever
-        rag_chain = create_retrieval_chain(vector_store.as_retriever(), rag_chain.combine_documents_chain)
+        result = vector_index.load_csv(csv_path, source=source)
         
-        print(f"Loaded {len(docs)} documents from {csv_path}")
+        print(f"Loaded {csv_path}: {result['embedded']} rows embedded, {result['unchanged']} unchanged")
+        save_vector_index()
         return True
         
     except Exception as e:
@@ -154,12 +326,45 @@ def load_csv_to_rag(csv_path: str):
 @app.on_event("startup")
 async def startup_event():
     """Initialize RAG system on startup"""
-    initialize_rag_system()
+    global rebuild_task
+    await executor.run(initialize_rag_system)
     
-    # Export MongoDB data to CSV and load into RAG
-    csv_path = await export_mongodb_to_csv()
-    if csv_path:
-        load_csv_to_rag(csv_path)
+    try:
+        changes = await sync_transaction_store()
+        print(f"Loaded {changes} MongoDB transactions for structured questions")
+    except Exception as e:
+        print(f"Error loading MongoDB data for structured questions: {e}")
+    
+    if index_problems:
+        # Built with another model or from another database: keep serving
+        # the saved index while a matching one is built
+        mismatches = ", ".join(f"{k} {saved!r} != {expected!r}" for k, (saved, expected) in index_problems.items())
+        print(f"Saved vector index does not match ({mismatches}); rebuilding in the background")
+        rebuild_task = asyncio.create_task(rebuild_vector_index())
+        return
+    
+    # Index MongoDB changes made since the index was saved, in batches
+    try:
+        stats = await sync_rag_from_mongodb()
+        print(f"Indexed {stats['upserts']} MongoDB transactions in {stats['seconds']}s")
+    except Exception as e:
+        print(f"Error loading MongoDB data: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if rebuild_task is not None:
+        rebuild_task.cancel()
+    if vector_index is not None:
+        async with sync_lock:
+            await asyncio.to_thread(save_vector_index, True)
+        vector_index.close()
+    executor.shutdown()
+    if embeddings is not None:
+        embeddings.close()
+    if mongo_sync is not None:
+        mongo_sync.close()
+    if store_sync is not None:
+        store_sync.close()
 
 @app.post("/upload-csv")
 async def upload_csv(file: UploadFile = File(...)):
@@ -175,76 +380,220 @@ async def upload_csv(file: UploadFile = File(...)):
             tmp_file_path = tmp_file.name
         
         # Load CSV into RAG system
-        success = load_csv_to_rag(tmp_file_path)
-        
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
+        try:
+            success = await executor.run(load_csv_to_rag, tmp_file_path, file.filename)
+            if success:
+                rows = await asyncio.to_thread(read_transactions, tmp_file_path, ROUTER_COLUMNS)
+                transaction_store.upsert(rows)
+        finally:
+            # Clean up temporary file
+            os.unlink(tmp_file_path)
         
         if success:
             return {"message": f"CSV file '{file.filename}' uploaded and processed successfully"}
         else:
             raise HTTPException(status_code=500, detail="Failed to process CSV file")
             
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def answer_without_rag(message, start, version):
+    """A cached or exactly routed response for `message`, or None"""
+    cached = answer_cache.get(message)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
+    # Structured questions are answered exactly, in milliseconds, without the LLM
+    routed = query_router.route(message)
+    if routed is None:
+        return None
+    response = {
+        "answer": routed.answer,
+        "sources": [row_source(t) for t in routed.rows],
+        "route": routed.query.intent
+    }
+    answer_cache.put(message, response, time.perf_counter() - start, version=version)
+    return response
+
+def check_rag_ready():
+    if not rag_chain:
+        raise HTTPException(status_code=500, detail="RAG system not initialized")
+    if rebuilding() and "dimension" in index_problems:
+        # The saved vectors cannot be searched with the new model
+        raise HTTPException(status_code=503, detail="Vector index is being rebuilt for a new embedding model")
+
+async def cached_paraphrase(message):
+    """(cached response for a paraphrase of `message` or None, question vector)"""
+    if not answer_cache.semantic:
+        return None, None
+    vector = await executor.run(answer_cache.embed, message)
+    cached = answer_cache.get(message, vector)
+    return ({**cached, "cached": True} if cached is not None else None), vector
+
+def document_sources(documents):
+    """Retrieved documents as chat sources"""
+    return [{
+        "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
+        "metadata": doc.metadata
+    } for doc in documents]
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Chat with the RAG system"""
     try:
-        if not rag_chain:
-            raise HTTPException(status_code=500, detail="RAG system not initialized")
+        start = time.perf_counter()
+        version = answer_cache.version()
+        response = answer_without_rag(request.message, start, version)
+        if response is not None:
+            return ChatResponse(**response)
         
-        # Get response from RAG chain
-        result = rag_chain.invoke({"input": request.message})
+        check_rag_ready()
+        cached, vector = await cached_paraphrase(request.message)
+        if cached is not None:
+            return ChatResponse(**cached)
         
-        # Extract sources from retrieved documents
-        sources = []
-        if 'context' in result:
-            for doc in result['context']:
-                sources.append({
-                    "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
-                    "metadata": doc.metadata
-                })
+        # Get response from RAG chain without blocking the event loop
+        result = await executor.run(rag_chain.invoke, {"input": request.message})
         
-        return ChatResponse(
-            answer=result['answer'],
-            sources=sources
-        )
+        response = {"answer": result['answer'], "sources": document_sources(result.get('context', [])), "route": "rag"}
+        answer_cache.put(request.message, response, time.perf_counter() - start, vector=vector, version=version)
+        return ChatResponse(**response)
         
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_rag_answer(retriever, message, events, loop, stop):
+    """
+    Retrieve with `retriever` and generate on a worker thread, handing the
+    documents and then each token to the `events` queue on `loop` until
+    generation finishes or `stop` is set. Same prompt and documents as
+    `build_rag_chain`, but the LLM is streamed directly: a closed LangChain
+    sequence stream still generates to the end, while closing the LLM's own
+    stream ends the Ollama request.
+    """
+    tokens = None
+    try:
+        documents = retriever.invoke(message)
+        loop.call_soon_threadsafe(events.put_nowait, {"context": documents})
+        context = DEFAULT_DOCUMENT_SEPARATOR.join(format_document(doc, DOCUMENT_PROMPT) for doc in documents)
+        tokens = llm.stream(build_rag_prompt().invoke({"input": message, "context": context}))
+        for token in tokens:
+            if stop.is_set():
+                break
+            loop.call_soon_threadsafe(events.put_nowait, {"answer": token})
+    finally:
+        if tokens is not None:
+            tokens.close()
+        loop.call_soon_threadsafe(events.put_nowait, None)
+
+async def answer_events(response):
+    """A complete response as stream events"""
+    yield sse("sources", response["sources"])
+    yield sse("token", {"text": response["answer"]})
+    yield sse("done", {"route": response.get("route", "rag"), "cached": response.get("cached", False)})
+
+async def rag_events(message, start, version, vector):
+    """Sources as soon as retrieval finishes, then LLM tokens as they are generated"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    stop = threading.Event()
+    # A client that disconnects cancels this generator; `stop` then ends the worker
+    work = asyncio.ensure_future(executor.run(stream_rag_answer, retriever, message, events, loop, stop))
+    # Also ends the loop below if the work never started (e.g. saturated)
+    work.add_done_callback(lambda _: events.put_nowait(None))
+    sources, tokens = [], []
+    try:
+        while True:
+            chunk = await events.get()
+            if chunk is None:
+                break
+            if "context" in chunk:
+                sources = document_sources(chunk["context"])
+                yield sse("sources", sources)
+            if "answer" in chunk:
+                tokens.append(chunk["answer"])
+                yield sse("token", {"text": chunk["answer"]})
+        await work
+    except ExecutorSaturated as e:
+        yield sse("error", {"detail": str(e), "status": 429})
+        return
+    except Exception as e:
+        yield sse("error", {"detail": str(e), "status": 500})
+        return
+    finally:
+        stop.set()
+        # Collect the worker's error even when the client went away
+        work.add_done_callback(lambda done: done.cancelled() or done.exception())
+    
+    response = {"answer": "".join(tokens), "sources": sources, "route": "rag"}
+    answer_cache.put(message, response, time.perf_counter() - start, vector=vector, version=version)
+    yield sse("done", {"route": "rag", "cached": False})
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Chat with the RAG system as server-sent events: `sources` (the
+    retrieved documents), then `token` events with the answer text as it is
+    generated, then `done` (or `error`). Cached and structured answers come
+    as a single token.
+    """
+    try:
+        start = time.perf_counter()
+        version = answer_cache.version()
+        response = answer_without_rag(request.message, start, version)
+        if response is None:
+            check_rag_ready()
+            response, vector = await cached_paraphrase(request.message)
+        if response is not None:
+            events = answer_events(response)
+        else:
+            if executor.saturated:
+                raise ExecutorSaturated(f"All {executor.max_workers} workers busy")
+            events = rag_events(request.message, start, version, vector)
+        return StreamingResponse(events, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/refresh-data")
-async def refresh_data():
-    """Refresh RAG system with latest MongoDB data"""
+async def refresh_data(full: bool = False):
+    """
+    Apply MongoDB changes since the last sync to the RAG index; `full`
+    re-reads every transaction but still only embeds changed ones
+    """
     try:
-        # Export latest MongoDB data
-        csv_path = await export_mongodb_to_csv()
+        if rebuilding():
+            raise HTTPException(status_code=409, detail="Vector index rebuild in progress")
         
-        if csv_path:
-            # Clear existing vector store
-            global vector_store
-            dim = len(embeddings.embed_query(" "))
-            index = faiss.IndexFlatL2(dim)
-            
-            vector_store = FAISS(
-                embedding_function=embeddings,
-                index=index,
-                docstore=InMemoryDocstore(),
-                index_to_docstore_id={}
-            )
-            
-            # Load new data
-            success = load_csv_to_rag(csv_path)
-            
-            if success:
-                return {"message": "Data refreshed successfully with latest MongoDB transactions"}
-            else:
-                raise HTTPException(status_code=500, detail="Failed to refresh data")
-        else:
-            raise HTTPException(status_code=500, detail="No data found in MongoDB")
+        stats = await sync_rag_from_mongodb(full)
+        stats["store_changes"] = await sync_transaction_store(full)
+        return {
+            "message": f"Synced {stats['upserts']} changed and {stats['deletes']} deleted MongoDB transactions "
+                       f"({stats['embedded']} embedded)",
+            "sync": stats
+        }
             
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -254,6 +603,17 @@ async def health_check():
     return {
         "status": "healthy",
         "rag_initialized": rag_chain is not None,
+        "executor": executor.stats(),
+        "mongo_sync": mongo_sync.stats if mongo_sync is not None else None,
+        "vector_index": {
+            "documents": len(vector_index), "generation": vector_index.generation, "rebuilding": rebuilding(),
+            "index_type": vector_store.index.kind, "trained": vector_store.index.is_trained,
+            **vector_index.stats
+        } if vector_index is not None else None,
+        "embeddings": embeddings.stats if embeddings is not None else None,
+        "retrieval": retriever.stats if retriever is not None else None,
+        "transaction_store": transaction_store.stats(),
+        "answer_cache": answer_cache.stats,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -0,0 +1,281 @@
+"""
+Hybrid retrieval for the RAG chatbot.
+
+Dense embeddings are a poor fit for identifiers: a question naming a
+transaction_id (a UUID) or an account key is embedded like any other text,
+and the nearest vectors rarely include that transaction. `HybridRetriever`
+runs up to three stages over an IncrementalIndex:
+
+- exact: the words of the question are looked up in hash indexes of
+  transaction ids and account keys (`LexicalIndex`). A question that names
+  a transaction gets that transaction back directly, without embedding
+  anything or searching further. Only words shaped like identifiers (a
+  digit and MIN_IDENTIFIER_LENGTH characters) or following a cue word
+  ("account 42", "transaction 7") are looked up.
+- bm25: Okapi BM25 over the document text (payment instruction, payment
+  type, route, triggered rules) through an inverted index
+- dense: FAISS search on the question embedding
+
+The transactions of a named account, the BM25 ranking and the dense ranking
+are merged by reciprocal-rank fusion: a document scores the sum of
+1 / (RRF_K + rank) over the lists it appears in. Like a named transaction,
+a named account outranks everything else, so its transactions come first,
+in fused order. `stats` reports calls and latency per stage.
+
+While the lexical index is still being rebuilt after a restart, ids are
+matched exactly as written against the indexed ids and everything else
+gets dense search alone.
+"""
+
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from operator import itemgetter
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+# Candidates each ranked stage contributes to the fusion
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", "20"))
+RRF_K = 60
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in more than this share of the documents (currencies, common
+# countries) barely change the ranking but have the longest postings
+BM25_MAX_DF = 0.5
+
+TERM = re.compile(r"[a-z0-9]+")
+# Identifiers keep their hyphens (UUIDs) and underscores
+IDENTIFIER = re.compile(r"[\w-]+")
+# A bare word is only looked up as an id or account key when it is shaped
+# like one, or when a cue word names it: "account 42", "transaction 7"
+MIN_IDENTIFIER_LENGTH = 8
+TRANSACTION_CUES = {"transaction", "txn", "id", "transaction_id", "txn_id"}
+ACCOUNT_CUES = {"account", "acct", "account_key", "key"}
+STAGES = ("exact", "bm25", "embed", "dense", "fuse")
+
+
+def terms(text):
+    return TERM.findall(text.lower())
+
+
+def identifiers(question, cues):
+    """Words of `question` that may name an identifier, in order"""
+    words = IDENTIFIER.findall(question)
+    return [word for previous, word in zip([""] + words, words)
+            if previous.lower() in cues
+            or (len(word) >= MIN_IDENTIFIER_LENGTH and any(c.isdigit() for c in word))]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Keys of several best-first rankings ordered by sum(1 / (k + rank))"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    """
+    Hash indexes of transaction ids and account keys and a BM25 inverted
+    index over document text, keyed by indexed id. IncrementalIndex keeps
+    it in step with its vectors.
+    """
+
+    def __init__(self):
+        # Lower-cased transaction id -> indexed id
+        self.ids = {}
+        # Lower-cased account key -> {indexed id: None}, in insertion order
+        self.accounts = {}
+        # Term -> {indexed id: term frequency}
+        self.postings = {}
+        # Indexed id -> (length, distinct terms, account key)
+        self.documents = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+        # Cleared while IncrementalIndex.open fills it in the background
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _remove(self, key):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        length, distinct, account = document
+        self.total_length -= length
+        self.ids.pop(key.lower(), None)
+        for term in distinct:
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+        if account is not None:
+            keys = self.accounts[account]
+            del keys[key]
+            if not keys:
+                del self.accounts[account]
+
+    def add(self, keys, texts, metadatas):
+        """Index documents under `keys`, replacing earlier versions"""
+        with self._lock:
+            for key, text, metadata in zip(keys, texts, metadatas):
+                self._remove(key)
+                counts = {}
+                for term in terms(text):
+                    counts[term] = counts.get(term, 0) + 1
+                for term, count in counts.items():
+                    self.postings.setdefault(term, {})[key] = count
+                account = metadata.get("account_key")
+                account = str(account).lower() if account not in (None, "") else None
+                if account is not None:
+                    self.accounts.setdefault(account, {})[key] = None
+                self.ids[key.lower()] = key
+                length = sum(counts.values())
+                self.documents[key] = (length, tuple(counts), account)
+                self.total_length += length
+
+    def remove(self, keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def find_ids(self, question):
+        """Indexed ids of the transactions named in `question`, in order"""
+        found = {}
+        for word in identifiers(question.lower(), TRANSACTION_CUES):
+            key = self.ids.get(word)
+            if key is not None:
+                found[key] = None
+        return list(found)
+
+    def find_accounts(self, question, limit):
+        """Indexed ids of up to `limit` transactions of the accounts named in `question`"""
+        found = {}
+        with self._lock:
+            for word in identifiers(question.lower(), ACCOUNT_CUES):
+                for key in self.accounts.get(word, ()):
+                    if len(found) >= limit:
+                        return list(found)
+                    found[key] = None
+        return list(found)
+
+    def bm25(self, question, limit):
+        """Up to `limit` (indexed id, score) pairs, best first"""
+        with self._lock:
+            n = len(self.documents)
+            if not n:
+                return []
+            average = self.total_length / n
+            scores = {}
+            for term in set(terms(question)):
+                postings = self.postings.get(term)
+                if not postings or len(postings) > BM25_MAX_DF * n:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for key, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.documents[key][0] / average)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+    def stats(self):
+        return {"ready": self.ready.is_set(), "documents": len(self.documents), "ids": len(self.ids),
+                "accounts": len(self.accounts), "terms": len(self.postings)}
+
+
+class HybridRetriever(BaseRetriever):
+    """Exact id/account lookups, BM25 and dense search fused by RRF over an IncrementalIndex"""
+
+    index: Any
+    k: int = RETRIEVER_K
+    fetch_k: int = RETRIEVER_FETCH_K
+    rrf_k: int = RRF_K
+    # False leaves out the embedding model and FAISS entirely
+    dense: bool = True
+
+    _stats: dict = PrivateAttr(default_factory=lambda: {
+        "calls": 0, "exact_hits": 0, **{f"{stage}_ms": 0.0 for stage in STAGES}
+    })
+    _last: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _documents(self, keys):
+        docstore = self.index.vector_store.docstore
+        documents = (docstore.search(key) for key in keys)
+        return [doc for doc in documents if isinstance(doc, Document)]
+
+    def retrieve(self, question):
+        """(documents, {stage: milliseconds}) for `question`"""
+        lexical = self.index.lexical
+        timings = {}
+        start = time.perf_counter()
+        ready = lexical.ready.is_set()
+        if ready:
+            ids = lexical.find_ids(question)
+            accounts = [] if ids else lexical.find_accounts(question, self.fetch_k)
+        else:
+            # Still loading after a restart: ids as written, dense search for the rest
+            ids = [word for word in dict.fromkeys(identifiers(question, TRANSACTION_CUES))
+                   if word in self.index.entries]
+            accounts = []
+        timings["exact"] = time.perf_counter() - start
+        if ids:
+            # The question names its transactions; nothing else can rank higher
+            documents = self._documents(ids[:self.k])
+            return documents, self._record(timings, exact=True)
+
+        rankings = [accounts] if accounts else []
+        if ready:
+            start = time.perf_counter()
+            rankings.append([key for key, _ in lexical.bm25(question, self.fetch_k)])
+            timings["bm25"] = time.perf_counter() - start
+
+        if self.dense and len(self.index):
+            start = time.perf_counter()
+            vector = self.index.embeddings.embed_query(question)
+            timings["embed"] = time.perf_counter() - start
+            start = time.perf_counter()
+            found = self.index.search(vector, self.fetch_k)
+            rankings.append([doc.id for doc in found])
+            timings["dense"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        if accounts:
+            named = set(accounts)
+            fused = [key for key in fused if key in named] + [key for key in fused if key not in named]
+        documents = self._documents(fused[:self.k])
+        timings["fuse"] = time.perf_counter() - start
+        return documents, self._record(timings, exact=False)
+
+    def _record(self, timings, exact):
+        timings = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["exact_hits"] += exact
+            for stage, ms in timings.items():
+                self._stats[f"{stage}_ms"] += ms
+            self._last = timings
+        return timings
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return self.retrieve(query)[0]
+
+    @property
+    def stats(self):
+        """Calls, exact-id hits, total milliseconds per stage and the last call's timings"""
+        with self._lock:
+            totals = {key: round(value, 3) if isinstance(value, float) else value
+                      for key, value in self._stats.items()}
+            return {**totals, "last_ms": dict(self._last), "lexical": self.index.lexical.stats()}
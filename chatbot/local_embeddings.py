@@ -0,0 +1,269 @@
+"""
+Local sentence-transformer embeddings for the RAG chatbot.
+
+`LocalEmbeddings` runs EMBEDDING_MODEL (all-mpnet-base-v2 by default) on
+the CPU, so indexing and search need no embedding service or API key:
+
+- dynamic batching: texts from concurrent callers (IncrementalIndex's
+  embedding workers, chat questions) are queued and encoded together by a
+  single model thread, up to EMBED_MAX_BATCH texts at a time, waiting at
+  most EMBED_MAX_WAIT_MS for more to arrive
+- EMBEDDING_BACKEND=onnx runs the model with ONNX Runtime instead of
+  PyTorch, and EMBEDDING_QUANTIZE=int8 uses int8 weights: dynamic
+  quantization of the linear layers for torch, or the pre-quantized
+  EMBEDDING_ONNX_FILE shipped with the model for onnx
+- a content-addressed cache of vectors keyed by model and text hash, in
+  SQLite at EMBEDDING_CACHE_PATH. A text is embedded once: repeats within a
+  call are encoded a single time, and texts seen before (re-indexed
+  transactions, rebuilt indexes, repeated questions) are read back instead.
+
+sentence-transformers (and onnxruntime for the onnx backend) are imported
+when the model is first used.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+BACKENDS = ("torch", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+QUANTIZATIONS = ("none", "int8")
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "none")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512.onnx")
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "2"))
+# Empty to keep no cache
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+CACHE_QUERY_KEYS = 500
+
+
+class EmbeddingCache:
+    """Vectors in SQLite keyed by a hash of model and text"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get(self, keys):
+        """{key: vector} for the `keys` that are cached"""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), CACHE_QUERY_KEYS):
+                chunk = keys[i:i + CACHE_QUERY_KEYS]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return found
+
+    def put(self, items):
+        """Store (key, vector) pairs"""
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO vectors VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DynamicBatcher:
+    """
+    Single thread running `encode` over the texts of all pending `submit`
+    calls at once: up to `max_batch` texts, waiting up to `max_wait`
+    seconds for a batch to fill. A call larger than `max_batch` is encoded
+    on its own.
+    """
+
+    def __init__(self, encode, max_batch=EMBED_MAX_BATCH, max_wait=EMBED_MAX_WAIT_MS / 1000):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """Future of the vectors of `texts`"""
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self):
+        """The next batch of (texts, future), or None once closed"""
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch, size = [item], len(item[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            try:
+                # Returns at once with whatever queued up while the last batch ran
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                vectors = self.encode([text for texts, _ in batch for text in texts])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            offset = 0
+            for texts, future in batch:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain embeddings from a local sentence-transformer, batched and cached"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND, quantize=EMBEDDING_QUANTIZE,
+                 max_batch=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS, cache_path=EMBEDDING_CACHE_PATH,
+                 onnx_file=EMBEDDING_ONNX_FILE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+        if quantize not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantize!r}, expected one of {', '.join(QUANTIZATIONS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize
+        self.onnx_file = onnx_file
+        # Vectors differ between variants of the same model, so the cache
+        # keeps them apart and the index manifest records this (read by
+        # vector_index.embedding_model_name) to rebuild when it changes
+        self.model_id = model_name if (backend, quantize) == ("torch", "none") else f"{model_name}:{backend}:{quantize}"
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self._model = None
+        self._batcher = None
+        self._lock = threading.Lock()
+        # Key -> (future, position) of texts being encoded for another call
+        self._inflight = {}
+        self.counters = dict.fromkeys(["texts", "cache_hits", "duplicates", "encoded"], 0)
+        self.encode_seconds = 0.0
+
+    def load(self):
+        """Load the model and start the batcher, once"""
+        with self._lock:
+            if self._batcher is None:
+                self._model = self._load_model()
+                self._batcher = DynamicBatcher(self._encode, self.max_batch, self.max_wait)
+        return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            kwargs = {"file_name": self.onnx_file} if self.quantize == "int8" else {}
+            return SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=kwargs)
+        model = SentenceTransformer(self.model_name, device="cpu")
+        if self.quantize == "int8":
+            import torch
+
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _encode(self, texts):
+        start = time.perf_counter()
+        vectors = self._model.encode(texts, batch_size=self.max_batch, normalize_embeddings=True,
+                                     convert_to_numpy=True, show_progress_bar=False)
+        self.encode_seconds += time.perf_counter() - start
+        return vectors.astype(np.float32, copy=False)
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_id}\x1f{text}".encode("utf-8")).digest()
+
+    def embed_documents(self, texts):
+        if self._batcher is None:
+            self.load()
+        keys = [self._key(text) for text in texts]
+        vectors = self.cache.get(set(keys)) if self.cache is not None else {}
+        hits = sum(key in vectors for key in keys)
+        # Each distinct text is encoded once, even when concurrent calls share it
+        pending, waiting = {}, {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in vectors or key in pending or key in waiting:
+                    continue
+                if key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    pending[key] = text
+            if pending:
+                future = self._batcher.submit(list(pending.values()))
+                self._inflight.update((key, (future, i)) for i, key in enumerate(pending))
+            self.counters["texts"] += len(texts)
+            self.counters["cache_hits"] += hits
+            self.counters["duplicates"] += len(texts) - hits - len(pending)
+            self.counters["encoded"] += len(pending)
+        if pending:
+            try:
+                new = dict(zip(pending, future.result()))
+                if self.cache is not None:
+                    self.cache.put(new.items())
+                vectors.update(new)
+            finally:
+                with self._lock:
+                    for key in pending:
+                        self._inflight.pop(key, None)
+        for key, (shared, i) in waiting.items():
+            vectors[key] = shared.result()[i]
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    @property
+    def stats(self):
+        return {
+            "model": self.model_id,
+            **self.counters,
+            "batches": self._batcher.batches if self._batcher is not None else 0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "cached_vectors": len(self.cache) if self.cache is not None else None
+        }
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,293 @@
+"""
+Incremental MongoDB -> in-memory sync for the chatbots.
+
+Instead of exporting the whole transactions collection to CSV and reading it
+back, `MongoSync` pulls only what changed since the last sync:
+
+- Poll mode (any deployment, including standalone mongod and mongomock):
+  one batched, projected cursor over documents after an (updated_at, _id)
+  watermark, sorted on the same keys so a compound index makes it a range
+  scan. The first sync has no watermark and loads everything once.
+- Change-stream mode (replica sets): once polling has caught up, changes
+  are read from a change stream and the resume token is kept, so deletes
+  are seen too and an interrupted stream picks up where it stopped.
+
+Each `next_batch()` returns a `SyncBatch` of upserted rows (a DataFrame, one
+row per document, `_id` as a string) and deleted `_id`s. The caller applies
+it to its store or vector index and then calls `commit(batch)`, which moves
+the watermark/resume token forward (and persists it when `state_path` is
+set). Upserts are idempotent, so re-reading a batch after a crash is safe.
+
+Polling cannot observe deletes. Documents without `updated_at` sort first
+and are picked up once, by `_id`; edits to them are not seen until they get
+an `updated_at`. Set MONGO_SYNC_UPDATED_FIELD=_id for insert-only
+collections.
+
+The component uses the synchronous pymongo API (pymongo or mongomock
+collections); the async services run `next_batch` on a worker thread.
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+import pandas as pd
+
+SYNC_UPDATED_FIELD = os.getenv("MONGO_SYNC_UPDATED_FIELD", "updated_at")
+SYNC_BATCH_SIZE = int(os.getenv("MONGO_SYNC_BATCH_SIZE", "5000"))
+
+
+@dataclass
+class SyncBatch:
+    upserts: pd.DataFrame
+    deleted: list = field(default_factory=list)
+    source: str = "poll"
+    # Watermark / resume token to commit once the batch is applied
+    watermark: tuple = None
+    resume_token: dict = None
+
+    def __len__(self):
+        return len(self.upserts) + len(self.deleted)
+
+
+def documents_to_frame(documents):
+    """One row per document with `_id` as a string"""
+    df = pd.DataFrame(documents)
+    if "_id" in df:
+        df["_id"] = df["_id"].astype(str)
+    return df
+
+
+class MongoSync:
+    """Tails new and changed documents of one collection in batches"""
+
+    def __init__(self, collection, projection=None, updated_field=SYNC_UPDATED_FIELD,
+                 batch_size=SYNC_BATCH_SIZE, state_path=None, use_change_stream=True):
+        self.collection = collection
+        self.updated_field = updated_field
+        self.batch_size = batch_size
+        self.state_path = state_path
+        self.use_change_stream = use_change_stream
+        if projection is not None:
+            # The watermark keys are always needed
+            projection = dict.fromkeys([*projection, "_id", updated_field], 1)
+        self.projection = projection
+
+        self.watermark = None
+        self.resume_token = None
+        self.mode = "poll"
+        self._cursor = None
+        self._stream = None
+        self.stats = {"batches": 0, "upserts": 0, "deletes": 0, "syncs": 0, "last_sync": None}
+        self._load_state()
+
+    # ----- State -----
+
+    @property
+    def version(self):
+        """Where the sync has read up to, as readable text"""
+        if self.watermark is None:
+            return None
+        updated, last_id = self.watermark
+        return f"{self.updated_field}={updated.isoformat() if hasattr(updated, 'isoformat') else updated},_id={last_id}"
+
+    def state(self):
+        """The watermark and resume token as JSON text, for saving alongside a store"""
+        from bson import json_util
+
+        return json_util.dumps({
+            "updated_field": self.updated_field,
+            "watermark": list(self.watermark) if self.watermark is not None else None,
+            "resume_token": self.resume_token
+        })
+
+    def restore(self, text):
+        """Continue from a state() saved earlier; returns False when it does not apply"""
+        from bson import json_util
+
+        state = json_util.loads(text)
+        if state.get("updated_field") != self.updated_field:
+            print("Ignoring saved sync state: written for another watermark field")
+            return False
+        self.watermark = tuple(state["watermark"]) if state.get("watermark") is not None else None
+        self.resume_token = state.get("resume_token")
+        return True
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding="utf-8") as f:
+            self.restore(f.read())
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.state())
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        """Forget the watermark and resume token so the next sync reloads everything"""
+        self.close()
+        self.watermark = None
+        self.resume_token = None
+        self.mode = "poll"
+        self._save_state()
+
+    def ensure_index(self):
+        """Create the (updated_field, _id) index the poll query ranges over"""
+        self.collection.create_index([(self.updated_field, 1), ("_id", 1)])
+
+    # ----- Poll mode -----
+
+    def _poll_filter(self):
+        if self.watermark is None:
+            return {}
+        updated, last_id = self.watermark
+        if self.updated_field == "_id":
+            return {"_id": {"$gt": last_id}}
+        if updated is None:
+            # Still among the documents without the field, which sort first
+            return {"$or": [
+                {self.updated_field: {"$ne": None}},
+                {self.updated_field: None, "_id": {"$gt": last_id}}
+            ]}
+        return {"$or": [
+            {self.updated_field: {"$gt": updated}},
+            {self.updated_field: updated, "_id": {"$gt": last_id}}
+        ]}
+
+    def _next_poll_batch(self):
+        if self._cursor is None:
+            self._cursor = (
+                self.collection.find(self._poll_filter(), self.projection)
+                .sort([(key, 1) for key in dict.fromkeys([self.updated_field, "_id"])])
+                .batch_size(self.batch_size)
+            )
+        documents = list(islice(self._cursor, self.batch_size))
+        if not documents:
+            self._cursor.close()
+            self._cursor = None
+            return None
+        last = documents[-1]
+        watermark = (last.get(self.updated_field), last["_id"])
+        return SyncBatch(documents_to_frame(documents), source="poll", watermark=watermark)
+
+    # ----- Change-stream mode -----
+
+    def _open_stream(self):
+        """Open a change stream, or return None where the deployment has none"""
+        if not self.use_change_stream:
+            return None
+        try:
+            options = {"full_document": "updateLookup", "max_await_time_ms": 200}
+            if self.resume_token is not None:
+                options["resume_after"] = self.resume_token
+            return self.collection.watch(**options)
+        except Exception as e:
+            # Standalone servers refuse change streams; mongomock has none
+            print(f"Change streams unavailable, polling instead ({type(e).__name__})")
+            self.use_change_stream = False
+            return None
+
+    def _next_stream_batch(self):
+        upserts = {}
+        deleted = []
+        token = None
+        watermark = self.watermark
+        try:
+            while len(upserts) + len(deleted) < self.batch_size:
+                change = self._stream.try_next()
+                if change is None:
+                    break
+                token = self._stream.resume_token
+                operation = change["operationType"]
+                if operation == "invalidate":
+                    break
+                key = change["documentKey"]["_id"]
+                if operation == "delete":
+                    upserts.pop(key, None)
+                    deleted.append(str(key))
+                elif change.get("fullDocument") is not None:
+                    document = change["fullDocument"]
+                    if self.projection is not None:
+                        document = {k: v for k, v in document.items() if k in self.projection}
+                    upserts[key] = document
+                    updated = document.get(self.updated_field)
+                    if updated is not None and (watermark is None or watermark[0] is None
+                                                or (updated, key) > watermark):
+                        watermark = (updated, key)
+        except Exception as e:
+            # Lost history or a dropped connection: catch up by polling
+            print(f"Change stream failed, falling back to polling: {e}")
+            self._stream.close()
+            self._stream = None
+            self.resume_token = None
+            self.mode = "poll"
+            return self._next_poll_batch()
+        if token is None:
+            return None
+        return SyncBatch(documents_to_frame(list(upserts.values())), deleted, "change_stream",
+                         watermark, token)
+
+    # ----- Public API -----
+
+    def next_batch(self):
+        """The next batch of changes, or None once caught up"""
+        if self.mode == "poll":
+            if self._stream is None and self.resume_token is None:
+                # Open the stream before polling so nothing written during the
+                # catch-up is missed; the overlap is re-applied harmlessly
+                self._stream = self._open_stream()
+            batch = self._next_poll_batch()
+            if batch is not None:
+                return batch
+            if self._stream is None and self.resume_token is not None:
+                self._stream = self._open_stream()
+            if self._stream is None:
+                return None
+            self.mode = "change_stream"
+        return self._next_stream_batch()
+
+    def commit(self, batch):
+        """Record that `batch` has been applied"""
+        if batch.watermark is not None:
+            self.watermark = batch.watermark
+        if batch.resume_token is not None:
+            self.resume_token = batch.resume_token
+        self.stats["batches"] += 1
+        self.stats["upserts"] += len(batch.upserts)
+        self.stats["deletes"] += len(batch.deleted)
+        self._save_state()
+
+    def sync(self, apply, max_batches=None):
+        """
+        Apply every pending change with `apply(upserts, deleted)` and commit
+        it. Returns a stats dict for this run.
+        """
+        start = time.perf_counter()
+        run = {"batches": 0, "upserts": 0, "deletes": 0}
+        while max_batches is None or run["batches"] < max_batches:
+            batch = self.next_batch()
+            if batch is None:
+                break
+            apply(batch.upserts, batch.deleted)
+            self.commit(batch)
+            run["batches"] += 1
+            run["upserts"] += len(batch.upserts)
+            run["deletes"] += len(batch.deleted)
+        run["seconds"] = round(time.perf_counter() - start, 3)
+        run["mode"] = self.mode
+        self.stats["syncs"] += 1
+        self.stats["last_sync"] = time.time()
+        return run
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
@@ -0,0 +1,533 @@
+"""
+Exact answers for structured questions, ahead of the RAG chain.
+
+Retrieval only hands the LLM the top-k documents, so any count, total or
+ranking it produces from them is a guess, and every answer costs seconds of
+generation. `QueryRouter.route` recognises transaction ID lookups and count,
+sum, average, top-N and list questions, extracts their filters (suspicious
+or not, countries, payment type, amount and risk bounds, dates, account,
+instruction text) into a `Query` and answers it from the TransactionStore
+with vectorised pandas/NumPy in milliseconds.
+
+A question is only routed when every word of it is understood; anything
+else, including "why"/"explain" questions, returns None and goes to
+retrieval and the LLM as before.
+"""
+
+import csv
+import re
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from aml_engine.country_risk import COUNTRY_CODES_PATH
+from transaction_store import FLAG_COLUMNS, HIGH_RISK_SCORE, HIGH_VALUE_USD
+
+DEFAULT_LIMIT = 10
+DEFAULT_ROWS = 5
+MAX_LIMIT = 50
+CATEGORY_COLUMNS = ["payment_type", "transaction_type"]
+MAX_CATEGORIES = 200
+# What the router reads, for loading only these columns into its store
+ROUTER_COLUMNS = [
+    "transaction_id", "transaction_date", "account_key", "amount_usd", "risk_score", *FLAG_COLUMNS,
+    "originator_country", "beneficiary_country", "payment_instruction", *CATEGORY_COLUMNS
+]
+LABELS = {
+    "originator_country": "originator countries", "beneficiary_country": "beneficiary countries",
+    "account_key": "accounts", "amount_usd": "amount", "risk_score": "risk score"
+}
+# Common names missing from aml_engine/data/country_codes.csv
+COUNTRY_ALIASES = {
+    "iran": "IR", "syria": "SY", "laos": "LA", "south korea": "KR", "usa": "US", "america": "US", "uk": "GB",
+    "britain": "GB", "great britain": "GB", "uae": "AE", "emirates": "AE", "turkiye": "TR",
+}
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+NUMBER = r"\$?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|m|thousand|million)?\b"
+ABOVE = r"(?:over|above|more than|greater than|exceeding|larger than|at least|>=?)"
+BELOW = r"(?:under|below|less than|smaller than|at most|<=?)"
+UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I)
+# An ID has a digit; a bare "id" only names one before ":", "#" or "=", so
+# "the id of the largest transaction" and "with id 5" are not lookups
+NAMED_ID = re.compile(r"\b(?:(?:transaction[ _]?id|txn[ _]?id)\s*[:#=]?|id\s*[:#=])\s*['\"]?([\w-]*\d[\w-]*)", re.I)
+# A known ID written bare must be this long, unless a cue word names it, so
+# "transactions in 12345 ways" is not a lookup of transaction 12345
+MIN_BARE_ID_LENGTH = 8
+ID_CUES = {"transaction", "txn", "id", "transaction_id", "txn_id"}
+FREE_FORM = re.compile(r"^\W*(?:why|explain|how come|how does|how do|describe|summari[sz]e|tell me about|what if)\b",
+                       re.I)
+
+# Words that carry no constraint once the intent and filters are taken out
+FILLER = set("""
+a all amount amounts an and any appear appears are as at be by can data dataset did do does dollar dollars done
+entries entry find for from funds get give got had happened has have how i in involve involved involving is it
+it's its list made many me money much my number of on or our overall payment payments please record recorded
+records receive received row rows send sends sent show that the their them there these they this those to total
+transaction transactions transfer transfers txn txns usd value values was we were what what's which whole with
+you your
+""".split())
+
+
+@dataclass
+class Query:
+    """A parsed structured question"""
+    intent: str
+    filters: dict = field(default_factory=dict)
+    transaction_id: str = None
+    measure: str = "amount_usd"
+    group: tuple = ()
+    order: str = "amount_usd"
+    ascending: bool = False
+    limit: int = DEFAULT_LIMIT
+
+
+@dataclass
+class RoutedAnswer:
+    answer: str
+    query: Query
+    rows: list = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class _Question:
+    """Question text that recognised phrases are blanked out of"""
+
+    def __init__(self, question):
+        self.text = " " + question.strip() + " "
+
+    def take(self, pattern, flags=re.I, accept=None):
+        """Matches of `pattern` (that `accept`), removed from the text"""
+        found = [m for m in re.finditer(pattern, self.text, flags) if accept is None or accept(m)]
+        for match in reversed(found):
+            self.text = self.text[:match.start()] + " " * (match.end() - match.start()) + self.text[match.end():]
+        return found
+
+    def leftover(self):
+        return [w for w in re.findall(r"[\w$']+", self.text.lower()) if w not in FILLER]
+
+
+def _amount(number, unit):
+    value = float(number.replace(",", ""))
+    return value * {"k": 1e3, "thousand": 1e3, "m": 1e6, "million": 1e6}.get((unit or "").lower(), 1)
+
+
+def _country_names():
+    """Lower-cased country name -> ISO-2 code"""
+    try:
+        with open(COUNTRY_CODES_PATH, encoding="utf-8") as f:
+            names = {row["country"].lower(): row["iso2"] for row in csv.DictReader(f)}
+    except OSError:
+        names = {}
+    return {**COUNTRY_ALIASES, **names}
+
+
+def _numbers(values):
+    return np.asarray(pd.to_numeric(values, errors="coerce"), dtype=np.float64)
+
+
+class QueryRouter:
+    """Parses structured questions and answers them from a TransactionStore"""
+
+    def __init__(self, store):
+        self.store = store
+        self.country_names = _country_names()
+        self._vocabulary = None
+        self._vocabulary_rows = -1
+
+    # ----- Parsing -----
+
+    def _values(self):
+        """Country codes and names, and category values present in the store"""
+        if self._vocabulary_rows != len(self.store):
+            codes = set()
+            for counts in self.store.country_counts.values():
+                codes.update(str(c) for c, n in counts.items() if n > 0 and c != "Unknown")
+            names = {name: code for name, code in self.country_names.items() if code in codes}
+            names.update({c.lower(): c for c in codes if len(c) > 3})
+            categories = {}
+            for column in CATEGORY_COLUMNS:
+                if column in self.store.frame:
+                    values = self.store.frame[column].dropna().unique()
+                    if len(values) <= MAX_CATEGORIES:
+                        categories[column] = {str(v).lower(): v for v in values if len(str(v)) >= 3}
+            # Bare codes (case-sensitive) and names, e.g. "IR transactions", longest first
+            bare = [re.escape(c) for c in sorted(codes, key=len, reverse=True) if len(c) <= 3]
+            spelled = [re.escape(n) for n in sorted(names, key=len, reverse=True) if len(n) > 3]
+            patterns = (re.compile(rf"\b(?:{'|'.join(bare)})\b") if bare else None,
+                        re.compile(rf"\b(?:{'|'.join(spelled)})\b", re.I) if spelled else None)
+            self._vocabulary = (codes, names, categories, patterns)
+            self._vocabulary_rows = len(self.store)
+        return self._vocabulary
+
+    def _country(self, value):
+        codes, names, _, _ = self._values()
+        return value if value in codes else names.get(value.lower())
+
+    def _transaction_id(self, question):
+        """A transaction ID named in the question, known or not"""
+        words = re.findall(r"[\w-]+", question)
+        for previous, token in zip([""] + words, words):
+            if (token.lower() in self.store.id_index and any(c.isdigit() for c in token)
+                    and (len(token) >= MIN_BARE_ID_LENGTH or previous.lower() in ID_CUES)):
+                return token
+        match = UUID.search(question) or NAMED_ID.search(question)
+        return match.group(match.lastindex or 0) if match else None
+
+    def parse(self, question):
+        """The Query a question asks for, or None when it is not a structured question"""
+        if FREE_FORM.search(question):
+            return None
+        transaction_id = self._transaction_id(question)
+        if transaction_id:
+            return Query("lookup", transaction_id=transaction_id)
+
+        q = _Question(question)
+        filters = {}
+        self._parse_text(q, filters)
+        self._parse_risk(q, filters)
+        self._parse_amounts(q, filters)
+        if q.take(r"\b(?:not\s+suspicious|non[\s-]?suspicious|unsuspicious|normal|legitimate|clean)\b"):
+            filters["suspicious"] = False
+        if q.take(r"\b(?:suspicious|flagged|suspect)\b"):
+            filters["suspicious"] = True
+        for match in q.take(r"\baccount(?:_key|\s+key)?\s*[:#]?\s*['\"]?([\w-]*\d[\w-]*)"):
+            filters["account"] = match.group(1)
+        self._parse_dates(q, filters)
+        self._parse_countries(q, filters)
+
+        query = self._parse_intent(q, filters)
+        # Anything left over is a constraint we did not understand
+        if query is None or q.leftover():
+            return None
+        query.filters = filters
+        return query
+
+    def _parse_text(self, q, filters):
+        for match in q.take(r"\b(?:mention(?:s|ing)?|contain(?:s|ing)?|referenc(?:e|es|ing)|saying|about)\s+"
+                            r"(?:['\"]([^'\"]+)['\"]|([\w][\w\s-]*?))\s*(?=[?.!]|\s*$)"):
+            filters["instruction"] = (match.group(1) or match.group(2)).strip()
+        _, _, categories, _ = self._values()
+        for column, values in categories.items():
+            for lowered, value in values.items():
+                if q.take(rf"\b{re.escape(lowered)}\b"):
+                    filters.setdefault(column, set()).add(value)
+
+    def _parse_risk(self, q, filters):
+        score = r"\brisk(?:[\s_]*scores?)?\s*(?:of\s+|is\s+)?"
+        for match in q.take(rf"{score}between\s+(\d+(?:\.\d+)?)\s+and\s+(\d+(?:\.\d+)?)"):
+            filters["min_risk"], filters["max_risk"] = float(match.group(1)), float(match.group(2))
+        for match in q.take(rf"{score}({ABOVE}|{BELOW}|=|equal to)?\s*(\d+(?:\.\d+)?)\b"):
+            op, value = (match.group(1) or "=").lower(), float(match.group(2))
+            if re.fullmatch(BELOW, op):
+                filters["max_risk"] = value if op in ("<=", "at most") else value - 1e-9
+            elif re.fullmatch(ABOVE, op):
+                filters["min_risk"] = value if op in (">=", "at least") else value + 1e-9
+            else:
+                filters["min_risk"] = filters["max_risk"] = value
+        if q.take(r"\bhigh[\s-]risk\b"):
+            filters["min_risk"] = HIGH_RISK_SCORE
+        if q.take(r"\blow[\s-]risk\b"):
+            filters["max_risk"] = HIGH_RISK_SCORE - 1
+
+    def _parse_amounts(self, q, filters):
+        for match in q.take(rf"\bbetween\s+{NUMBER}\s+and\s+{NUMBER}"):
+            filters["min_amount"] = _amount(match.group(1), match.group(2))
+            filters["max_amount"] = _amount(match.group(3), match.group(4))
+        for match in q.take(rf"(?:\b(?:amounts?|worth|of)\s+)?({ABOVE}|{BELOW})\s*{NUMBER}"):
+            key = "max_amount" if re.fullmatch(BELOW, match.group(1).lower()) else "min_amount"
+            filters[key] = _amount(match.group(2), match.group(3))
+        if q.take(r"\bhigh[\s-]value\b"):
+            filters["min_amount"] = max(filters.get("min_amount", 0), HIGH_VALUE_USD)
+
+    def _parse_dates(self, q, filters):
+        day = r"(\d{4}-\d{2}-\d{2})"
+        for match in q.take(rf"\b(?:since|after|from|starting)\s+{day}"):
+            filters["start"] = pd.Timestamp(match.group(1))
+        for match in q.take(rf"\b(?:before|until|up to)\s+{day}"):
+            filters["end"] = pd.Timestamp(match.group(1))
+        for match in q.take(rf"\b(?:on\s+)?{day}"):
+            filters["start"] = pd.Timestamp(match.group(1))
+            filters["end"] = filters["start"] + pd.Timedelta(days=1)
+        for match in q.take(rf"\b(?:in\s+|during\s+)?({'|'.join(MONTHS)})[a-z]*\.?\s+((?:19|20)\d{{2}})\b"):
+            filters["start"] = pd.Timestamp(int(match.group(2)), MONTHS.index(match.group(1).lower()) + 1, 1)
+            filters["end"] = filters["start"] + pd.offsets.MonthBegin(1)
+        for match in q.take(r"\b(in|during|since|after|before|until)\s+((?:19|20)\d{2})\b"):
+            word, year = match.group(1).lower(), int(match.group(2))
+            if word in ("in", "during", "since"):
+                filters["start"] = pd.Timestamp(year, 1, 1)
+            if word == "after":
+                filters["start"] = pd.Timestamp(year + 1, 1, 1)
+            if word in ("in", "during", "until"):
+                filters["end"] = pd.Timestamp(year + 1, 1, 1)
+            if word == "before":
+                filters["end"] = pd.Timestamp(year, 1, 1)
+
+    def _parse_countries(self, q, filters):
+        _, _, _, patterns = self._values()
+        directions = [
+            ("originator_country", r"from|originating\s+(?:from|in)|sent\s+from|originators?(?:\s+country)?"),
+            ("beneficiary_country", r"to|into|towards|beneficiar(?:y|ies)(?:\s+country)?|destined\s+for"),
+            ("country", r"in|involving|with|for|countr(?:y|ies)"),
+        ]
+        for column, words in directions:
+            # Country names are capitalised words, e.g. "to United Arab Emirates"
+            for match in q.take(rf"(?i:\b(?:{words}))\s+(?:the\s+)?([A-Za-z][A-Za-z.'-]*(?:\s+[A-Z][A-Za-z.'-]*)*)",
+                                flags=0, accept=lambda m: self._country(m.group(1)) is not None):
+                filters.setdefault(column, set()).add(self._country(match.group(1)))
+        for pattern in patterns:
+            if pattern is not None:
+                for match in q.take(pattern, flags=0):
+                    filters.setdefault("country", set()).add(self._country(match.group()))
+
+    def _parse_intent(self, q, filters):
+        top = q.take(r"\btop\s+(\d+)\b|\b(\d+)\s+(?=(?:largest|biggest|highest|most|latest|newest|smallest|lowest)\b)")
+        limit = next((int(m.group(1) or m.group(2)) for m in top), None)
+        ranked = r"\b(?:top|largest|biggest|highest|most|latest|newest|recent|smallest|lowest)\b"
+        if top or re.search(ranked, q.text, re.I):
+            query = self._parse_top(q)
+        elif q.take(r"\b(?:how\s+many|count|number\s+of)\b"):
+            query = Query("count")
+        elif q.take(r"\b(?:average|mean|avg)\b"):
+            risk = q.take(r"\brisk(?:[\s_]*scores?)?\b")
+            query = Query("average", measure="risk_score" if risk else "amount_usd")
+        elif q.take(r"\bhow\s+much\b") or q.take(r"\b(?:sum|total)\b(?=.*\b(?:amount|value|volume)s?\b)"):
+            q.take(r"\b(?:volume|sum)\b")
+            query = Query("sum")
+        elif q.take(r"\btotal\b"):
+            query = Query("count")
+        elif filters:
+            q.take(r"\b(?:show|list|find|display|give|which|get)\b")
+            query = Query("list", limit=DEFAULT_ROWS)
+        else:
+            return None
+        if limit:
+            query.limit = min(limit, MAX_LIMIT)
+        return query
+
+    def _parse_top(self, q):
+        if q.take(r"\b(?:originator|originating|source|sending|sender)\s+countr(?:y|ies)\b"):
+            group = ("originator_country",)
+        elif q.take(r"\b(?:beneficiary|destination|receiving|recipient)\s+countr(?:y|ies)\b"):
+            group = ("beneficiary_country",)
+        elif q.take(r"\bcountr(?:y|ies)\b"):
+            group = ("originator_country", "beneficiary_country")
+        elif q.take(r"\baccounts?\b"):
+            group = ("account_key",)
+        else:
+            group = ()
+        by_amount = q.take(r"\bby\s+(?:amount|value|volume)\b")
+        if group:
+            q.take(r"\b(?:top|most|largest|biggest|highest|active|common|frequent|by\s+count)\b")
+            return Query("top_groups", group=group, measure="amount_usd" if by_amount else "count")
+
+        query = Query("top_rows", limit=DEFAULT_ROWS)
+        if q.take(r"\b(?:latest|newest|most\s+recent|recent)\b"):
+            query.order = "transaction_date"
+        elif q.take(r"\b(?:highest|top)\s+risk(?:[\s_]*scores?)?\b|\bby\s+risk(?:[\s_]*score)?\b"):
+            query.order = "risk_score"
+        elif q.take(r"\blowest\s+risk(?:[\s_]*scores?)?\b"):
+            query.order, query.ascending = "risk_score", True
+        elif q.take(r"\b(?:smallest|lowest)\b"):
+            query.ascending = True
+        q.take(r"\b(?:largest|biggest|highest|most|top)\b")
+        return query
+
+    # ----- Execution -----
+
+    def mask(self, filters):
+        """Boolean array over the store's rows matching `filters`"""
+        store = self.store
+        frame = store.frame
+        mask = np.ones(len(frame), dtype=bool)
+
+        def column(name):
+            return frame[name] if name in frame else pd.Series(pd.NA, index=frame.index, dtype="object")
+
+        if "suspicious" in filters:
+            flags = store.flags()
+            mask &= flags if filters["suspicious"] else ~flags
+        if "min_amount" in filters or "max_amount" in filters:
+            amounts = _numbers(column("amount_usd"))
+            if "min_amount" in filters:
+                mask &= amounts > filters["min_amount"]
+            if "max_amount" in filters:
+                mask &= amounts < filters["max_amount"]
+        if "min_risk" in filters or "max_risk" in filters:
+            risk = _numbers(column("risk_score"))
+            if "min_risk" in filters:
+                mask &= risk >= filters["min_risk"]
+            if "max_risk" in filters:
+                mask &= risk <= filters["max_risk"]
+        if "start" in filters:
+            mask &= store.dates >= filters["start"].to_datetime64()
+        if "end" in filters:
+            mask &= store.dates < filters["end"].to_datetime64()
+        for name in ["originator_country", "beneficiary_country", *CATEGORY_COLUMNS]:
+            if name in filters:
+                mask &= column(name).isin(filters[name]).to_numpy()
+        if "country" in filters:
+            mask &= (column("originator_country").isin(filters["country"]).to_numpy()
+                     | column("beneficiary_country").isin(filters["country"]).to_numpy())
+        if "account" in filters:
+            accounts = column("account_key").astype("string").str.lower()
+            mask &= (accounts == filters["account"].lower()).fillna(False).to_numpy(dtype=bool)
+        if "instruction" in filters:
+            text = column("payment_instruction").astype("string")
+            found = text.str.contains(filters["instruction"], case=False, regex=False)
+            mask &= found.fillna(False).to_numpy(dtype=bool)
+        return mask
+
+    @staticmethod
+    def describe(filters):
+        """The filters in words, e.g. " (suspicious, from IR, over $10,000.00)\""""
+        parts = []
+        if "suspicious" in filters:
+            parts.append("suspicious" if filters["suspicious"] else "non-suspicious")
+        for key, label in [("originator_country", "from"), ("beneficiary_country", "to"), ("country", "involving")]:
+            if key in filters:
+                parts.append(f"{label} {'/'.join(sorted(map(str, filters[key])))}")
+        for column in CATEGORY_COLUMNS:
+            if column in filters:
+                parts.append("/".join(sorted(map(str, filters[column]))))
+        if "min_amount" in filters:
+            parts.append(f"over ${filters['min_amount']:,.2f}")
+        if "max_amount" in filters:
+            parts.append(f"under ${filters['max_amount']:,.2f}")
+        if "min_risk" in filters and filters.get("min_risk") == filters.get("max_risk"):
+            parts.append(f"risk score {filters['min_risk']:g}")
+        else:
+            for key, op in (("min_risk", ">="), ("max_risk", "<=")):
+                if key in filters:
+                    value = filters[key]
+                    if value != round(value) and abs(value - round(value)) < 1e-6:
+                        # A strict bound, e.g. "risk above 8"
+                        op, value = op[0], round(value)
+                    parts.append(f"risk score {op} {value:g}")
+        if "start" in filters:
+            parts.append(f"from {filters['start']:%Y-%m-%d}")
+        if "end" in filters:
+            parts.append(f"before {filters['end']:%Y-%m-%d}")
+        if "account" in filters:
+            parts.append(f"account {filters['account']}")
+        if "instruction" in filters:
+            parts.append(f"mentioning \"{filters['instruction']}\"")
+        return f" ({', '.join(parts)})" if parts else ""
+
+    def summary(self, t):
+        """One line for a transaction dict"""
+        try:
+            amount = f"${float(t.get('amount_usd')):,.2f}"
+        except (TypeError, ValueError):
+            amount = "N/A"
+        flag = t.get(self.store.flag_column) if self.store.flag_column else None
+        suspicious = "suspicious" if str(flag).lower() in ("1", "1.0", "true", "yes") else "normal"
+        return (f"{t.get('transaction_id', 'N/A')} | {str(t.get('transaction_date', 'N/A'))[:10]} | {amount} | "
+                f"{t.get('originator_country', '?')} -> {t.get('beneficiary_country', '?')} | "
+                f"risk {t.get('risk_score', 'N/A')} | {suspicious}")
+
+    def _top_groups(self, query, mask):
+        store = self.store
+        lines = []
+        by = "" if query.measure == "count" else " by amount"
+        described = self.describe(query.filters)
+        for column in query.group:
+            if column not in store.frame:
+                continue
+            if not query.filters and query.measure == "count" and column in store.country_counts:
+                # Maintained by the store
+                ranked = [(c, n) for c, n in store.top_countries(column, query.limit + 1) if c != "Unknown"]
+                ranked = ranked[:query.limit]
+            elif query.measure == "count":
+                ranked = store.frame[column][mask].value_counts().head(query.limit).items()
+            else:
+                amounts = pd.Series(_numbers(store.frame["amount_usd"])[mask] if "amount_usd" in store.frame else 0)
+                groups = store.frame[column][mask].to_numpy()
+                ranked = amounts.groupby(groups).sum().nlargest(query.limit).items()
+            label = LABELS.get(column, column)
+            lines.append(f"Top {query.limit} {label}{by}{described}:")
+            lines += [f"- {k}: {v:,} transactions" if query.measure == "count" else f"- {k}: ${v:,.2f}"
+                      for k, v in ranked]
+        return "\n".join(lines) or "No matching transactions."
+
+    def _top_rows(self, query, mask):
+        store = self.store
+        if query.order == "transaction_date":
+            # Newest first, from the store's date order
+            order = store.date_order
+            return order[mask[order]][:query.limit]
+        positions = np.flatnonzero(mask)
+        values = _numbers(store.frame[query.order].to_numpy()[positions]) if query.order in store.frame \
+            else np.zeros(len(positions))
+        keys = values if query.ascending else -values
+        keys = np.where(np.isnan(keys), np.inf, keys)
+        if len(keys) > query.limit:
+            nearest = np.argpartition(keys, query.limit)[:query.limit]
+        else:
+            nearest = np.arange(len(keys))
+        return positions[nearest[np.argsort(keys[nearest], kind="stable")]]
+
+    def execute(self, query):
+        """(answer, transactions) for a parsed Query"""
+        store = self.store
+        filters = query.filters
+        total = len(store)
+
+        if query.intent == "lookup":
+            t = store.get(query.transaction_id)
+            if t is None:
+                return f"Transaction {query.transaction_id} not found.", []
+            return f"Transaction {self.summary(t)}", [t]
+
+        # Unfiltered counts and sums are maintained by the store
+        if query.intent == "count" and not filters:
+            return f"There are {total:,} transactions.", []
+        if query.intent == "count" and filters == {"suspicious": True}:
+            return f"{store.count_suspicious():,} suspicious transactions out of {total:,}.", []
+        if query.intent == "sum" and not filters:
+            return f"Total amount: ${store.total_amount():,.2f} across {total:,} transactions.", []
+
+        mask = self.mask(filters)
+        if query.intent == "top_groups":
+            return self._top_groups(query, mask), []
+
+        n = int(mask.sum())
+        described = self.describe(filters)
+        if query.intent == "count":
+            return f"{n:,} transactions{described} out of {total:,}.", []
+        if not n:
+            return f"No transactions{described}.", []
+        if query.intent in ("sum", "average"):
+            values = _numbers(store.frame[query.measure])[mask] if query.measure in store.frame else np.zeros(n)
+            if query.intent == "sum":
+                return f"Total amount{described}: ${np.nansum(values):,.2f} across {n:,} transactions.", []
+            if query.measure == "risk_score":
+                return f"Average risk score{described}: {np.nanmean(values):.2f} over {n:,} transactions.", []
+            return f"Average amount{described}: ${np.nanmean(values):,.2f} over {n:,} transactions.", []
+
+        if query.intent == "top_rows":
+            chosen = self._top_rows(query, mask)
+            if query.order == "transaction_date":
+                heading = f"{len(chosen)} most recent"
+            else:
+                direction = "lowest" if query.ascending else "highest"
+                heading = f"{len(chosen)} {direction} by {LABELS.get(query.order, query.order)}"
+        else:
+            chosen = np.flatnonzero(mask)[:query.limit]
+            heading = f"first {len(chosen)}"
+        rows = [store.record(p) for p in chosen]
+        lines = [f"{n:,} transactions{described}; {heading}:"] + [f"- {self.summary(t)}" for t in rows]
+        return "\n".join(lines), rows
+
+    def route(self, question):
+        """A RoutedAnswer when the question can be answered exactly, else None"""
+        start = time.perf_counter()
+        if not len(self.store):
+            return None
+        query = self.parse(question)
+        if query is None:
+            return None
+        answer, rows = self.execute(query)
+        return RoutedAnswer(answer, query, rows, time.perf_counter() - start)
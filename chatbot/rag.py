@@ -1,4 +1,9 @@
-from langchain_community.document_loaders.csv_loader import CSVLoader
+import os
+import sys
+
+# Make the shared aml_engine package importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from langchain_ollama import OllamaLLM
 
 llm = OllamaLLM(model="llama3.1:8b")
@@ -7,34 +12,44 @@ import pandas as pd
 file_path = ('./usd_amount_dataset_with_score.csv')
 data = pd.read_csv(file_path)
 
-loader = CSVLoader(file_path=file_path)
-docs = loader.load_and_split()
-
-from langchain_huggingface import HuggingFaceEmbeddings
-import faiss
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
-
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-
-dim = len(embeddings.embed_query(" "))
-
-index = faiss.IndexFlatL2(dim)
-
-vector_store = FAISS(
-    embedding_function=embeddings,
-    index=index,
-    docstore=InMemoryDocstore(),
-    index_to_docstore_id={}
-)
-
-vector_store.add_documents(documents=docs)
+from hybrid_retriever import HybridRetriever
+from local_embeddings import LocalEmbeddings
+from query_router import QueryRouter
+from transaction_documents import DOCUMENT_PROMPT
+from transaction_store import TransactionStore
+from vector_index import IncrementalIndex
+
+# Count, sum, top-N and ID questions are answered exactly from the data
+router = QueryRouter(TransactionStore(data))
+
+# Batched CPU inference; vectors of texts embedded before come from the disk cache
+embeddings = LocalEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+
+# Reuse the index saved by an earlier run; only rows that changed in the CSV
+# since then are embedded again
+index_path = os.getenv("RAG_INDEX_PATH", "rag_index")
+stat = os.stat(file_path)
+csv_version = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+index, problems = None, {}
+if IncrementalIndex.exists(index_path):
+    index, problems = IncrementalIndex.open(index_path, embeddings, file_path)
+if index is None or problems:
+    # Nothing saved, or saved for another model or file: build it now
+    if index is not None:
+        index.close()
+    index = IncrementalIndex.create(index_path, embeddings, file_path)
+if index.manifest.get("dataset_version") != csv_version:
+    index.load_csv(file_path, replace=True)
+    index.save(dataset_version=csv_version)
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 
-retriever = vector_store.as_retriever()
+# Transaction ids in the question are looked up exactly; other questions
+# combine BM25 and FAISS search
+retriever = HybridRetriever(index=index)
 
 system_prompt = (
     "You are an assistant for question-answering tasks using RAG from a .csv file. "
@@ -53,10 +68,14 @@ prompt = ChatPromptTemplate.from_messages([
     
 ])
 
-question_answer_chain = create_stuff_documents_chain(llm, prompt)
+question_answer_chain = create_stuff_documents_chain(llm, prompt, document_prompt=DOCUMENT_PROMPT)
 rag_chain = create_retrieval_chain(retriever, question_answer_chain)
 
 query = "What was the transaction with transaction_id 'f207dcd6-f136-44ea-9d0c-a091d8494005' suspicious?"
 
-answer= rag_chain.invoke({"input": query})
-print(answer['answer']) 
\ No newline at end of file
+routed = router.route(query)
+if routed is not None:
+    print(routed.answer)
+else:
+    answer= rag_chain.invoke({"input": query})
+    print(answer['answer']) 
\ No newline at end of file
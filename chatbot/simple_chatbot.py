@@ -7,11 +7,22 @@ import tempfile
 import json
 from typing import List, Dict, Any
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
 import os
+import sys
+import time
 from datetime import datetime
 import re
 
+# Make the shared aml_engine package importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.dataset import DATASET_PATH, TransactionDataset, read_transactions
+from aml_engine.rules import get_default_engine
+from answer_cache import AnswerCache
+from mongo_sync import MongoSync
+from transaction_store import TransactionStore
+
 app = FastAPI(title="AML Simple Chatbot API", version="1.0.0")
 
 # CORS middleware
@@ -24,15 +35,31 @@ app.add_middleware(
 )
 
 # Global variables for chatbot system
-transaction_data = []
+transaction_store = TransactionStore()
 llm = None
 
+# Columns the query processor and rule analysis use; nothing else is loaded
+CHATBOT_COLUMNS = [
+    "transaction_id", "transaction_date", "account_key", "amount_usd", "transaction_amount",
+    "risk_score", "isSuspicious", "originator_country", "beneficiary_country",
+    "payment_instruction", "Rule4_score", "structuring_score"
+]
+
 # MongoDB connection
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB = os.getenv("MONGODB_DB", "aml_monitoring")
 
-client = AsyncIOMotorClient(MONGODB_URI)
-db = client[MONGODB_DB]
+# Seconds between incremental MongoDB syncs when the store is loaded from
+# MongoDB; 0 disables the background sync
+MONGO_SYNC_INTERVAL = int(os.getenv("MONGO_SYNC_INTERVAL", "30"))
+
+mongo_sync = None
+sync_lock = asyncio.Lock()
+sync_task = None
+
+# Answers are cached per question until the transaction store changes
+# (reload, refresh or background sync)
+answer_cache = AnswerCache(version=lambda: transaction_store.version)
 
 class ChatRequest(BaseModel):
     message: str
@@ -40,6 +67,7 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]] = []
+    cached: bool = False
 
 def initialize_chatbot_system():
     """Initialize the simple chatbot system"""
@@ -54,42 +82,61 @@ def initialize_chatbot_system():
         print(f"Error initializing chatbot system: {e}")
         raise e
 
-async def export_mongodb_to_csv():
-    """Export MongoDB transactions to CSV file"""
-    try:
-        collection = db.transactions
-        transactions = await collection.find({}).to_list(length=None)
-        
-        if not transactions:
-            return None
-            
-        # Convert ObjectId to string for JSON serialization
-        for transaction in transactions:
-            transaction['_id'] = str(transaction['_id'])
-        
-        # Create DataFrame
-        df = pd.DataFrame(transactions)
-        
-        # Save to CSV
-        csv_path = "chatbot/mongodb_transactions.csv"
-        df.to_csv(csv_path, index=False)
-        
-        return csv_path
-        
-    except Exception as e:
-        print(f"Error exporting MongoDB to CSV: {e}")
-        return None
+def get_mongo_sync():
+    """Incremental sync of the transactions collection, created on first use"""
+    global mongo_sync
+    if mongo_sync is None:
+        collection = MongoClient(MONGODB_URI)[MONGODB_DB].transactions
+        mongo_sync = MongoSync(collection, projection=CHATBOT_COLUMNS)
+    return mongo_sync
+
+def apply_changes(upserts, deleted):
+    """Apply one batch of MongoDB changes to the transaction store"""
+    transaction_store.upsert(upserts)
+    transaction_store.delete(deleted)
+
+async def sync_from_mongodb():
+    """Pull MongoDB changes since the last sync into the store; returns sync stats"""
+    async with sync_lock:
+        sync = get_mongo_sync()
+        start = datetime.now()
+        stats = {"batches": 0, "upserts": 0, "deletes": 0}
+        try:
+            while True:
+                # Reading from MongoDB blocks; applying runs on the event
+                # loop so queries never see a half-applied batch
+                batch = await asyncio.to_thread(sync.next_batch)
+                if batch is None:
+                    break
+                apply_changes(batch.upserts, batch.deleted)
+                sync.commit(batch)
+                stats["batches"] += 1
+                stats["upserts"] += len(batch.upserts)
+                stats["deletes"] += len(batch.deleted)
+        except Exception as e:
+            print(f"Error syncing from MongoDB: {e}")
+            stats["error"] = str(e)
+        stats["seconds"] = round((datetime.now() - start).total_seconds(), 3)
+        stats["mode"] = sync.mode
+        return stats
+
+async def mongo_sync_loop():
+    while True:
+        await asyncio.sleep(MONGO_SYNC_INTERVAL)
+        stats = await sync_from_mongodb()
+        if stats["upserts"] or stats["deletes"]:
+            print(f"Synced {stats['upserts']} changed and {stats['deletes']} deleted transactions from MongoDB")
 
 def load_csv_data(csv_path: str):
-    """Load CSV file into memory"""
-    global transaction_data
+    """Load a CSV file or Parquet transaction dataset into the indexed store"""
+    global transaction_store
     
     try:
-        # Load CSV data
-        df = pd.read_csv(csv_path)
-        transaction_data = df.to_dict('records')
+        # Load only the columns the chatbot uses
+        df = read_transactions(csv_path, CHATBOT_COLUMNS)
+        transaction_store = TransactionStore(df)
         
-        print(f"Loaded {len(transaction_data)} transactions from {csv_path}")
+        print(f"Loaded {len(transaction_store)} transactions from {csv_path}")
         return True
         
     except Exception as e:
@@ -98,61 +145,13 @@ def load_csv_data(csv_path: str):
 
 def analyze_triggered_rules(transaction):
     """Analyze which rules were triggered for a transaction"""
-    rules_triggered = []
-    
-    # Rule 1: High-risk country
-    high_risk_countries = ['AF', 'IR', 'KP', 'SY', 'VE', 'CU', 'MM', 'BY', 'RU', 'CN']
-    if transaction.get('beneficiary_country') in high_risk_countries:
-        rules_triggered.append({
-            'rule': 'High-risk country',
-            'score': 3,
-            'details': f"Beneficiary country {transaction.get('beneficiary_country')} is on the high-risk list"
-        })
-    
-    # Rule 2: High-value transaction
-    amount_usd = transaction.get('amount_usd', 0)
-    if amount_usd > 100000:  # $100k threshold
-        rules_triggered.append({
-            'rule': 'High-value transaction',
-            'score': 2,
-            'details': f"Transaction amount ${amount_usd:,.2f} exceeds $100,000 threshold"
-        })
-    
-    # Rule 3: Suspicious keywords
-    suspicious_keywords = ['cash', 'urgent', 'confidential', 'offshore', 'tax', 'avoid', 'secret', 'private']
-    payment_instruction = str(transaction.get('payment_instruction', '')).lower()
-    for keyword in suspicious_keywords:
-        if keyword in payment_instruction:
-            rules_triggered.append({
-                'rule': 'Suspicious keyword',
-                'score': 1,
-                'details': f"Payment instruction contains suspicious keyword: '{keyword}'"
-            })
-            break
-    
-    # Rule 4: Structuring pattern (simplified check)
-    if amount_usd >= 8000 and amount_usd <= 9999:
-        rules_triggered.append({
-            'rule': 'Potential structuring',
-            'score': 2,
-            'details': f"Transaction amount ${amount_usd:,.2f} falls in structuring range ($8,000-$9,999)"
-        })
-    
-    # Rule 5: Round number amounts
-    if amount_usd > 0 and amount_usd % 1000 == 0:
-        rules_triggered.append({
-            'rule': 'Round number amount',
-            'score': 1,
-            'details': f"Transaction amount ${amount_usd:,.2f} is a round number (multiple of $1,000)"
-        })
-    
-    return rules_triggered
+    return get_default_engine().evaluate_one(transaction)['triggered_rules']
 
 def simple_query_processor(query: str):
     """Simple rule-based query processor"""
-    global transaction_data
+    store = transaction_store
     
-    if not transaction_data:
+    if not len(store):
         return "No transaction data available. Please upload a CSV file or refresh data from MongoDB."
     
     query_lower = query.lower()
@@ -160,56 +159,44 @@ def simple_query_processor(query: str):
     # Count queries
     if "count" in query_lower or "how many" in query_lower:
         if "suspicious" in query_lower:
-            suspicious_count = sum(1 for t in transaction_data if t.get('isSuspicious', False))
-            return f"Found {suspicious_count} suspicious transactions out of {len(transaction_data)} total transactions."
+            return f"Found {store.count_suspicious()} suspicious transactions out of {len(store)} total transactions."
         elif "normal" in query_lower:
-            normal_count = sum(1 for t in transaction_data if not t.get('isSuspicious', False))
-            return f"Found {normal_count} normal transactions out of {len(transaction_data)} total transactions."
+            return f"Found {store.count_normal()} normal transactions out of {len(store)} total transactions."
         else:
-            return f"Total transactions: {len(transaction_data)}"
+            return f"Total transactions: {len(store)}"
     
     # Country queries
     if "country" in query_lower:
         if "originator" in query_lower:
-            countries = {}
-            for t in transaction_data:
-                country = t.get('originator_country', 'Unknown')
-                countries[country] = countries.get(country, 0) + 1
             result = "Originator countries:\n"
-            for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True)[:10]:
+            for country, count in store.top_countries('originator_country', 10):
                 result += f"- {country}: {count} transactions\n"
             return result
         elif "beneficiary" in query_lower:
-            countries = {}
-            for t in transaction_data:
-                country = t.get('beneficiary_country', 'Unknown')
-                countries[country] = countries.get(country, 0) + 1
             result = "Beneficiary countries:\n"
-            for country, count in sorted(countries.items(), key=lambda x: x[1], reverse=True)[:10]:
+            for country, count in store.top_countries('beneficiary_country', 10):
                 result += f"- {country}: {count} transactions\n"
             return result
     
     # Amount queries
     if "amount" in query_lower or "value" in query_lower:
         if "high" in query_lower or "large" in query_lower:
-            high_value = [t for t in transaction_data if t.get('amount_usd', 0) > 10000]
-            return f"Found {len(high_value)} high-value transactions (>$10,000). Average amount: ${sum(t.get('amount_usd', 0) for t in high_value) / len(high_value):,.2f}" if high_value else "No high-value transactions found."
+            high_count, high_total = store.high_value()
+            return f"Found {high_count} high-value transactions (>$10,000). Average amount: ${high_total / high_count:,.2f}" if high_count else "No high-value transactions found."
         else:
-            total_amount = sum(t.get('amount_usd', 0) for t in transaction_data)
-            avg_amount = total_amount / len(transaction_data) if transaction_data else 0
+            total_amount = store.total_amount()
+            avg_amount = total_amount / len(store)
             return f"Total transaction value: ${total_amount:,.2f}. Average transaction: ${avg_amount:,.2f}"
     
     # Risk score queries
     if "risk" in query_lower or "score" in query_lower:
+        min_risk, max_risk, avg_risk = store.risk_stats()
         if "high" in query_lower:
-            high_risk = [t for t in transaction_data if t.get('risk_score', 0) >= 7]
-            return f"Found {len(high_risk)} high-risk transactions (score >= 7)."
+            return f"Found {store.count_high_risk()} high-risk transactions (score >= 7)."
         elif "average" in query_lower or "avg" in query_lower:
-            avg_risk = sum(t.get('risk_score', 0) for t in transaction_data) / len(transaction_data) if transaction_data else 0
             return f"Average risk score: {avg_risk:.2f}"
         else:
-            risk_scores = [t.get('risk_score', 0) for t in transaction_data]
-            return f"Risk score distribution: Min: {min(risk_scores)}, Max: {max(risk_scores)}, Average: {sum(risk_scores)/len(risk_scores):.2f}"
+            return f"Risk score distribution: Min: {min_risk}, Max: {max_risk}, Average: {avg_risk:.2f}"
     
     # Transaction ID queries with detailed rule analysis
     if "transaction_id" in query_lower or "id" in query_lower or "flagged" in query_lower or "fraud" in query_lower or "rule" in query_lower:
@@ -217,82 +204,96 @@ def simple_query_processor(query: str):
         id_match = re.search(r'[a-f0-9\-]{20,}', query)
         if id_match:
             transaction_id = id_match.group()
-            for t in transaction_data:
-                if str(t.get('transaction_id', '')).lower() == transaction_id.lower():
-                    # Analyze triggered rules
-                    triggered_rules = analyze_triggered_rules(t)
-                    
-                    result = f"Transaction Analysis for ID: {transaction_id}\n"
-                    result += f"Amount: ${t.get('amount_usd', 0):,.2f}\n"
-                    result += f"Risk Score: {t.get('risk_score', 0)}\n"
-                    result += f"Suspicious: {t.get('isSuspicious', False)}\n"
-                    result += f"Beneficiary Country: {t.get('beneficiary_country', 'N/A')}\n"
-                    result += f"Payment Instruction: {t.get('payment_instruction', 'N/A')[:100]}...\n\n"
-                    
-                    if triggered_rules:
-                        result += "Rules Triggered:\n"
-                        total_score = 0
-                        for rule in triggered_rules:
-                            result += f"• {rule['rule']} (+{rule['score']} points): {rule['details']}\n"
-                            total_score += rule['score']
-                        result += f"\nTotal Rule Score: {total_score}\n"
-                        result += f"Transaction flagged as suspicious: {'Yes' if t.get('isSuspicious', False) else 'No'}"
-                    else:
-                        result += "No specific rules triggered. Transaction may be flagged due to:\n"
-                        result += "• Overall risk assessment\n"
-                        result += "• Pattern analysis\n"
-                        result += "• Manual review"
-                    
-                    return result
+            t = store.get(transaction_id)
+            if t is not None:
+                # Analyze triggered rules
+                triggered_rules = analyze_triggered_rules(t)
+                
+                result = f"Transaction Analysis for ID: {transaction_id}\n"
+                result += f"Amount: ${t.get('amount_usd', 0):,.2f}\n"
+                result += f"Risk Score: {t.get('risk_score', 0)}\n"
+                result += f"Suspicious: {t.get('isSuspicious', False)}\n"
+                result += f"Beneficiary Country: {t.get('beneficiary_country', 'N/A')}\n"
+                result += f"Payment Instruction: {t.get('payment_instruction', 'N/A')[:100]}...\n\n"
+                
+                if triggered_rules:
+                    result += "Rules Triggered:\n"
+                    total_score = 0
+                    for rule in triggered_rules:
+                        result += f"• {rule['rule']} (+{rule['score']} points): {rule['details']}\n"
+                        total_score += rule['score']
+                    result += f"\nTotal Rule Score: {total_score}\n"
+                    result += f"Transaction flagged as suspicious: {'Yes' if t.get('isSuspicious', False) else 'No'}"
+                else:
+                    result += "No specific rules triggered. Transaction may be flagged due to:\n"
+                    result += "• Overall risk assessment\n"
+                    result += "• Pattern analysis\n"
+                    result += "• Manual review"
+                
+                return result
             return f"Transaction ID {transaction_id} not found."
     
     # Date queries
     if "date" in query_lower or "recent" in query_lower:
         if "recent" in query_lower:
-            # Sort by date and return recent transactions
-            sorted_data = sorted(transaction_data, key=lambda x: x.get('transaction_date', ''), reverse=True)
-            recent = sorted_data[:5]
+            # Newest transactions straight from the date-sorted index
             result = "Recent transactions:\n"
-            for t in recent:
+            for t in store.recent(5):
                 result += f"- {t.get('transaction_date', 'N/A')}: ${t.get('amount_usd', 0):,.2f} ({'Suspicious' if t.get('isSuspicious', False) else 'Normal'})\n"
             return result
     
     # Default response
-    return f"I can help you analyze {len(transaction_data)} transactions. Try asking about:\n- Count of suspicious/normal transactions\n- Transactions by country\n- High-value transactions\n- Risk scores\n- Recent transactions\n- Specific transaction IDs\n- Why a transaction was flagged (include transaction ID)"
+    return f"I can help you analyze {len(store)} transactions. Try asking about:\n- Count of suspicious/normal transactions\n- Transactions by country\n- High-value transactions\n- Risk scores\n- Recent transactions\n- Specific transaction IDs\n- Why a transaction was flagged (include transaction ID)"
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize chatbot system on startup"""
     initialize_chatbot_system()
     
-    # Try to load CSV file from chatbot folder first
+    # Prefer the columnar dataset, then the CSV file from the chatbot folder
     csv_file_path = "aml_monitoring.transactions.csv"
+    if TransactionDataset.exists(DATASET_PATH):
+        csv_file_path = DATASET_PATH
     if os.path.exists(csv_file_path):
         print(f"Loading CSV file: {csv_file_path}")
         success = load_csv_data(csv_file_path)
         if success:
-            print(f"Successfully loaded {len(transaction_data)} transactions from {csv_file_path}")
+            print(f"Successfully loaded {len(transaction_store)} transactions from {csv_file_path}")
         else:
             print(f"Failed to load CSV file: {csv_file_path}")
     else:
         print(f"CSV file not found: {csv_file_path}")
-        # Fallback: Export MongoDB data to CSV and load into memory
-        csv_path = await export_mongodb_to_csv()
-        if csv_path:
-            load_csv_data(csv_path)
+        # Fallback: load MongoDB straight into the store and keep it in sync
+        global sync_task
+        stats = await sync_from_mongodb()
+        print(f"Loaded {len(transaction_store)} transactions from MongoDB in {stats['seconds']}s")
+        if MONGO_SYNC_INTERVAL > 0:
+            sync_task = asyncio.create_task(mongo_sync_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if sync_task is not None:
+        sync_task.cancel()
+    if mongo_sync is not None:
+        mongo_sync.close()
 
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Chat with the simple chatbot system"""
     try:
+        start = time.perf_counter()
+        version = transaction_store.version
+        cached = answer_cache.get(request.message)
+        if cached is not None:
+            return ChatResponse(**cached, cached=True)
+        
         # Get response from simple query processor
         answer = simple_query_processor(request.message)
         
-        return ChatResponse(
-            answer=answer,
-            sources=[]
-        )
+        response = {"answer": answer, "sources": []}
+        answer_cache.put(request.message, response, time.perf_counter() - start, version=version)
+        return ChatResponse(**response)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -302,17 +303,19 @@ async def chat(request: ChatRequest):
 async def reload_data():
     """Reload CSV data from file"""
     try:
-        global transaction_data
+        global transaction_store
         
-        # Try to load CSV file from chatbot folder
+        # Try the columnar dataset, then the CSV file from the chatbot folder
         csv_file_path = "aml_monitoring.transactions.csv"
+        if TransactionDataset.exists(DATASET_PATH):
+            csv_file_path = DATASET_PATH
         if os.path.exists(csv_file_path):
             success = load_csv_data(csv_file_path)
             if success:
                 return {
                     "success": True,
-                    "message": f"Data reloaded successfully with {len(transaction_data)} transactions",
-                    "transaction_count": len(transaction_data)
+                    "message": f"Data reloaded successfully with {len(transaction_store)} transactions",
+                    "transaction_count": len(transaction_store)
                 }
             else:
                 return {
@@ -330,13 +333,27 @@ async def reload_data():
             "error": str(e)
         }
 
+@app.post("/refresh-data")
+async def refresh_data():
+    """Apply MongoDB changes since the last sync to the loaded transactions"""
+    stats = await sync_from_mongodb()
+    if "error" in stats:
+        raise HTTPException(status_code=500, detail=stats["error"])
+    return {
+        "message": f"Synced {stats['upserts']} changed and {stats['deletes']} deleted transactions from MongoDB",
+        "transaction_count": len(transaction_store),
+        "sync": stats
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "chatbot_initialized": True,
-        "transaction_count": len(transaction_data),
+        "transaction_count": len(transaction_store),
+        "mongo_sync": mongo_sync.stats if mongo_sync is not None else None,
+        "answer_cache": answer_cache.stats,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -0,0 +1,191 @@
+"""
+Compact per-transaction documents for the RAG index.
+
+CSVLoader renders each row as one `column: value` line per column and the
+splitter may then cut it in two. `render_transactions` produces exactly one
+short document per transaction with the fields that carry meaning for
+retrieval in a fixed order and numbers formatted once:
+
+    2024-03-05 | 12,500.00 USD (11,400.00 EUR) | NEFT | DE -> IR | gift for family | rules: Rule2, Rule4
+
+Identifiers, the suspicious flag and scores are not embedded; they go into
+the document metadata, and DOCUMENT_PROMPT shows them to the LLM next to the
+text. Columns the renderer does not know are appended as `name: value` so
+nothing from an unfamiliar CSV is lost.
+
+`iter_transaction_frames` streams rows from a CSV path or a MongoDB cursor
+in chunks, so nothing needs the whole file in memory.
+"""
+
+from itertools import islice
+
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+
+CHUNK_ROWS = 10000
+
+FLAG_COLUMNS = ["isSuspicious", "is_suspicious", "suspicious_flag"]
+METADATA_COLUMNS = ["transaction_id", "account_key", "risk_score", "total_score", "usd_rate"]
+# Rendered into the text (in this order) or deliberately left out
+TEXT_COLUMNS = [
+    "transaction_date", "amount_usd", "transaction_amount", "currency_code", "payment_type", "transaction_type",
+    "originator_country", "beneficiary_country", "payment_instruction", "triggered_rules"
+]
+SKIPPED_COLUMNS = ["_id", "updated_at", "transaction_month"]
+
+# How a retrieved document is shown to the LLM; every key is always present
+# in the metadata of rendered documents
+DOCUMENT_PROMPT = PromptTemplate.from_template(
+    "Transaction {transaction_id} (account {account_key}, risk score {risk_score}, "
+    "suspicious: {suspicious}): {page_content}"
+)
+
+
+def _field_text(value):
+    if isinstance(value, (list, dict)):
+        return str(value)
+    return "" if pd.isna(value) else str(value)
+
+
+def _column_text(series):
+    if series.dtype == object:
+        # May hold nested values (e.g. triggered_rules lists from MongoDB)
+        return pd.Series([_field_text(v) for v in series.to_numpy()], index=series.index, dtype="string")
+    return series.astype("string").fillna("")
+
+
+def row_texts(rows):
+    """
+    Each row of a DataFrame laid out like CSVLoader's documents, one
+    `key: value` line per column (the former format, for comparison)
+    """
+    if not len(rows.columns):
+        return [""] * len(rows)
+    lines = [f"{name}: " + _column_text(rows[name]) for name in rows.columns]
+    return lines[0].str.cat(lines[1:], sep="\n").tolist()
+
+
+def _amount_text(series):
+    """Numbers as 12,500.00; text that is not a number is kept as is"""
+    numbers = pd.to_numeric(series, errors="coerce")
+    text = _column_text(series)
+    formatted = numbers.map("{:,.2f}".format, na_action="ignore").astype("string")
+    return formatted.fillna(text)
+
+
+def _date_text(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime("%Y-%m-%d").astype("string").fillna("")
+    # MongoDB datetimes at midnight
+    return _column_text(series).str.replace(r"[ T]00:00:00$", "", regex=True)
+
+
+def _rules_text(series):
+    def rules(value):
+        if isinstance(value, (list, tuple)):
+            return ", ".join(str(v) for v in value)
+        return _field_text(value).strip("[]").replace("'", "")
+    return pd.Series([rules(v) for v in series.to_numpy()], index=series.index, dtype="string")
+
+
+def _join(parts, sep=" | "):
+    """Concatenate string Series, skipping empty parts per row"""
+    result = None
+    for part in parts:
+        part = part.fillna("")
+        if result is None:
+            result = part
+            continue
+        glue = pd.Series(sep, index=part.index, dtype="string").where((result != "") & (part != ""), "")
+        result = result + glue + part
+    return result
+
+
+def _flag(rows):
+    column = next((c for c in FLAG_COLUMNS if c in rows), None)
+    if column is None:
+        return pd.Series([None] * len(rows), index=rows.index, dtype="object")
+    text = _column_text(rows[column]).str.strip().str.lower()
+    flag = text.isin(["1", "1.0", "true", "yes"])
+    return flag.astype("object").where(text != "", None)
+
+
+def _number(series):
+    numbers = pd.to_numeric(series, errors="coerce")
+    return numbers.astype("object").where(numbers.notna(), None)
+
+
+def render_transactions(rows):
+    """
+    One compact text and one metadata dict per row of DataFrame `rows`.
+    Returns (texts, metadatas).
+    """
+    n = len(rows)
+    empty = pd.Series("", index=rows.index, dtype="string")
+
+    def text(column, render=_column_text):
+        return render(rows[column]).str.strip() if column in rows else empty
+
+    amount = _join([text("amount_usd", _amount_text), empty.where(text("amount_usd") == "", "USD")], " ")
+    original = _join([text("transaction_amount", _amount_text), text("currency_code")], " ")
+    # The original amount only when it is in another currency
+    currency = text("currency_code").str.upper()
+    original = ("(" + original + ")").where((original != "") & (currency != "USD"), "")
+    route = _join([text("originator_country"), text("beneficiary_country")], " -> ")
+    rules = text("triggered_rules", _rules_text)
+    parts = [
+        text("transaction_date", _date_text),
+        _join([amount, original], " "),
+        text("payment_type"),
+        text("transaction_type"),
+        route,
+        text("payment_instruction"),
+        ("rules: " + rules).where(rules != "", ""),
+    ]
+
+    known = set(TEXT_COLUMNS + METADATA_COLUMNS + FLAG_COLUMNS + SKIPPED_COLUMNS)
+    scores = [c for c in rows.columns if c not in known and c.lower().endswith("score")]
+    for column in rows.columns:
+        if column not in known and column not in scores:
+            value = text(column)
+            parts.append((f"{column}: " + value).where(value != "", ""))
+    texts = _join(parts).tolist() if n else []
+
+    none = [None] * n
+    metadata = {}
+    for column in ["transaction_id", "account_key"]:
+        metadata[column] = text(column).astype("object").where(text(column) != "", None).tolist()
+    metadata["suspicious"] = _flag(rows).tolist()
+    for column in ["risk_score", "total_score", "usd_rate", *scores]:
+        metadata[column] = _number(rows[column]).tolist() if column in rows else none
+    names = list(metadata)
+    return texts, [dict(zip(names, values)) for values in zip(*metadata.values())]
+
+
+def iter_transaction_frames(source, chunk_rows=CHUNK_ROWS):
+    """
+    DataFrames of at most `chunk_rows` transactions from a CSV path or an
+    iterable of documents (e.g. a pymongo cursor), read lazily
+    """
+    if isinstance(source, (str, bytes)) or hasattr(source, "__fspath__"):
+        # Values as text, as written in the file
+        yield from pd.read_csv(source, dtype="string", keep_default_na=False, chunksize=chunk_rows)
+        return
+    documents = iter(source)
+    while True:
+        batch = list(islice(documents, chunk_rows))
+        if not batch:
+            return
+        frame = pd.DataFrame(batch)
+        if "_id" in frame:
+            frame["_id"] = frame["_id"].astype(str)
+        yield frame
+
+
+def iter_documents(source, chunk_rows=CHUNK_ROWS):
+    """LangChain Documents, one per transaction, streamed from a CSV path or cursor"""
+    for frame in iter_transaction_frames(source, chunk_rows):
+        texts, metadatas = render_transactions(frame)
+        for text, metadata in zip(texts, metadatas):
+            yield Document(page_content=text, metadata=metadata)
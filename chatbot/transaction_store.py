@@ -0,0 +1,307 @@
+"""
+Columnar in-memory transaction store for the simple chatbot.
+
+Keeps the transactions as pandas/NumPy columns instead of a list of dicts,
+with the indexes the query processor needs built once at load time:
+
+- a hash index from lower-cased transaction_id to row position
+- running aggregates: per-country counts, suspicious count, amount totals,
+  high-value count/sum and risk score counts (risk buckets)
+- row positions sorted by transaction date, newest first
+
+so ID lookups, counts, top countries, averages and "recent" queries no
+longer scan the data. `upsert` and `delete` apply incremental changes (e.g.
+from mongo_sync.MongoSync) and keep every index and aggregate current
+without reloading. `version` changes whenever the data does, so answers
+cached against it can be dropped.
+"""
+
+import itertools
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Same thresholds as simple_query_processor
+HIGH_VALUE_USD = 10000
+HIGH_RISK_SCORE = 7
+
+FLAG_COLUMNS = ["isSuspicious", "is_suspicious", "suspicious_flag"]
+COUNTRY_COLUMNS = ["originator_country", "beneficiary_country"]
+
+# Versions are unique across stores, so a reloaded store never reuses one
+_versions = itertools.count(1)
+
+
+def _date_keys(values):
+    """Sortable datetime64 keys for dates stored as DD-MM-YYYY, ISO or datetimes"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]")
+    text = values.astype("string")
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d", "mixed"):
+        missing = parsed.isna() & text.notna()
+        if not missing.any():
+            break
+        found = pd.to_datetime(text[missing], format=fmt, errors="coerce", utc=True).dt.tz_localize(None)
+        parsed[missing] = found.astype("datetime64[ns]")
+    return parsed.to_numpy(dtype="datetime64[ns]")
+
+
+class TransactionStore:
+    """Indexed, columnar view of the loaded transactions"""
+
+    def __init__(self, df=None):
+        df = pd.DataFrame() if df is None else df.reset_index(drop=True)
+        self.frame = df
+        self.flag_column = next((c for c in FLAG_COLUMNS if c in df), None)
+        self._build_indexes()
+        self.version = next(_versions)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @staticmethod
+    def _keys(rows):
+        """Lower-cased transaction_id per row, falling back to _id"""
+        if "transaction_id" in rows:
+            keys = rows["transaction_id"].astype("string")
+            if "_id" in rows:
+                keys = keys.fillna(rows["_id"].astype("string"))
+        else:
+            keys = rows["_id"].astype("string")
+        return keys.str.lower()
+
+    # ----- Index maintenance -----
+
+    def _build_indexes(self):
+        df = self.frame
+        n = len(df)
+        if "transaction_id" in df or "_id" in df:
+            ids = self._keys(df)
+            self.id_index = {i: position for position, i in enumerate(ids.tolist()) if i is not pd.NA}
+        else:
+            self.id_index = {}
+
+        if "transaction_date" in df:
+            self.dates = _date_keys(df["transaction_date"])
+        else:
+            self.dates = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+        # Newest first; undated rows go last and ties keep load order
+        order_keys = self._order_keys(self.dates)
+        self.date_order = np.argsort(order_keys, kind="stable")
+        self._sorted_keys = order_keys[self.date_order]
+
+        self.country_counts = {column: Counter() for column in COUNTRY_COLUMNS}
+        self.risk_counts = Counter()
+        self.suspicious_count = 0
+        self.amount_sum = 0.0
+        self.high_value_count = 0
+        self.high_value_sum = 0.0
+        self.risk_sum = 0.0
+        self._accumulate(df, 1)
+
+    @staticmethod
+    def _order_keys(dates):
+        """Ascending sort keys for newest-first order, undated rows last"""
+        keys = dates.view(np.int64).copy()
+        keys[np.isnat(dates)] = np.iinfo(np.int64).min + 1
+        return -keys
+
+    def _flags(self, rows):
+        if self.flag_column is None or self.flag_column not in rows:
+            return np.zeros(len(rows), dtype=bool)
+        return rows[self.flag_column].fillna(False).astype(bool).to_numpy()
+
+    def _accumulate(self, rows, sign):
+        """Add (sign=1) or remove (sign=-1) rows from the running aggregates"""
+        for column in COUNTRY_COLUMNS:
+            values = rows[column].fillna("Unknown") if column in rows else pd.Series("Unknown", index=rows.index)
+            for country, count in values.value_counts(sort=False).items():
+                self.country_counts[column][country] += sign * int(count)
+
+        self.suspicious_count += sign * int(self._flags(rows).sum())
+
+        amounts = rows["amount_usd"].fillna(0).to_numpy(dtype=np.float64) if "amount_usd" in rows else np.zeros(len(rows))
+        high = amounts > HIGH_VALUE_USD
+        self.amount_sum += sign * float(amounts.sum())
+        self.high_value_count += sign * int(high.sum())
+        self.high_value_sum += sign * float(amounts[high].sum())
+
+        risk = rows["risk_score"].fillna(0) if "risk_score" in rows else pd.Series(0, index=rows.index)
+        for score, count in risk.value_counts(sort=False).items():
+            self.risk_counts[score] += sign * int(count)
+        self.risk_sum += sign * float(risk.sum())
+
+    # ----- Incremental updates -----
+
+    def _conform(self, rows):
+        """Give `rows` the frame's columns and categorical dtypes"""
+        for column in rows.columns.difference(self.frame.columns):
+            self.frame[column] = pd.Series(pd.NA, index=self.frame.index, dtype="object")
+        rows = rows.reindex(columns=self.frame.columns)
+        for column in self.frame.columns:
+            dtype = self.frame[column].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                new = pd.Index(rows[column].dropna().unique()).difference(dtype.categories)
+                if len(new):
+                    self.frame[column] = self.frame[column].cat.add_categories(new)
+                rows[column] = rows[column].astype(self.frame[column].dtype)
+        return rows
+
+    def _set_rows(self, positions, rows):
+        for j, column in enumerate(self.frame.columns):
+            try:
+                self.frame.iloc[positions, j] = rows[column].to_numpy()
+            except (TypeError, ValueError):
+                # The new values do not fit the column's dtype
+                self.frame[column] = self.frame[column].astype(object)
+                self.frame.iloc[positions, j] = rows[column].to_numpy(dtype=object)
+
+    def _insert_order(self, positions, dates):
+        """Merge rows into the newest-first order without re-sorting"""
+        keys = self._order_keys(dates)
+        order = np.lexsort((positions, keys))
+        positions, keys = positions[order], keys[order]
+        if len(self.date_order) and positions[0] < self.date_order.max():
+            # Re-inserted older rows: place each after equal keys with a lower position
+            for position, key in zip(positions, keys):
+                lo = np.searchsorted(self._sorted_keys, key, side="left")
+                hi = np.searchsorted(self._sorted_keys, key, side="right")
+                at = lo + np.searchsorted(self.date_order[lo:hi], position)
+                self.date_order = np.insert(self.date_order, at, position)
+                self._sorted_keys = np.insert(self._sorted_keys, at, key)
+            return
+        at = np.searchsorted(self._sorted_keys, keys, side="right")
+        self.date_order = np.insert(self.date_order, at, positions)
+        self._sorted_keys = np.insert(self._sorted_keys, at, keys)
+
+    def upsert(self, rows):
+        """
+        Insert new transactions and replace existing ones, matched on
+        transaction_id (or _id when there is none). Returns (inserted, updated).
+        """
+        if not len(rows):
+            return 0, 0
+        rows = rows.reset_index(drop=True)
+        keys = self._keys(rows)
+        # Last write wins within a batch
+        latest = ~keys.duplicated(keep="last").to_numpy()
+        rows, keys = rows[latest].reset_index(drop=True), keys[latest].tolist()
+        if not len(self.frame):
+            self.frame = rows
+            self.flag_column = next((c for c in FLAG_COLUMNS if c in rows), None)
+            self._build_indexes()
+            self.version = next(_versions)
+            return len(rows), 0
+        if self.flag_column is None:
+            self.flag_column = next((c for c in FLAG_COLUMNS if c in rows), None)
+
+        positions = np.array([self.id_index.get(k, -1) for k in keys], dtype=np.int64)
+        existing = positions >= 0
+        rows = self._conform(rows)
+
+        if existing.any():
+            updated_positions = positions[existing]
+            updates = rows[existing].reset_index(drop=True)
+            self._accumulate(self.frame.iloc[updated_positions], -1)
+            self._set_rows(updated_positions, updates)
+            self._accumulate(updates, 1)
+            if "transaction_date" in updates:
+                dates = _date_keys(updates["transaction_date"])
+                moved = dates.view(np.int64) != self.dates[updated_positions].view(np.int64)
+                if moved.any():
+                    moved_positions = updated_positions[moved]
+                    keep = ~np.isin(self.date_order, moved_positions)
+                    self.date_order = self.date_order[keep]
+                    self._sorted_keys = self._sorted_keys[keep]
+                    self.dates[moved_positions] = dates[moved]
+                    self._insert_order(moved_positions, dates[moved])
+
+        inserts = rows[~existing].reset_index(drop=True)
+        if len(inserts):
+            start = len(self.frame)
+            self.frame = pd.concat([self.frame, inserts], ignore_index=True)
+            new_positions = np.arange(start, start + len(inserts))
+            for key, position in zip(np.asarray(keys, dtype=object)[~existing], new_positions):
+                if key is not pd.NA:
+                    self.id_index[key] = int(position)
+            if "transaction_date" in inserts:
+                dates = _date_keys(inserts["transaction_date"])
+            else:
+                dates = np.full(len(inserts), np.datetime64("NaT"), dtype="datetime64[ns]")
+            self.dates = np.concatenate([self.dates, dates])
+            self._insert_order(new_positions, dates)
+            self._accumulate(inserts, 1)
+        self.version = next(_versions)
+        return int((~existing).sum()), int(existing.sum())
+
+    def delete(self, ids, column="_id"):
+        """Remove transactions whose `column` is in `ids`. Returns the number removed."""
+        if not len(ids) or column not in self.frame:
+            return 0
+        values = self.frame[column].astype("string")
+        if column == "transaction_id":
+            values = values.str.lower()
+            ids = [str(i).lower() for i in ids]
+        removed = values.isin([str(i) for i in ids]).to_numpy()
+        if not removed.any():
+            return 0
+        # Deletes are rare; renumbering rows means rebuilding the indexes
+        self.frame = self.frame[~removed].reset_index(drop=True)
+        self._build_indexes()
+        self.version = next(_versions)
+        return int(removed.sum())
+
+    # ----- Queries -----
+
+    def record(self, position):
+        """One transaction as a dict"""
+        return self.frame.iloc[position].to_dict()
+
+    def get(self, transaction_id):
+        """Transaction dict for an id (case-insensitive), or None"""
+        position = self.id_index.get(str(transaction_id).lower())
+        return None if position is None else self.record(position)
+
+    def flags(self):
+        """Boolean suspicious flag per row"""
+        return self._flags(self.frame)
+
+    def count_suspicious(self):
+        return self.suspicious_count
+
+    def count_normal(self):
+        return len(self) - self.suspicious_count
+
+    def top_countries(self, column, k=10):
+        return [(c, n) for c, n in self.country_counts[column].most_common() if n > 0][:k]
+
+    def total_amount(self):
+        return self.amount_sum
+
+    def high_value(self):
+        """(count, total) of transactions above HIGH_VALUE_USD"""
+        return self.high_value_count, self.high_value_sum
+
+    def count_high_risk(self, threshold=HIGH_RISK_SCORE):
+        return sum(n for score, n in self.risk_counts.items() if score >= threshold)
+
+    def risk_stats(self):
+        """(min, max, mean) risk score"""
+        present = [score for score, n in self.risk_counts.items() if n > 0]
+        if not present:
+            return 0, 0, 0.0
+        return min(present), max(present), self.risk_sum / len(self)
+
+    def recent(self, k=5):
+        """The `k` most recent transactions, newest first"""
+        return [self.record(position) for position in self.date_order[:k]]
+
+    def stats(self):
+        return {
+            "transactions": len(self),
+            "indexed_ids": len(self.id_index),
+            "memory_bytes": int(self.frame.memory_usage(deep=True).sum())
+        }
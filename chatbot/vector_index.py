@@ -0,0 +1,678 @@
+"""
+Incremental FAISS indexing for the RAG chatbot.
+
+`IncrementalIndex` wraps the LangChain FAISS vector store and remembers, for
+every indexed transaction, its id (transaction_id, else MongoDB _id) and a
+hash of its document (one compact document per transaction, see
+transaction_documents). Loading rows again only embeds the transactions
+that are new or whose content changed; unchanged rows are skipped, changed
+ones replace their old vector and deleted ones are removed. A refresh after
+1% of the rows change therefore embeds about 1% of them.
+
+Embeddings are computed in batches of `batch_size` texts on a pool of
+`workers` threads, so remote or native embedding backends run concurrently.
+
+Vectors live in an `AnnIndex` chosen by VECTOR_INDEX_TYPE: exact `flat`
+search, or approximate `ivf_flat`, `ivf_pq` (compressed) and `hnsw`
+indexes for millions of transactions, tuned at query time by ANN_NPROBE /
+ANN_EF_SEARCH. benchmarks/bench_ann_index.py measures their recall,
+latency and memory.
+
+An index made with `IncrementalIndex.create(path, ...)` is persistent.
+`save()` writes the FAISS index and the position -> id map as a new
+generation of files, commits the documents and content hashes to a SQLite
+docstore and rewrites a manifest (embedding model, dimension, dataset and
+dataset version). `IncrementalIndex.open` memory-maps the FAISS file
+(copied into memory on the first change) and reads documents from SQLite
+only when a search returns them, so a restart is ready in seconds; it also
+reports where the manifest disagrees with the current model or dataset so
+the caller can rebuild in the background.
+
+Every index also keeps a `LexicalIndex` (hybrid_retriever) of transaction
+ids, account keys and document terms in step with its vectors; after `open`
+a background thread rebuilds it from the docstore, so startup does not
+wait on a pass over every document.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import faiss
+import numpy as np
+import pandas as pd
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+from hybrid_retriever import LexicalIndex
+from transaction_documents import iter_transaction_frames, render_transactions
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+CSV_CHUNK_ROWS = 10000
+
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "vector_index")
+# 3: compact transaction documents
+INDEX_FORMAT = 3
+MANIFEST_FILE = "manifest.json"
+DOCSTORE_FILE = "docstore.sqlite"
+DOCSTORE_CACHE_SIZE = 4096
+DOCSTORE_SCAN_ROWS = 10000
+
+# Nearest-neighbour search structure (see AnnIndex)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "0"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))
+ANN_TRAIN_SIZE = int(os.getenv("ANN_TRAIN_SIZE", "50000"))
+MIN_TRAIN_VECTORS = 1000
+HNSW_REBUILD_RATIO = 0.2
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def row_keys(rows, texts=None):
+    """
+    The id each row is indexed under: transaction_id, else MongoDB _id,
+    else the hash of its text
+    """
+    keys = pd.Series(pd.NA, index=rows.index, dtype="string")
+    for column in ("transaction_id", "_id"):
+        if column in rows:
+            values = rows[column].astype("string").str.strip()
+            keys = keys.fillna(values.mask(values == ""))
+    keys = keys.tolist()
+    if any(k is pd.NA for k in keys):
+        texts = texts if texts is not None else render_transactions(rows)[0]
+        keys = [content_hash(t) if k is pd.NA else k for k, t in zip(keys, texts)]
+    return keys
+
+
+def embedding_model_name(embeddings):
+    """The model an embeddings object was configured with"""
+    # model_id names the variant too (LocalEmbeddings' backend and
+    # quantization), whose vectors differ from the plain model's
+    for attribute in ("model_id", "model_name", "model"):
+        value = getattr(embeddings, attribute, None)
+        if isinstance(value, str):
+            return value
+    return type(embeddings).__name__
+
+
+class AnnIndex:
+    """
+    Nearest-neighbour index over stable int64 vector ids; the object the
+    LangChain FAISS store calls `search` on. `kind` is one of INDEX_TYPES:
+
+    - flat: exact brute-force search over float32 vectors
+    - ivf_flat, ivf_pq: vectors are bucketed into `nlist` k-means cells and
+      a search probes the `nprobe` nearest cells; ivf_pq also compresses
+      each vector to `pq_m` bytes. Until `train_size` vectors have arrived
+      they are kept in an exact index, then the cells (and PQ codebooks)
+      are trained on them and they move over.
+    - hnsw: graph search visiting `ef_search` candidates. The graph cannot
+      drop vectors, so removed ids are filtered out at search time until
+      they pass HNSW_REBUILD_RATIO of the index and the graph is rebuilt.
+    """
+
+    def __init__(self, dimension, kind=VECTOR_INDEX_TYPE, nlist=ANN_NLIST, pq_m=ANN_PQ_M, hnsw_m=ANN_HNSW_M,
+                 nprobe=ANN_NPROBE, ef_search=ANN_EF_SEARCH, train_size=ANN_TRAIN_SIZE, index=None, removed=()):
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type {kind!r}, expected one of {', '.join(INDEX_TYPES)}")
+        self.d = dimension
+        self.kind = kind
+        self.nlist = nlist
+        self.pq_m = pq_m or next(m for m in range(max(dimension // 8, 1), 0, -1) if dimension % m == 0)
+        self.hnsw_m = hnsw_m
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_size = train_size
+        self.index = index if index is not None else self._empty()
+        self.removed = set(removed)
+        self._selector = None
+        # True while `index` is a read-only view of a saved file
+        self.mapped = False
+
+    def _empty(self):
+        if self.kind == "hnsw":
+            return faiss.IndexIDMap2(faiss.IndexHNSWFlat(self.d, self.hnsw_m))
+        # Exact search; IVF kinds also stage vectors here until trained
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.d))
+
+    @property
+    def params(self):
+        """Build parameters, recorded in the manifest"""
+        return {"nlist": self.nlist, "pq_m": self.pq_m, "hnsw_m": self.hnsw_m, "train_size": self.train_size}
+
+    @property
+    def is_trained(self):
+        return self.kind in ("flat", "hnsw") or isinstance(self.index, faiss.IndexIVF)
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal - len(self.removed)
+
+    def _stored(self):
+        """(ids, vectors) of everything in the index, including removed ids"""
+        ids = faiss.vector_to_array(self.index.id_map)
+        return ids, self.index.index.reconstruct_n(0, self.index.ntotal)
+
+    def make_writable(self):
+        """Copy a memory-mapped index into memory before its first change"""
+        if self.mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self.mapped = False
+
+    def add(self, ids, vectors):
+        self.make_writable()
+        self.index.add_with_ids(np.asarray(vectors, dtype=np.float32), np.asarray(ids, dtype=np.int64))
+        if not self.is_trained and self.index.ntotal >= self.train_size:
+            self.train()
+
+    def remove(self, ids):
+        self.make_writable()
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.kind != "hnsw":
+            self.index.remove_ids(ids)
+            return
+        self.removed.update(ids.tolist())
+        self._selector = None
+        if len(self.removed) > HNSW_REBUILD_RATIO * self.index.ntotal:
+            ids, vectors = self._stored()
+            keep = ~np.isin(ids, np.fromiter(self.removed, dtype=np.int64))
+            self.index = self._empty()
+            self.index.add_with_ids(vectors[keep], ids[keep])
+            self.removed.clear()
+
+    def train(self):
+        """
+        Train the IVF cells on a sample of up to `train_size` staged vectors
+        and move every vector over. Returns False while there are too few
+        vectors to train on (the index stays exact).
+        """
+        if self.is_trained:
+            return True
+        n = self.index.ntotal
+        samples = min(n, self.train_size)
+        # About 4 * sqrt(n) cells, with the 39 samples per cell k-means wants
+        nlist = min(self.nlist or int(4 * np.sqrt(n)), samples // 39)
+        if n < MIN_TRAIN_VECTORS or nlist < 1:
+            return False
+        ids, vectors = self._stored()
+        sample = vectors[np.random.default_rng(0).choice(n, samples, replace=False)]
+        encoding = "Flat" if self.kind == "ivf_flat" else f"PQ{self.pq_m}x8"
+        index = faiss.index_factory(self.d, f"IVF{nlist},{encoding}")
+        index.train(sample)
+        # Removing ids by hash lookup instead of scanning every cell
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(vectors, ids)
+        index.nprobe = self.nprobe
+        self.index = index
+        return True
+
+    def search(self, x, k, params=None):
+        if self.kind == "hnsw":
+            params = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, k))
+            if self.removed:
+                if self._selector is None:
+                    batch = faiss.IDSelectorBatch(np.fromiter(self.removed, dtype=np.int64))
+                    self._selector = (batch, faiss.IDSelectorNot(batch))
+                params.sel = self._selector[1]
+        elif isinstance(self.index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=self.nprobe)
+        return self.index.search(x, k, params=params)
+
+    def reconstruct(self, vector_id):
+        return self.index.reconstruct(int(vector_id))
+
+    def write(self, path):
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def read(cls, path, kind, removed=(), **kwargs):
+        """Memory-map an index written by `write`"""
+        # Zero-copy view of the vectors where faiss supports it (1.8+)
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        index = faiss.read_index(path, flags)
+        ann = cls(index.d, kind, index=index, removed=removed, **kwargs)
+        ann.mapped = True
+        return ann
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore backed by SQLite. Documents are read on demand through
+    a small LRU cache. Writes stay in an open transaction until `commit`, so
+    what is on disk always matches the last saved index.
+    """
+
+    def __init__(self, path, cache_size=DOCSTORE_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                source TEXT,
+                mongo_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def add(self, texts):
+        rows = [(i, doc.page_content, json.dumps(doc.metadata, default=str)) for i, doc in texts.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?)", rows)
+            for i in texts:
+                self._cache.pop(i, None)
+
+    def delete(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in ids])
+            for i in ids:
+                self._cache.pop(i, None)
+
+    def search(self, search):
+        with self._lock:
+            doc = self._cache.get(search)
+            if doc is not None:
+                self._cache.move_to_end(search)
+                return doc
+            row = self._conn.execute("SELECT content, metadata FROM docs WHERE id = ?", (search,)).fetchone()
+            if row is None:
+                return f"ID {search} not found."
+            doc = Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+            self._cache[search] = doc
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return doc
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def scan(self, batch_rows=DOCSTORE_SCAN_ROWS):
+        """Every saved document as (ids, texts, metadatas) batches, bypassing the cache"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, id, content, metadata FROM docs WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_rows)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [r[1] for r in rows], [r[2] for r in rows], [json.loads(r[3]) for r in rows]
+
+    def entries(self):
+        """Saved (id, hash, source, mongo_id) rows"""
+        with self._lock:
+            return self._conn.execute("SELECT id, hash, source, mongo_id FROM entries").fetchall()
+
+    def meta(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def commit(self, entries, removed, meta):
+        """Write entry changes and metadata and commit every pending write at once"""
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", entries)
+            self._conn.executemany("DELETE FROM entries WHERE id = ?", [(i,) for i in removed])
+            self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(meta.items()))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IncrementalIndex:
+    """FAISS vector store that only embeds new or changed transactions"""
+
+    def __init__(self, vector_store, embeddings, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS,
+                 path=None, manifest=None):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        # Indexed id -> (content hash, source, MongoDB _id)
+        self.entries = {}
+        # MongoDB _id -> indexed id, so change-stream deletes can be resolved
+        self.aliases = {}
+        # Indexed id -> vector id in the AnnIndex
+        self.vector_ids = {id_: vector_id for vector_id, id_ in vector_store.index_to_docstore_id.items()}
+        self._next_id = max(vector_store.index_to_docstore_id, default=-1) + 1
+        # Exact id/account lookups and BM25 for the HybridRetriever
+        self.lexical = LexicalIndex()
+        self._lock = threading.Lock()
+        # Held while the FAISS index and its id map change and by searches,
+        # not while embedding, so chat keeps searching during an upsert
+        self._store_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+        self.stats = {"embedded": 0, "unchanged": 0, "deleted": 0, "embed_seconds": 0.0}
+        # Persistence (see create/open/save)
+        self.path = path
+        self.manifest = manifest or {}
+        self.generation = self.manifest.get("generation", 0)
+        self.sync_state = None
+        self._dirty = set()
+        self._closed = False
+        self._lexical_thread = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def embed(self, texts):
+        """Embed `texts` in batches on the worker pool, keeping their order"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = []
+        for batch in self._pool.map(self.embeddings.embed_documents, batches):
+            vectors.extend(batch)
+        return vectors
+
+    def upsert(self, rows, source):
+        """
+        Index the transactions in DataFrame `rows`, embedding only those that
+        are new or changed. Returns {"embedded": n, "unchanged": n, "keys": ids}.
+        """
+        texts, metadatas = render_transactions(rows)
+        keys = row_keys(rows, texts)
+        aliases = {}
+        if "_id" in rows:
+            ids = rows["_id"].astype("string").tolist()
+            aliases = {k: i for i, k in zip(ids, keys) if i is not pd.NA}
+
+        pending = {}
+        unchanged = 0
+        for key, text, metadata in zip(keys, texts, metadatas):
+            metadata.update(source=source, transaction_id=key)
+            # Metadata-only changes (flag, scores) update the document too
+            digest = content_hash(text + "\x1f".join(map(str, metadata.values())))
+            if self.entries.get(key, (None,))[0] == digest:
+                unchanged += 1
+                continue
+            # Last write wins within a batch
+            pending[key] = (text, digest, metadata)
+
+        with self._lock:
+            self.aliases.update((i, k) for k, i in aliases.items())
+            if pending:
+                changed = list(pending)
+                changed_texts = [pending[k][0] for k in changed]
+                start = time.perf_counter()
+                # Embed before touching the index so a failure leaves it intact
+                vectors = self.embed(changed_texts)
+                self.stats["embed_seconds"] += time.perf_counter() - start
+                stale = [k for k in changed if k in self.entries]
+                if stale:
+                    self._remove_vectors(stale)
+                self._add_vectors(changed, changed_texts, vectors, [pending[k][2] for k in changed])
+                for key in changed:
+                    self.entries[key] = (pending[key][1], source, aliases.get(key))
+                self._dirty.update(changed)
+            self.stats["embedded"] += len(pending)
+            self.stats["unchanged"] += unchanged
+        return {"embedded": len(pending), "unchanged": unchanged, "keys": keys}
+
+    def _add_vectors(self, keys, texts, vectors, metadatas):
+        """Store documents and their vectors under new vector ids"""
+        vector_ids = np.arange(self._next_id, self._next_id + len(keys), dtype=np.int64)
+        self._next_id += len(keys)
+        with self._store_lock:
+            self.vector_store.docstore.add({
+                key: Document(id=key, page_content=text, metadata=metadata)
+                for key, text, metadata in zip(keys, texts, metadatas)
+            })
+            self.vector_store.index.add(vector_ids, vectors)
+            self.lexical.add(keys, texts, metadatas)
+            for vector_id, key in zip(vector_ids.tolist(), keys):
+                self.vector_store.index_to_docstore_id[vector_id] = key
+                self.vector_ids[key] = vector_id
+
+    def _remove_vectors(self, keys):
+        with self._store_lock:
+            vector_ids = [self.vector_ids.pop(key) for key in keys]
+            self.vector_store.index.remove(vector_ids)
+            self.vector_store.docstore.delete(keys)
+            self.lexical.remove(keys)
+            for vector_id in vector_ids:
+                del self.vector_store.index_to_docstore_id[vector_id]
+
+    def search(self, vector, k):
+        """Documents of the `k` vectors nearest to `vector`"""
+        # The FAISS store maps result ids through index_to_docstore_id, so
+        # the search and the lookup must not interleave with a change
+        with self._store_lock:
+            return self.vector_store.similarity_search_by_vector(vector, k=k)
+
+    def delete(self, ids):
+        """Remove transactions by indexed id or MongoDB _id. Returns the number removed."""
+        with self._lock:
+            keys = {self.aliases.get(str(i), str(i)) for i in ids}
+            keys = [k for k in keys if k in self.entries]
+            if keys:
+                self._remove_vectors(keys)
+                for key in keys:
+                    mongo_id = self.entries.pop(key)[2]
+                    self.aliases.pop(mongo_id, None)
+                self._dirty.update(keys)
+            self.stats["deleted"] += len(keys)
+        return len(keys)
+
+    def delete_missing(self, seen, source):
+        """Remove transactions from `source` whose ids are not in `seen`"""
+        missing = [k for k, entry in list(self.entries.items()) if entry[1] == source and k not in seen]
+        return self.delete(missing)
+
+    def load_csv(self, csv_path, source=None, replace=False, chunk_rows=CSV_CHUNK_ROWS):
+        """
+        Index a CSV file (or any iterable of documents, such as a MongoDB
+        cursor, given a `source` name) chunk by chunk. With `replace`,
+        transactions previously loaded from the same source but absent from
+        the file are removed. Returns totals of embedded, unchanged and
+        deleted rows.
+        """
+        source = source or csv_path
+        totals = {"embedded": 0, "unchanged": 0, "deleted": 0}
+        seen = set()
+        for chunk in iter_transaction_frames(csv_path, chunk_rows):
+            result = self.upsert(chunk, source)
+            totals["embedded"] += result["embedded"]
+            totals["unchanged"] += result["unchanged"]
+            if replace:
+                seen.update(result["keys"])
+        if replace:
+            totals["deleted"] = self.delete_missing(seen, source)
+        return totals
+
+    # ----- Persistence -----
+
+    @property
+    def has_unsaved_changes(self):
+        return bool(self._dirty)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+    @classmethod
+    def create(cls, path, embeddings, dataset=None, index_type=VECTOR_INDEX_TYPE, **kwargs):
+        """Start an empty persistent index at `path`, replacing anything saved there"""
+        from langchain_community.vectorstores import FAISS
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        dimension = len(embeddings.embed_query(" "))
+        ann = AnnIndex(dimension, index_type)
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=ann,
+            docstore=SQLiteDocstore(os.path.join(path, DOCSTORE_FILE)),
+            index_to_docstore_id={}
+        )
+        manifest = {
+            "format": INDEX_FORMAT,
+            "embedding_model": embedding_model_name(embeddings),
+            "dimension": dimension,
+            "index_type": index_type,
+            "index_params": ann.params,
+            "dataset": dataset,
+            "dataset_version": None,
+            "generation": 0
+        }
+        index = cls(vector_store, embeddings, path=path, manifest=manifest, **kwargs)
+        index.save()
+        return index
+
+    @classmethod
+    def open(cls, path, embeddings, dataset=None, index_type=VECTOR_INDEX_TYPE, **kwargs):
+        """
+        Load the index saved at `path`, memory-mapping the FAISS file.
+        Returns (index, problems): `problems` maps each manifest field that
+        disagrees with `embeddings`/`dataset`/`index_type` to (saved,
+        expected) and is empty when everything matches. `index` is None when
+        nothing usable is saved.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILE))
+            meta = docstore.meta()
+            # The docstore commit is the last step of a save that must
+            # succeed, so its generation is the one to load
+            generation = int(meta["generation"])
+            with open(os.path.join(path, f"ids-{generation}.json"), encoding="utf-8") as f:
+                saved = json.load(f)
+            ann = AnnIndex.read(
+                os.path.join(path, f"index-{generation}.faiss"), manifest["index_type"], saved["removed"],
+                **manifest["index_params"]
+            )
+            if ann.ntotal != len(saved["ids"]):
+                raise ValueError(f"index holds {ann.ntotal} vectors but the id map {len(saved['ids'])}")
+        except (OSError, KeyError, TypeError, ValueError, RuntimeError, sqlite3.Error) as e:
+            return None, {"index": (f"unreadable: {e}", None)}
+
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=ann,
+            docstore=docstore,
+            index_to_docstore_id=dict(saved["ids"])
+        )
+        manifest.update(generation=generation, dataset_version=json.loads(meta.get("dataset_version") or "null"))
+        loaded = cls(vector_store, embeddings, path=path, manifest=manifest, **kwargs)
+        loaded.sync_state = meta.get("sync_state") or None
+        for key, digest, source, mongo_id in docstore.entries():
+            loaded.entries[key] = (digest, source, mongo_id)
+            if mongo_id is not None:
+                loaded.aliases[mongo_id] = key
+        loaded.lexical.ready.clear()
+        loaded._lexical_thread = threading.Thread(target=loaded._build_lexical, name="lexical-index", daemon=True)
+        loaded._lexical_thread.start()
+
+        expected = {
+            "format": INDEX_FORMAT,
+            "embedding_model": embedding_model_name(embeddings),
+            "dimension": len(embeddings.embed_query(" ")),
+            "index_type": index_type,
+            "dataset": dataset
+        }
+        problems = {
+            key: (manifest.get(key), value) for key, value in expected.items() if manifest.get(key) != value
+        }
+        return loaded, problems
+
+    def _build_lexical(self):
+        """Fill the lexical index from the docstore, then mark it ready"""
+        batches = self.vector_store.docstore.scan()
+        while True:
+            # Batches are read and added under the store lock so a
+            # concurrent delete cannot be undone by a batch read before it
+            with self._store_lock:
+                batch = None if self._closed else next(batches, None)
+                if batch is None:
+                    break
+                self.lexical.add(*batch)
+        if not self._closed:
+            self.lexical.ready.set()
+
+    def save(self, dataset_version=None, sync_state=None):
+        """
+        Persist the index under `path` as a new generation. `dataset_version`
+        and `sync_state` (e.g. MongoSync.state()) are stored with it.
+        """
+        with self._lock:
+            generation = self.generation + 1
+            ann = self.vector_store.index
+            ann.write(os.path.join(self.path, f"index-{generation}.faiss"))
+            mapping = self.vector_store.index_to_docstore_id
+            with open(os.path.join(self.path, f"ids-{generation}.json"), "w", encoding="utf-8") as f:
+                json.dump({"ids": list(mapping.items()), "removed": sorted(ann.removed)}, f)
+
+            if dataset_version is not None:
+                self.manifest["dataset_version"] = dataset_version
+            if sync_state is not None:
+                self.sync_state = sync_state
+            entries = [(k, *self.entries[k]) for k in self._dirty if k in self.entries]
+            removed = [k for k in self._dirty if k not in self.entries]
+            self.vector_store.docstore.commit(entries, removed, {
+                "generation": str(generation),
+                "dataset_version": json.dumps(self.manifest.get("dataset_version")),
+                "sync_state": self.sync_state or ""
+            })
+            self.generation = generation
+            self._dirty.clear()
+
+            self.manifest.update(
+                generation=generation, documents=len(mapping), trained=ann.is_trained,
+                saved_at=datetime.now().isoformat(timespec="seconds")
+            )
+            manifest_path = os.path.join(self.path, MANIFEST_FILE)
+            with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=2)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+
+            for pattern in ("index-*.faiss", "ids-*.json"):
+                for old in glob.glob(os.path.join(self.path, pattern)):
+                    if not old.endswith((f"-{generation}.faiss", f"-{generation}.json")):
+                        try:
+                            os.remove(old)
+                        except OSError:
+                            # Still mapped on platforms that lock mapped files
+                            pass
+
+    def close(self):
+        self._closed = True
+        if self._lexical_thread is not None:
+            self._lexical_thread.join()
+        self._pool.shutdown(wait=False)
+        if isinstance(self.vector_store.docstore, SQLiteDocstore):
+            self.vector_store.docstore.close()
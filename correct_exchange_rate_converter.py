@@ -1,22 +1,47 @@
+import argparse
+import asyncio
+import os
+import numpy as np
 import pandas as pd
 import requests
 import time
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
+
+from aml_engine.etl import ETL_CHUNK_ROWS, TransactionETL, print_stats
+from aml_engine.rates import (
+    DEFAULT_BASE_URL, RATES_DB_PATH, RateMatrix, RateStore, backfill, normalize_date, parse_dates
+)
 
 class CorrectExchangeRateConverter:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, rates_db: str = RATES_DB_PATH,
+                 max_requests: int = 29800, concurrency: int = 8):
         self.api_key = api_key
-        self.base_url = "https://v6.exchangerate-api.com/v6"
+        self.base_url = base_url.rstrip("/")
+        # Rates persist in a local SQLite store, so reruns only fetch new dates
+        self.store = RateStore(rates_db)
         self.rate_cache = {}
         self.request_count = 0
-        self.max_requests = 29800  # Your exact limit
+        self.max_requests = max_requests  # Your exact limit
+        self.concurrency = concurrency
         
     def get_exchange_rate_for_date(self, date: str) -> Optional[Dict[str, float]]:
         """Get all exchange rates for a specific date"""
         # Check cache first
         if date in self.rate_cache:
             return self.rate_cache[date]
+
+        try:
+            iso_date = normalize_date(date)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return None
+
+        # Then the persistent store
+        rates = self.store.get_rates(iso_date)
+        if rates is not None:
+            self.rate_cache[date] = rates
+            return rates
         
         # Check API limit
         if self.request_count >= self.max_requests:
@@ -24,16 +49,7 @@ class CorrectExchangeRateConverter:
             return None
         
         try:
-            # Parse date - handle DD-MM-YYYY format
-            try:
-                date_obj = datetime.strptime(date, "%d-%m-%Y")
-            except ValueError:
-                try:
-                    date_obj = datetime.strptime(date, "%Y-%m-%d")
-                except ValueError:
-                    print(f"ERROR: Unable to parse date format: {date}")
-                    return None
-            
+            date_obj = datetime.strptime(iso_date, "%Y-%m-%d")
             year = date_obj.year
             month = date_obj.month
             day = date_obj.day
@@ -52,7 +68,8 @@ class CorrectExchangeRateConverter:
                     rates = data.get("conversion_rates", {})
                     rates['USD'] = 1.0  # Add USD rate
                     
-                    # Store in cache
+                    # Store in cache and on disk
+                    self.store.put_rates(iso_date, rates)
                     self.rate_cache[date] = rates
                     
                     print(f"SUCCESS: Got {len(rates)} rates for {date} (Request #{self.request_count})")
@@ -67,10 +84,53 @@ class CorrectExchangeRateConverter:
         except Exception as e:
             print(f"ERROR: Exception for {date}: {str(e)}")
             return None
+
+    def backfill(self, dates: Iterable[str]) -> dict:
+        """Concurrently fetch every date not yet in the rate store"""
+        summary = asyncio.run(backfill(
+            self.store, dates, self.api_key, base_url=self.base_url,
+            concurrency=self.concurrency, max_requests=self.max_requests - self.request_count
+        ))
+        self.request_count += summary["requests"]
+        print(f"Backfill: fetched {summary['fetched']} of {summary['requested']} missing dates "
+              f"using {summary['requests']} requests")
+        for date, error in summary["failed"].items():
+            print(f"ERROR: Could not get rates for {date}: {error}")
+        if summary["stopped"]:
+            print(f"STOPPING: {summary['stopped']} ({summary['remaining']} dates left, rerun to resume)")
+        return summary
     
-    def process_transactions(self, input_file: str, output_file: str, start_row: int = 0, max_rows: int = 29800):
+    def convert_stream(self, input_file: str, output_file: str, chunk_rows: int = ETL_CHUNK_ROWS):
+        """
+        Convert, round and rule-score a transactions file of any size in
+        fixed-size chunks, resuming from a byte-offset checkpoint after a crash
+        """
+        print(f"Streaming {input_file} in chunks of {chunk_rows:,} rows")
+
+        # First pass reads only the date column to find the dates to backfill
+        unique_dates = set()
+        for chunk in pd.read_csv(input_file, usecols=['transaction_date'], chunksize=chunk_rows):
+            unique_dates.update(chunk['transaction_date'].unique())
+        days = parse_dates(list(unique_dates))
+        if np.isnat(days).any() or not len(days):
+            print(f"ERROR: Unable to parse {int(np.isnat(days).sum())} transaction dates")
+            return False
+        days = np.sort(days)
+        print(f"Unique dates: {len(days)}")
+
+        print("\nFetching exchange rates...")
+        self.backfill(days.astype(str))
+
+        matrix = RateMatrix.from_store(self.store, str(days[0]), str(days[-1]))
+        etl = TransactionETL(rate_matrix=matrix, chunk_rows=chunk_rows)
+        stats = etl.run(input_file, output_file, checkpoint_path=f"{output_file}.checkpoint")
+        print_stats(stats)
+        print(f"API requests used: {self.request_count}/{self.max_requests}")
+        return stats["missing_rates"] == 0
+
+    def process_transactions(self, input_file: str, output_file: str, start_row: int = 0, max_rows: Optional[int] = None):
         """Process transactions with real exchange rates"""
-        end_row = start_row + max_rows
+        end_row = "end" if max_rows is None else start_row + max_rows
         print(f"Processing rows {start_row+1} to {end_row} from {input_file}")
         print(f"API limit: {self.max_requests} requests")
         
@@ -79,30 +139,29 @@ class CorrectExchangeRateConverter:
         print(f"Loaded {len(df)} transactions")
         
         # Get unique dates
-        unique_dates = df['transaction_date'].unique()
+        days = parse_dates(df['transaction_date'])
+        known = days[~np.isnat(days)]
+        if len(known) < len(days) or not len(known):
+            print(f"ERROR: Unable to parse {len(days) - len(known)} transaction dates")
+            print("Cannot proceed without real exchange rates")
+            return False
+        unique_dates = np.unique(known)
         print(f"Unique dates: {len(unique_dates)}")
         
-        # Fetch rates for all unique dates
+        # Fetch rates for all unique dates missing from the store
         print("\nFetching exchange rates...")
-        for date in unique_dates:
-            rates = self.get_exchange_rate_for_date(date)
-            if rates is None:
-                print(f"STOPPING: Could not get rates for {date}")
-                break
-        
-        # Check if we have rates for all dates
-        missing_dates = [date for date in unique_dates if date not in self.rate_cache]
-        if missing_dates:
-            print(f"ERROR: Missing rates for dates: {missing_dates}")
-            print("Cannot proceed without real exchange rates")
-            return False
+        self.backfill(unique_dates.astype(str))
         
-        # Add USD rates and convert amounts
+        # Add USD rates and convert amounts: one gather from a dense
+        # date x currency array, falling back to the previous business day
+        # for dates without a rate
         print("\nConverting amounts to USD...")
-        df['usd_rate'] = df.apply(
-            lambda row: self.rate_cache.get(row['transaction_date'], {}).get(row['currency_code'], None),
-            axis=1
-        )
+        matrix = RateMatrix.from_store(self.store, str(unique_dates[0]), str(unique_dates[-1]))
+        df['usd_rate'] = matrix.lookup(days, df['currency_code'])
+        exact = matrix.lookup(days, df['currency_code'], fallback=False)
+        fallback_rows = int((np.isnan(exact) & ~np.isnan(df['usd_rate'].to_numpy())).sum())
+        if fallback_rows:
+            print(f"Used previous business day rates for {fallback_rows} transactions")
         
         # Check for missing rates
         missing_rates = df[df['usd_rate'].isna()]
@@ -141,22 +200,43 @@ class CorrectExchangeRateConverter:
         return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert transaction amounts to USD with historical rates")
+    parser.add_argument("--input", default="dataset/original_dataset.csv")
+    parser.add_argument("--output", default="dataset/transactions_with_usd_rates_final.csv")
+    parser.add_argument("--chunk-rows", type=int, default=ETL_CHUNK_ROWS)
+    parser.add_argument("--start-row", type=int, default=None,
+                        help="Load just this row range into memory instead of streaming the whole file")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--base-url", default=os.getenv("EXCHANGE_RATE_BASE_URL", DEFAULT_BASE_URL))
+    parser.add_argument("--rates-db", default=RATES_DB_PATH)
+    parser.add_argument("--max-requests", type=int, default=29800)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backfill-only", action="store_true",
+                        help="Only fetch missing dates into the rate store, do not convert")
+    args = parser.parse_args()
+
     # Initialize converter
-    api_key = "4299650994279511afe6ed48"
-    converter = CorrectExchangeRateConverter(api_key)
-    
-    # File paths
-    input_file = "C:/Purav/Team-11-Innoversite/dataset/original_dataset.csv"
-    output_file = "C:/Purav/Team-11-Innoversite/dataset/transactions_with_usd_rates_final.csv"
-    
-    # Process final batch (rows 89,401 to 100,000) - only 10,600 rows
-    start_row = 89400  # Start from row 89,401 (0-indexed)
-    max_rows = 10600   # Only 10,600 rows remaining
-    success = converter.process_transactions(input_file, output_file, start_row, max_rows)
+    api_key = os.getenv("EXCHANGE_RATE_API_KEY", "4299650994279511afe6ed48")
+    converter = CorrectExchangeRateConverter(
+        api_key, base_url=args.base_url, rates_db=args.rates_db,
+        max_requests=args.max_requests, concurrency=args.concurrency
+    )
+
+    if args.backfill_only:
+        dates = pd.read_csv(args.input, usecols=['transaction_date'])['transaction_date'].unique()
+        converter.backfill(dates)
+        print(f"Rate store: {converter.store.stats()}")
+        return
+
+    # Rates already in the store are reused and the streaming job checkpoints
+    # its progress, so a run cut short resumes where it stopped
+    if args.start_row is None and args.max_rows is None:
+        success = converter.convert_stream(args.input, args.output, args.chunk_rows)
+    else:
+        success = converter.process_transactions(args.input, args.output, args.start_row or 0, args.max_rows)
     
     if success:
         print("\nCONVERSION COMPLETED SUCCESSFULLY!")
-        print(f"Total rows processed: {29800 + 29800 + 29800 + 10600}")  # All batches complete
     else:
         print("\nCONVERSION FAILED - Check errors above")
 
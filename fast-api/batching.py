@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from aml_engine.concurrency import ExecutorSaturated
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row prediction requests into one vectorized
+    model call.
+
+    Rows submitted within `max_wait_ms` of the first pending row (or until
+    `max_batch_size` rows are queued) are stacked into a single 2-D array,
+    scored with one `predict_fn` call and the results are fanned back out to
+    each waiting caller.
+
+    When an `executor` is given the model call runs on it instead of the event
+    loop, with up to one batch per executor worker in flight while the next
+    batch is collected. At most `max_pending` rows may wait in the queue;
+    further submits raise ExecutorSaturated so the API can answer 429.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=2.0, executor=None,
+                 max_pending=0, latency_window=10000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.max_pending = max_pending
+        self._queue = None
+        self._worker = None
+        # Batches being scored, at most one per executor worker
+        self._slots = None
+        self._tasks = set()
+
+        # Metrics
+        self._latencies_ms = deque(maxlen=latency_window)
+        self._started_at = time.perf_counter()
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_rows = 0
+        self.total_errors = 0
+        self.total_rejected = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._slots = asyncio.Semaphore(self.executor.max_workers if self.executor is not None else 1)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(self._worker, *self._tasks, return_exceptions=True)
+            self._worker = None
+
+    async def submit(self, row):
+        """Queue one feature row and wait for its prediction"""
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        enqueued_at = time.perf_counter()
+        try:
+            self._queue.put_nowait((row, future))
+        except asyncio.QueueFull:
+            self.total_rejected += 1
+            raise ExecutorSaturated(f"{self.max_pending} predictions already pending")
+        try:
+            return await future
+        finally:
+            self._latencies_ms.append((time.perf_counter() - enqueued_at) * 1000.0)
+            self.total_requests += 1
+
+    async def _collect(self):
+        """Wait for the first row, then gather more until the window closes"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _predict(self, features):
+        if self.executor is None:
+            return self.predict_fn(features)
+        return await self.executor.run(self.predict_fn, features)
+
+    async def _run(self):
+        while True:
+            # Collect only once a worker is free, so rows keep joining the
+            # next batch while every worker is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._score(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch):
+        try:
+            # Drop callers that gave up while waiting in the queue
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                return
+
+            features = np.vstack([row for row, _ in batch])
+            try:
+                predictions = await self._predict(features)
+            except Exception as e:
+                self.total_errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.total_batches += 1
+            self.total_rows += len(batch)
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Latency percentiles and throughput counters for tuning the window"""
+        elapsed = time.perf_counter() - self._started_at
+        latencies = np.fromiter(self._latencies_ms, dtype=float)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "total_rows": self.total_rows,
+            "total_errors": self.total_errors,
+            "total_rejected": self.total_rejected,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": self.total_rows / self.total_batches if self.total_batches else 0.0,
+            "throughput_rps": self.total_requests / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if latencies.size else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if latencies.size else None,
+        }
@@ -1,8 +1,20 @@
-
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
 import joblib
-import numpy as np
+import os
+import pandas as pd
+import sys
+
+# Make the shared aml_engine package importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.concurrency import BoundedExecutor, ExecutorSaturated
+from aml_engine.features import load_encoder
+from aml_engine.rules import RULE_COLUMNS, get_default_engine
+from aml_engine.structuring_stream import StructuringState
+from batching import MicroBatcher
 
 app = FastAPI(
     title="ML Fraud Transaction Detection System",
@@ -12,6 +24,32 @@ app = FastAPI(
 
 MODEL_PATH = "fraud_detection_pipeline.pkl"
 model = joblib.load(MODEL_PATH)
+encoder = load_encoder(MODEL_PATH)
+
+# Micro-batching window for coalescing concurrent /predict calls
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "256"))
+
+# Model inference runs on a bounded thread pool so it never blocks the event loop
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", "2"))
+PREDICT_QUEUE = int(os.getenv("PREDICT_QUEUE", "8"))
+PREDICT_MAX_PENDING = int(os.getenv("PREDICT_MAX_PENDING", "4096"))
+
+executor = BoundedExecutor(max_workers=PREDICT_WORKERS, max_queue=PREDICT_QUEUE, name="predict")
+batcher = MicroBatcher(
+    model.predict,
+    max_batch_size=BATCH_MAX_ROWS,
+    max_wait_ms=BATCH_WINDOW_MS,
+    executor=executor,
+    max_pending=PREDICT_MAX_PENDING
+)
+
+# Online structuring (Rule 4) state, snapshotted so restarts warm up quickly
+STRUCTURING_STATE_PATH = os.getenv("STRUCTURING_STATE_PATH", "structuring_state.pkl")
+STRUCTURING_SNAPSHOT_SECONDS = float(os.getenv("STRUCTURING_SNAPSHOT_SECONDS", "60"))
+
+structuring_state = StructuringState()
+rule_engine = get_default_engine()
 
 
 class TransactionInput(BaseModel):
@@ -20,12 +58,114 @@ class TransactionInput(BaseModel):
     currency_code: str
     payment_type: str
     amount_usd: float
-    Rule1_score: float
-    Rule2_score: float
-    Rule3_score: float
-    Rule4_score: float
-    Rule5_score: float
-    total_score: float
+    # Rule scores omitted by the caller are computed by the shared rule
+    # engine; Rule4 uses the online structuring state
+    Rule1_score: Optional[float] = None
+    Rule2_score: Optional[float] = None
+    Rule3_score: Optional[float] = None
+    Rule4_score: Optional[float] = None
+    Rule5_score: Optional[float] = None
+    total_score: Optional[float] = None
+    payment_instruction: Optional[str] = None
+    transaction_id: Optional[str] = None
+    account_key: Optional[str] = None
+    transaction_date: Optional[str] = None
+
+
+class BatchTransactionInput(BaseModel):
+    transactions: List[TransactionInput]
+
+
+def build_features(data: TransactionInput):
+    """Build the model feature row for a single transaction"""
+    return encoder.transform_one(data.model_dump())
+
+
+def fill_scores(data: TransactionInput, scores):
+    """Take the rule scores the caller did not precompute from `scores` and total them"""
+    added = 0.0
+    for column in RULE_COLUMNS:
+        if getattr(data, column) is None:
+            setattr(data, column, float(scores[column]))
+            added += scores[column]
+
+    if data.total_score is None:
+        data.total_score = float(sum(getattr(data, column) for column in RULE_COLUMNS))
+    else:
+        data.total_score += added
+
+
+def apply_rules(data: TransactionInput):
+    """
+    Fill in the rule scores the caller did not precompute. Returns the ids
+    newly flagged for structuring by this transaction.
+    """
+    flagged_ids = []
+    scores = {}
+    if any(getattr(data, column) is None for column in RULE_COLUMNS):
+        # Safe to retry after a 429 or a model error: the state counts each
+        # transaction_id once
+        state = structuring_state if data.Rule4_score is None else None
+        scores = rule_engine.evaluate_one(data.model_dump(), structuring_state=state)
+        flagged_ids = [i for i in scores["structuring_flagged_ids"] if i is not None]
+    fill_scores(data, scores)
+    return flagged_ids
+
+
+def apply_rules_batch(transactions: List[TransactionInput]):
+    """
+    apply_rules for a batch: Rules 1-3 and 5 are evaluated over all rows at
+    once, Rule 4 through the online structuring state in request order.
+    Returns the newly flagged ids per transaction.
+    """
+    records = [t.model_dump() for t in transactions]
+    scores = rule_engine.evaluate(pd.DataFrame.from_records(records), structuring=False)
+    flagged = []
+    for data, record, row in zip(transactions, records, scores[RULE_COLUMNS].to_dict("records")):
+        flagged_ids = []
+        if data.Rule4_score is None and record["account_key"] and record["transaction_date"]:
+            row["Rule4_score"], flagged_ids = structuring_state.update(
+                record["account_key"], record["transaction_id"], record["transaction_date"], record["amount_usd"]
+            )
+        fill_scores(data, row)
+        flagged.append([i for i in flagged_ids if i is not None])
+    return flagged
+
+
+def format_prediction(prediction):
+    label = "Suspicious" if prediction == 1 else "Not Suspicious"
+    return {
+        "prediction": int(prediction),
+        "label": label
+    }
+
+
+async def snapshot_structuring_state():
+    """Periodically persist the structuring state off the event loop"""
+    while True:
+        await asyncio.sleep(STRUCTURING_SNAPSHOT_SECONDS)
+        try:
+            await executor.run(structuring_state.prune)
+            await executor.run(structuring_state.snapshot, STRUCTURING_STATE_PATH)
+        except Exception as e:
+            print(f"Error snapshotting structuring state: {e}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    if await executor.run(structuring_state.restore, STRUCTURING_STATE_PATH):
+        print(f"Restored structuring state: {structuring_state.stats()}")
+    app.state.snapshot_task = asyncio.create_task(snapshot_structuring_state())
+    await batcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.snapshot_task.cancel()
+    await batcher.stop()
+    structuring_state.snapshot(STRUCTURING_STATE_PATH)
+    executor.shutdown()
+
 
 @app.get("/")
 def home():
@@ -33,37 +173,75 @@ def home():
 
 
 @app.post("/predict")
-def predict_transaction(data: TransactionInput):
+async def predict_transaction(data: TransactionInput):
 
     try:
-        # Prepare input data for model
-        input_features = np.array([[
-            hash(data.payment_type) % 1000,
-            data.amount_usd,
-            data.Rule1_score,
-            data.Rule2_score,
-            data.Rule3_score,
-            data.Rule4_score,
-            data.Rule5_score,
-            data.total_score
-        ]])
-
-        # Make prediction
-        prediction = model.predict(input_features)[0]
-        label = "Suspicious" if prediction == 1 else "Not Suspicious"
+        flagged_ids = apply_rules(data)
+
+        # Concurrent requests are coalesced into one vectorized model call
+        prediction = await batcher.submit(build_features(data))
 
         # Return result
         return {
             "status": "success",
-            "prediction": int(prediction),
-            "label": label
+            **format_prediction(prediction),
+            "rule_scores": {column: getattr(data, column) for column in RULE_COLUMNS},
+            "total_score": data.total_score,
+            "structuring_flagged_ids": flagged_ids,
+            "country_risk_version": rule_engine.country_index.version
         }
 
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
 
+
+@app.post("/predict/batch")
+async def predict_batch(data: BatchTransactionInput):
+
+    try:
+        if not data.transactions:
+            return {"status": "success", "results": []}
+
+        flagged_ids = apply_rules_batch(data.transactions)
+        input_features = encoder.transform([t.model_dump() for t in data.transactions])
+        predictions = await executor.run(model.predict, input_features)
+
+        return {
+            "status": "success",
+            "results": [
+                {
+                    **format_prediction(p),
+                    "rule_scores": {column: getattr(t, column) for column in RULE_COLUMNS},
+                    "total_score": t.total_score,
+                    "structuring_flagged_ids": f,
+                    "country_risk_version": rule_engine.country_index.version
+                }
+                for p, t, f in zip(predictions, data.transactions, flagged_ids)
+            ]
+        }
+
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+@app.get("/metrics")
+def metrics():
+    """Micro-batching latency, throughput and executor counters"""
+    return {
+        "batching": batcher.stats(),
+        "executor": executor.stats(),
+        "structuring_state": structuring_state.stats()
+    }
+
 # ===== Run Command =====
-# uvicorn app:app --reload
+# uvicorn connection:app --reload
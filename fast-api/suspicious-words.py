@@ -1,5 +1,15 @@
-from fastapi import FastAPI
-from typing import List
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Dict, List
+import json
+import os
+import sys
+import threading
+
+# Make the shared aml_engine package importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aml_engine.keywords import KeywordMatcher, content_version, parse_keywords
 
 # Initialize the FastAPI application with metadata
 app = FastAPI(
@@ -8,55 +18,128 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Your comprehensive list of suspicious keywords
-suspicious_keywords_data = [
-    # Obfuscation & Vague Purpose
-    "gift", "donation", "loan", "cash", "payment", "personal expense", "consulting fee",
-    "marketing services", "professional services", "commission", "reimbursement", "miscellaneous",
-    "service charge", "for processing", "fees", "proceeds", "family support", "living expenses",
-    "for safekeeping", "capital investment", "unspecified invoice",
-    
-    # Urgency, Secrecy, & Unusual Instructions
-    "urgent", "rush payment", "confidential", "special handling", "discreet", "do not disclose",
-    "sensitive", "private arrangement", "handle personally", "third-party payment",
-    "pay on behalf of", "pass-through", "as per verbal instructions", "quick transfer",
-    
-    # High-Risk Structures & Jurisdictions
-    "offshore", "shell company", "shell corp", "bearer bond", "bearer shares", "trust",
-    "foundation", "nominee", "IBC", "SPV",
-    
-    # Structuring & Evasion
-    "structuring", "smurfing", "below threshold", "under 10k", "cash deposit",
-    "multiple deposits", "split payment", "cash intensive", "cash-out",
-    
-    # Digital Assets & IVTS
-    "crypto", "cryptocurrency", "BTC", "ETH", "USDT", "XMR", "Monero", "digital wallet",
-    "mixer", "tumbler", "Hawala", "Hundi", "underground banking",
-    
-    # High-Risk Goods & TBML
-    "art", "gems", "diamonds", "luxury goods", "gold", "bullion", "antiques",
-    "real estate deposit", "yacht", "aircraft", "over-invoicing", "under-invoicing",
-    "double invoicing", "invoice 999",
-    
-    # Sanctions Evasion & Dual-Use Goods
-    "transshipment", "intermediary", "routed via", "bill of lading", "dual-use goods",
-    "freight forwarding", "customs duty", "vessel name change", "port of call",
-    
-    # Cybercrime, Scams & Fraud
-    "ransomware", "CEO fraud", "BEC", "pig butchering", "romance scam", "unfreezing fee",
-    "account recovery", "dark web", "darknet", "malware", "phishing",
-    
-    # PEP & Bribery
-    "facilitation payment", "government contract", "public official", "political donation",
-    "slush fund", "backhander", "introduction fee",
-    
-    # NPO Risk
-    "humanitarian aid", "religious donation", "charitable contribution", "fundraising", "relief fund"
-]
+# Keywords and their category groupings live in sus_words.txt
+KEYWORDS_PATH = os.getenv(
+    "KEYWORDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sus_words.txt")
+)
+KEYWORDS_POLL_SECONDS = float(os.getenv("KEYWORDS_POLL_SECONDS", "2"))
+
+
+class KeywordSnapshot:
+    """Immutable view of one version of the keyword file"""
+
+    def __init__(self, text):
+        self.version = content_version(text)
+        self.etag = f'"{self.version}"'
+        self.categories = parse_keywords(text)
+        self.keywords = [k for keywords in self.categories.values() for k in keywords]
+        matcher = KeywordMatcher(self.categories, version=self.version)
+        self.artifact = json.dumps(matcher.to_artifact(self.version)).encode("utf-8")
+
+
+class KeywordRegistry:
+    """
+    Serves the current keyword snapshot and reloads it when the file changes.
+
+    A new snapshot is fully built before it replaces the old one, so readers
+    never see a half-loaded list and a broken edit keeps the last good version.
+    """
+
+    def __init__(self, path, poll_seconds=2.0):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.snapshot = None
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.reload()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        stamp = self._file_stamp()
+        with open(self.path, encoding="utf-8") as f:
+            text = f.read()
+        snapshot = KeywordSnapshot(text)
+        if self.snapshot is None or snapshot.version != self.snapshot.version:
+            print(f"Loaded {len(snapshot.keywords)} keywords (version {snapshot.version})")
+        self.snapshot = snapshot
+        self._stamp = stamp
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self._file_stamp() != self._stamp:
+                    self.reload()
+            except Exception as e:
+                print(f"Error reloading keywords from {self.path}: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="keyword-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+registry = KeywordRegistry(KEYWORDS_PATH, KEYWORDS_POLL_SECONDS)
+
+
+def not_modified(request: Request, snapshot: KeywordSnapshot):
+    return snapshot.etag in request.headers.get("if-none-match", "")
+
+
+@app.on_event("startup")
+def startup_event():
+    registry.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    registry.stop()
+
 
 @app.get("/api/suspicious-keywords", response_model=List[str], tags=["AML Data"])
-def get_suspicious_keywords():
+def get_suspicious_keywords(request: Request):
     """
     Retrieve the comprehensive list of suspicious keywords.
     """
-    return suspicious_keywords_data
\ No newline at end of file
+    snapshot = registry.snapshot
+    if not_modified(request, snapshot):
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    return JSONResponse(snapshot.keywords, headers={"ETag": snapshot.etag})
+
+
+@app.get("/api/suspicious-keywords/categories", response_model=Dict[str, List[str]], tags=["AML Data"])
+def get_suspicious_keyword_categories(request: Request):
+    """
+    Retrieve the suspicious keywords grouped by category.
+    """
+    snapshot = registry.snapshot
+    if not_modified(request, snapshot):
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    return JSONResponse(snapshot.categories, headers={"ETag": snapshot.etag})
+
+
+@app.get("/api/suspicious-keywords/matcher", tags=["AML Data"])
+def get_keyword_matcher(request: Request):
+    """
+    Retrieve the precompiled keyword matcher artifact. Scoring workers pull it
+    with aml_engine.keywords.pull_artifact and memory-map the local copy.
+    """
+    snapshot = registry.snapshot
+    if not_modified(request, snapshot):
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    return Response(snapshot.artifact, media_type="application/json", headers={"ETag": snapshot.etag})
+
+
+@app.get("/api/suspicious-keywords/version", tags=["AML Data"])
+def get_keywords_version():
+    """
+    Current keyword list version (content hash).
+    """
+    snapshot = registry.snapshot
+    return {"version": snapshot.version, "keyword_count": len(snapshot.keywords)}
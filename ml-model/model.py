@@ -1,6 +1,72 @@
+import threading
+
 import joblib
+import numpy as np
 import pandas as pd
 
+MODEL_PATH = "fraud_detection_pipeline.pkl"
+
+
+class FraudScorer:
+    """
+    Scores transactions with the trained fraud detection pipeline.
+
+    The pipeline is deserialized lazily on first use and kept for the life of
+    the process, so repeated calls only pay for inference.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, threshold=0.5):
+        self.model_path = model_path
+        self.threshold = threshold
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = joblib.load(self.model_path)
+        return self._model
+
+    @staticmethod
+    def _to_frame(transactions):
+        """Accept a list of dicts, a DataFrame or a pyarrow Table"""
+        if isinstance(transactions, pd.DataFrame):
+            return transactions
+        if hasattr(transactions, "to_pandas"):
+            return transactions.to_pandas()
+        if isinstance(transactions, dict):
+            return pd.DataFrame([transactions])
+        return pd.DataFrame(list(transactions))
+
+    def predict_batch(self, transactions):
+        """
+        Score many transactions with a single predict_proba pass.
+        Returns (labels, probabilities) as NumPy arrays, where labels are
+        1 for suspicious and 0 for normal.
+        """
+        tx_df = self._to_frame(transactions)
+        if tx_df.empty:
+            return np.empty(0, dtype=int), np.empty(0, dtype=float)
+        probs = self.model.predict_proba(tx_df)[:, 1]
+        labels = (probs > self.threshold).astype(int)
+        return labels, probs
+
+    def predict_one(self, transaction_dict):
+        labels, probs = self.predict_batch([transaction_dict])
+        label = "Suspicious" if labels[0] == 1 else "Normal"
+        return label, float(probs[0])
+
+
+_default_scorer = FraudScorer()
+
+
+def predict_batch(transactions):
+    """Score a batch of transactions with the shared process-wide scorer"""
+    return _default_scorer.predict_batch(transactions)
+
+
 def predict_transaction(transaction_dict):
     """
     Pass a single transaction as dictionary for prediction.
@@ -21,10 +87,6 @@ def predict_transaction(transaction_dict):
       'aggregate_score': 13
     }
     """
-    model = joblib.load("fraud_detection_pipeline.pkl")
-    tx_df = pd.DataFrame([transaction_dict])
-    pred = model.predict(tx_df)[0]
-    prob = model.predict_proba(tx_df)[0, 1]
-    label = "Suspicious" if pred == 1 else "Normal"
+    label, prob = _default_scorer.predict_one(transaction_dict)
     print(f"\nPrediction: {label} (Probability = {prob:.2f})")
-    return label, prob
\ No newline at end of file
+    return label, prob
@@ -1,15 +1,12 @@
-import pandas as pd
+from aml_engine.etl import TransactionETL, print_stats
 
-# Read the CSV file
-df = pd.read_csv('dataset/usd_amount_dataset.csv')
-
-# Round amount_usd column to 2 decimal places
-df['amount_usd'] = df['amount_usd'].round(2)
-
-# Save back to the same file
-df.to_csv('dataset/usd_amount_dataset1.csv', index=False)
+# Round amount_usd to 2 decimal places, streaming the file in chunks so the
+# whole dataset never has to fit in memory. Rerunning after an interruption
+# resumes from the checkpoint.
+etl = TransactionETL(score=False, round_decimals=2)
+stats = etl.run('dataset/usd_amount_dataset.csv', 'dataset/usd_amount_dataset1.csv',
+                checkpoint_path='dataset/usd_amount_dataset1.csv.checkpoint')
 
 print(f"SUCCESS: Rounded amount_usd column to 2 decimal places")
-print(f"Total rows processed: {len(df):,}")
-print(f"Sample rounded values:")
-print(df[['transaction_amount', 'amount_usd']].head(10))
+print(f"Total rows processed: {stats['rows']:,}")
+print_stats(stats)